@@ -1,7 +1,16 @@
+import os
 from dataclasses import dataclass, field
 import numpy as np
 
 
+def get_cache_dir(*parts: str) -> str:
+    root = os.environ.get('HOVERCRAFT_CACHE_DIR',
+                          os.path.join(os.path.expanduser('~'), '.cache', 'hovercraft_grant'))
+    path = os.path.join(root, *parts)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
 @dataclass
 class Parameters:
     m: float | int = field(default=16_000)  # Масса судна
@@ -0,0 +1,163 @@
+import argparse
+import csv
+import dataclasses
+import json
+import os
+import sys
+import time
+from typing import Iterable, Optional, TextIO
+
+import numpy as np
+
+from app_utils import Parameters, BallonetParameters
+from batch_solver import STATUS_CLAMPED, STATUS_DIVERGED
+from catalog import Catalog
+from metrics import get_metrics
+from progress import TqdmProgress
+from result_cache import ResultCache
+from steady_state import SteadyStateCriteria
+from sweep_runner import SweepResult, run_sweep, STATUS_TIMEOUT, STATUS_FAILED, STATUS_SETTLED
+
+# Форматы входа: файл вида input.json (один набор или список наборов), JSONL и CSV - по набору в строке.
+# Значения, как в input.json, могут быть строками; пропущенные поля берутся из Parameters
+INPUT_FORMATS = ('json', 'jsonl', 'csv')
+
+PARAMETER_NAMES = tuple(field.name for field in dataclasses.fields(Parameters))
+
+STATUS_NAMES = {STATUS_CLAMPED: 'clamped', STATUS_DIVERGED: 'diverged', STATUS_TIMEOUT: 'timeout',
+                STATUS_FAILED: 'failed', STATUS_SETTLED: 'settled'}
+
+
+def read_parameters(record: dict, source: str = '<input>') -> Parameters:
+    values = {}
+    for name, value in record.items():
+        if name not in PARAMETER_NAMES:
+            raise ValueError(f"{source}: unknown parameter {name!r}. Use fields of Parameters")
+        if value is None or value == '':
+            continue
+        try:
+            values[name] = float(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"{source}: {name} must be a number, got {value!r}") from None
+    return Parameters(**values)
+
+
+def get_format(path: str, input_format: Optional[str] = None) -> str:
+    # Формат файла - по расширению; input_format - для стандартного входа и файлов с другими расширениями
+    extension = os.path.splitext(path)[1].lstrip('.').lower()
+    if extension in INPUT_FORMATS:
+        return extension
+    if input_format is None:
+        raise ValueError(f"Cannot infer the format of {path}; use --format with one of {INPUT_FORMATS}")
+    return input_format
+
+
+def read_stream(file: TextIO, input_format: str, source: str) -> list[Parameters]:
+    if input_format == 'json':
+        data = json.load(file)
+        records = data if isinstance(data, list) else [data]
+        return [read_parameters(record, f"{source}[{i}]") for i, record in enumerate(records)]
+    if input_format == 'jsonl':
+        return [read_parameters(json.loads(line), f"{source}:{i}")
+                for i, line in enumerate(file, start=1) if line.strip()]
+    if input_format == 'csv':
+        return [read_parameters(record, f"{source}:{i}") for i, record in enumerate(csv.DictReader(file), start=2)]
+    raise ValueError(f"Unknown input format: {input_format}. Use one of {INPUT_FORMATS}")
+
+
+def read_scenarios(paths: Iterable[str], input_format: Optional[str] = None,
+                   stdin: Optional[TextIO] = None) -> list[Parameters]:
+    # '-' - поток со стандартного входа, формат обязателен
+    params = []
+    for path in paths:
+        if path == '-':
+            if input_format is None:
+                raise ValueError("Reading from stdin requires --format")
+            params.extend(read_stream(stdin or sys.stdin, input_format, '<stdin>'))
+            continue
+        with open(path, newline='') as file:
+            params.extend(read_stream(file, get_format(path, input_format), path))
+    return params
+
+
+def save_results(path: str, result: SweepResult, trajectories: bool = True, dtype: str = 'float32') -> None:
+    # Один сжатый .npz: сценарии и показатели - структурированные массивы, траектории (N, T) в dtype
+    arrays = {'scenarios': result.scenarios, 'metrics': get_metrics(result), 'status': result.status,
+              'last_index': result.last_index, 'elapsed': result.elapsed}
+    if trajectories:
+        arrays.update(t=result.t, **{name: getattr(result, name).astype(dtype) for name in ('y', 'p', 'w', 'gamma')})
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    # Запись через временный файл: прерванный прогон не оставляет обрезанный архив под итоговым именем
+    with open(f"{path}.tmp", 'wb') as file:
+        np.savez_compressed(file, **arrays)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_results(path: str) -> dict[str, np.ndarray]:
+    with np.load(path) as data:
+        return {name: data[name] for name in data.files}
+
+
+def get_summary(status: np.ndarray) -> dict[str, int]:
+    summary = {'total': int(status.shape[0]), 'ok': int(np.count_nonzero(status == 0))}
+    summary.update({name: int(np.count_nonzero(status & flag)) for flag, name in STATUS_NAMES.items()})
+    return summary
+
+
+def main(argv: Optional[list[str]] = None, stdin: Optional[TextIO] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run the solver headless for scenarios from input.json-style, "
+                                                 "JSONL or CSV files")
+    parser.add_argument('inputs', nargs='+', help="parameter files; '-' reads the standard input")
+    parser.add_argument('--format', choices=INPUT_FORMATS, help="format of the standard input and of files with other extensions")
+    parser.add_argument('--output', default='results.npz', help="compressed .npz file for the results")
+    parser.add_argument('--t-end', type=float, default=30, help="simulated time, s")
+    parser.add_argument('--eps', type=float, default=1e-3, help="time step, s")
+    parser.add_argument('--processes', type=int, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, help="scenarios per task")
+    parser.add_argument('--timeout', type=float, help="soft time limit per scenario, s")
+    parser.add_argument('--directory', help="directory for resumable sweep progress")
+    parser.add_argument('--steady-state', action='store_true', help="stop scenarios once they settle")
+    parser.add_argument('--metrics-only', action='store_true', help="do not store trajectories")
+    parser.add_argument('--dtype', choices=('float32', 'float64'), default='float32',
+                        help="storage type of the trajectories")
+    parser.add_argument('--progress', action='store_true', help="show a progress bar on stderr")
+    parser.add_argument('--cache', nargs='?', const='', metavar='DIRECTORY',
+                        help="reuse results of identical scenarios from a result cache (default directory if omitted)")
+    parser.add_argument('--catalog', nargs='?', const='', metavar='DIRECTORY',
+                        help="add the runs and their metrics to a queryable catalog (default directory if omitted)")
+    parser.add_argument('--recompute', action='store_true', help="solve cached scenarios again and refresh the cache")
+    args = parser.parse_args(argv)
+
+    try:
+        params = read_scenarios(args.inputs, args.format, stdin)
+    except (OSError, ValueError) as error:
+        print(f"Error: {error}", file=sys.stderr)
+        return 2
+    if not params:
+        print("Error: no scenarios in the input", file=sys.stderr)
+        return 2
+
+    start = time.perf_counter()
+    result = run_sweep(params, BallonetParameters(), t_end=args.t_end, eps=args.eps, processes=args.processes,
+                       chunk_size=args.chunk_size, timeout=args.timeout, directory=args.directory,
+                       steady_state=SteadyStateCriteria() if args.steady_state else None,
+                       progress=TqdmProgress(file=sys.stderr) if args.progress else None,
+                       result_cache=None if args.cache is None else ResultCache(args.cache or None),
+                       recompute=args.recompute)
+    save_results(args.output, result, trajectories=not args.metrics_only, dtype=args.dtype)
+
+    summary = get_summary(result.status)
+    for index, error in sorted(result.errors.items()):
+        print(f"Scenario {index}: {error.rstrip()}", file=sys.stderr)
+    if args.catalog is not None:
+        with Catalog(args.catalog or None) as catalog:
+            summary['sweep'] = catalog.add(result, name=args.output, trajectories=not args.metrics_only,
+                                           dtype=args.dtype)
+    print(json.dumps({**summary, 'elapsed': round(time.perf_counter() - start, 3), 'output': args.output}))
+    # Расхождение и упор в ограничения давления - результат модели; ошибкой прогона считаются сбои и таймауты
+    return 1 if summary['failed'] or summary['timeout'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
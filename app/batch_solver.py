@@ -0,0 +1,135 @@
+import dataclasses
+from dataclasses import dataclass
+from math import isfinite
+from typing import Iterable
+
+import numpy as np
+from numba import njit, prange
+
+from app_utils import Parameters, BallonetParameters
+from buoyancy import get_ballonet_arcs, WATER_BOUNDS
+from dynamics import P_MIN, P_MAX
+from solve_kernel import euler_steps_jit, get_initial_state_jit, STATE_P, STATE_W, STATE_Y, STATE_GAMMA
+
+PARAMETERS_DTYPE = np.dtype([(f.name, np.float64) for f in dataclasses.fields(Parameters)])
+
+# Флаги состояния сценария
+STATUS_OK, STATUS_CLAMPED, STATUS_DIVERGED = 0, 1, 2
+
+CHECK_EVERY = 256
+
+# fastmath без nnan/ninf: иначе проверка isfinite вырождается в True
+SAFE_FASTMATH = {'nsz', 'arcp', 'contract', 'afn', 'reassoc'}
+
+
+def get_scenarios(params: Iterable[Parameters]) -> np.ndarray:
+    return np.array([dataclasses.astuple(p) for p in params], dtype=PARAMETERS_DTYPE)
+
+
+def get_parameters(scenarios: np.ndarray) -> list[Parameters]:
+    return [Parameters(**{name: float(row[name]) for name in PARAMETERS_DTYPE.names}) for row in scenarios]
+
+
+@njit(fastmath=SAFE_FASTMATH, parallel=True, error_model='numpy', cache=True)
+def euler_batch_jit(params, r, A_template, B_template, water_bounds, eps, n_steps,
+                    y_out, p_out, w_out, gamma_out, status, last_index):
+    # Каждый сценарий - независимый цикл euler_steps_jit по блокам из CHECK_EVERY шагов;
+    # после блока проверяется расходимость, и разошедшийся сценарий останавливается
+    for i in prange(params.shape[0]):
+        state = get_initial_state_jit(params[i])
+        y_out[i, 0], p_out[i, 0] = state[STATE_Y], state[STATE_P]
+        w_out[i, 0], gamma_out[i, 0] = state[STATE_W], state[STATE_GAMMA]
+        # Положения A и B пакету не нужны: ядро пишет их в рабочий блок размером с шаг проверки,
+        # а каналы - в срезы строк выхода с индексами от 0
+        A_positions = np.empty((CHECK_EVERY, 2))
+        B_positions = np.empty((CHECK_EVERY, 2))
+
+        start = 1
+        while start < n_steps:
+            stop = min(start + CHECK_EVERY, n_steps)
+            euler_steps_jit(state, params[i], r, A_template, B_template, water_bounds, eps, 0, stop - start,
+                            y_out[i, start:stop], p_out[i, start:stop], w_out[i, start:stop],
+                            gamma_out[i, start:stop], A_positions, B_positions)
+
+            for idx in range(start, stop):
+                if p_out[i, idx] <= P_MIN or p_out[i, idx] >= P_MAX:
+                    status[i] |= STATUS_CLAMPED
+                    break
+
+            diverged = state[STATE_W] <= 0
+            for j in range(state.shape[0]):
+                if not isfinite(state[j]):
+                    diverged = True
+            if diverged:
+                status[i] |= STATUS_DIVERGED
+                for idx in range(start, n_steps):
+                    y_out[i, idx] = np.nan
+                    p_out[i, idx] = np.nan
+                    w_out[i, idx] = np.nan
+                    gamma_out[i, idx] = np.nan
+                break
+
+            last_index[i] = stop - 1
+            start = stop
+
+
+@dataclass
+class BatchResult:
+    scenarios: np.ndarray
+    t: np.ndarray
+    y: np.ndarray
+    p: np.ndarray
+    w: np.ndarray
+    gamma: np.ndarray
+    status: np.ndarray
+    last_index: np.ndarray
+
+    def masked(self, name: str, flags: int = STATUS_DIVERGED) -> np.ma.MaskedArray:
+        # Строки сценариев с любым из флагов flags скрыты
+        values = getattr(self, name)
+        mask = np.zeros(values.shape, dtype=bool)
+        mask[(self.status & flags) != 0] = True
+        return np.ma.MaskedArray(values, mask=mask)
+
+
+def solve_batch(scenarios: np.ndarray | Iterable[Parameters],
+                ballonet_params: BallonetParameters,
+                t_end: int | float = 1_000,
+                eps: float = 0.01,
+                water_bounds: tuple = WATER_BOUNDS) -> BatchResult:
+    # Явная схема solve_compiled() для N наборов Parameters с общим баллонетом; выход (N, T)
+    if not isinstance(scenarios, np.ndarray):
+        scenarios = get_scenarios(scenarios)
+    params = np.column_stack([scenarios[name] for name in PARAMETERS_DTYPE.names]).astype(np.float64)
+
+    t_array = np.arange(0, t_end, eps)
+    shape = (params.shape[0], t_array.shape[0])
+    result = BatchResult(scenarios=scenarios, t=t_array,
+                         y=np.empty(shape), p=np.empty(shape), w=np.empty(shape), gamma=np.empty(shape),
+                         status=np.zeros(shape[0], dtype=np.int64),
+                         last_index=np.zeros(shape[0], dtype=np.int64))
+
+    euler_batch_jit(params, float(ballonet_params.AD.r),
+                    get_ballonet_arcs(ballonet_params, minor=True),
+                    get_ballonet_arcs(ballonet_params, minor=False),
+                    np.array(water_bounds, dtype=np.float64),
+                    eps, shape[1],
+                    result.y, result.p, result.w, result.gamma, result.status, result.last_index)
+    return result
+
+
+if __name__ == '__main__':
+    import time
+
+    rng = np.random.default_rng(0)
+    base = get_scenarios([Parameters(h=1)] * 256)
+    base['m'] *= rng.uniform(0.8, 1.2, base.shape[0])
+    base['S'] *= rng.uniform(0.8, 1.2, base.shape[0])
+    base['xi'] *= rng.uniform(0.5, 1.5, base.shape[0])
+
+    solve_batch(base[:2], BallonetParameters(), t_end=0.01, eps=1e-3)
+    start = time.perf_counter()
+    batch = solve_batch(base, BallonetParameters(), t_end=30, eps=1e-3)
+    print(f"{base.shape[0]} scenarios x {batch.t.shape[0]} steps: {time.perf_counter() - start:.2f}s, "
+          f"diverged={np.count_nonzero(batch.status & STATUS_DIVERGED)}, "
+          f"clamped={np.count_nonzero(batch.status & STATUS_CLAMPED)}")
@@ -0,0 +1,280 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import numpy as np
+
+from app_utils import Parameters, BallonetParameters
+from plot_balloons import get_ballonet_coordinates, get_polygon_from_ballonet
+from solve_eq import SystemOfEquations
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks_baseline.json')
+
+# Допустимое замедление относительно базовой линии, %
+REGRESSION_THRESHOLD = 25.0
+
+RENDER_SIZE = (700, 700)
+
+# Первый прогон в новом процессе: импорт, компиляция или загрузка ядер numba, короткие solve() и solve_compiled()
+COLD_START_SCRIPT = (
+    "from app_utils import Parameters, BallonetParameters\n"
+    "from solve_eq import SystemOfEquations\n"
+    "SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=1, eps=1e-2).solve()\n"
+    "SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=1, eps=1e-2).solve_compiled()\n"
+)
+
+
+class BenchmarkUnavailable(Exception):
+    # Необязательная зависимость (pygame, moderngl) или дисплей/контекст EGL недоступны: замер пропускается
+    pass
+
+
+@dataclass
+class Benchmark:
+    name: str
+    # Подготовка вне замера: возвращает замеряемую функцию без аргументов
+    setup: Callable[[], Callable[[], object]]
+    number: int = 1
+    repeat: int = 5
+
+
+def time_benchmark(benchmark: Benchmark) -> dict:
+    # Время одного вызова: минимум по repeat повторам - наименее зашумлённая оценка
+    func = benchmark.setup()
+    func()  # прогрев: компиляция numba, кэши таблиц и шейдеров
+    times = np.array(timeit.repeat(func, number=benchmark.number, repeat=benchmark.repeat)) / benchmark.number
+    return {'seconds': float(times.min()), 'mean': float(times.mean()), 'std': float(times.std()),
+            'number': benchmark.number, 'repeat': benchmark.repeat}
+
+
+def solve_setup(t_end: int | float, eps: float) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        def run() -> None:
+            SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=t_end, eps=eps).solve()
+        return run
+    return setup
+
+
+def coordinates_setup(grain: int) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        return lambda: get_ballonet_coordinates(BallonetParameters(), minor=True, grain=grain)
+    return setup
+
+
+def polygon_setup(grain: int) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        segments = get_ballonet_coordinates(BallonetParameters(), minor=True, grain=grain)
+        return lambda: get_polygon_from_ballonet(segments)
+    return setup
+
+
+def volume_setup(buoyancy: str) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        system = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=1, eps=1e-3, buoyancy=buoyancy)
+        return system.get_cylinder_volume
+    return setup
+
+
+def cold_start_setup(cache: bool) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        # Кэш numba - во временном каталоге (NUMBA_CACHE_DIR), чтобы замер не зависел от __pycache__ репозитория.
+        # С кэшем каталог общий для повторов и заполняется прогревом; без кэша у каждого повтора свой, пустой
+        shared = tempfile.TemporaryDirectory()
+
+        def run() -> None:
+            with tempfile.TemporaryDirectory() as empty:
+                env = dict(os.environ, NUMBA_CACHE_DIR=shared.name if cache else empty)
+                subprocess.run([sys.executable, '-c', COLD_START_SCRIPT], cwd=os.path.dirname(BASELINE_PATH),
+                               env=env, check=True, capture_output=True)
+        run.directory = shared  # каталог удаляется вместе с замеряемой функцией
+        return run
+    return setup
+
+
+def import_setup(module: str) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        # Импорт модуля в новом процессе (вместе с запуском интерпретатора)
+        return lambda: subprocess.run([sys.executable, '-c', f"import {module}"], cwd=os.path.dirname(BASELINE_PATH),
+                                      check=True, capture_output=True)
+    return setup
+
+
+def init_pygame() -> None:
+    # Без окна: SDL рисует в память, convert() у текстур требует установленного режима экрана
+    os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+    try:
+        import pygame as pg
+    except ImportError as error:
+        raise BenchmarkUnavailable(f"pygame is not installed: {error}") from error
+    pg.init()
+    if pg.display.get_surface() is None:
+        try:
+            pg.display.set_mode((1, 1))
+        except pg.error as error:
+            raise BenchmarkUnavailable(f"no display: {error}") from error
+
+
+def water_setup(waves_enabled: bool) -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        init_pygame()
+        import pygame as pg
+        sys.path.insert(0, ROOT)
+        from engine2d.objects.model import Water
+
+        app = type('App', (), {})()
+        app.screen_w, app.screen_h = RENDER_SIZE
+        app.screen = pg.Surface(RENDER_SIZE)
+        water = Water(app, waves_enabled=waves_enabled, random_waves=False)
+
+        def run() -> None:
+            water.render()
+            water.update()
+        return run
+    return setup
+
+
+def scene3d_setup() -> Callable[[], Callable[[], object]]:
+    def setup() -> Callable[[], object]:
+        # Кадр Engine.update() без окна: контекст EGL и внеэкранный буфер кадра. Пути к ресурсам engine3d -
+        # от корня репозитория
+        init_pygame()
+        try:
+            import moderngl as mgl
+        except ImportError as error:
+            raise BenchmarkUnavailable(f"moderngl is not installed: {error}") from error
+        sys.path.insert(0, ROOT)
+        from engine3d.meshes.mesh import Mesh
+        from engine3d.objects.camera import Camera
+        from engine3d.objects.light import Light
+        from engine3d.scenes.scene import Scene
+        from engine3d.utils.constants import BG_COLOR
+
+        app = type('App', (), {})()
+        app.screen_w, app.screen_h = RENDER_SIZE
+        app.delta_time = 16
+        try:
+            app.ctx = mgl.create_standalone_context(require=330, backend='egl')
+        except Exception as error:  # glcontext не даёт общего типа ошибки: нет EGL, драйвера или OpenGL 3.3
+            raise BenchmarkUnavailable(f"no EGL context: {error}") from error
+        app.ctx.enable(flags=mgl.DEPTH_TEST | mgl.CULL_FACE)
+        framebuffer = app.ctx.simple_framebuffer(RENDER_SIZE)
+        framebuffer.use()
+        app.light = Light()
+        app.camera = Camera(app)
+        cwd = os.getcwd()
+        os.chdir(ROOT)
+        try:
+            app.mesh = Mesh(app)
+            app.scene = Scene(app)
+        finally:
+            os.chdir(cwd)
+
+        def run() -> None:
+            app.ctx.clear(color=BG_COLOR)
+            app.scene.render()
+            app.ctx.finish()
+        return run
+    return setup
+
+
+BENCHMARKS: list[Benchmark] = [
+    *(Benchmark(f"solve[t_end={t_end},eps={eps}]", solve_setup(t_end, eps), repeat=3)
+      for t_end, eps in ((1, 1e-2), (1, 1e-3), (10, 1e-2))),
+    *(Benchmark(f"import[{module}]", import_setup(module)) for module in ('solve_eq', 'plotting')),
+    *(Benchmark(f"cold_start[{'cache' if cache else 'no cache'}]", cold_start_setup(cache), repeat=3)
+      for cache in (True, False)),
+    *(Benchmark(f"get_ballonet_coordinates[grain={grain}]", coordinates_setup(grain), number=100)
+      for grain in (50, 100, 1_000)),
+    *(Benchmark(f"get_polygon_from_ballonet[grain={grain}]", polygon_setup(grain), number=100)
+      for grain in (50, 100, 1_000)),
+    *(Benchmark(f"get_cylinder_volume[{buoyancy}]", volume_setup(buoyancy), number=1_000)
+      for buoyancy in ('polygon', 'analytic', 'table')),
+    *(Benchmark(f"Water.render[waves={waves_enabled}]", water_setup(waves_enabled), number=20)
+      for waves_enabled in (False, True)),
+    Benchmark("Scene.render[engine3d]", scene3d_setup(), number=10),
+]
+
+
+def run_benchmarks(benchmarks: list[Benchmark] = BENCHMARKS, select: Optional[str] = None) -> dict:
+    # Отрисовка требует pygame/moderngl (и EGL для engine3d); без них замер пропускается с причиной.
+    # Любая другая ошибка замера - ошибка прогона
+    results, skipped = {}, {}
+    for benchmark in benchmarks:
+        if select is not None and select not in benchmark.name:
+            continue
+        try:
+            results[benchmark.name] = time_benchmark(benchmark)
+        except BenchmarkUnavailable as error:
+            skipped[benchmark.name] = str(error)
+    return {'machine': {'python': platform.python_version(), 'platform': platform.platform(),
+                        'processor': platform.processor(), 'cpu_count': os.cpu_count()},
+            'results': results, 'skipped': skipped}
+
+
+def compare(results: dict, baseline: dict, threshold: float = REGRESSION_THRESHOLD,
+            select: Optional[str] = None) -> dict[str, Optional[float]]:
+    # Замедления больше threshold % относительно базовой линии: имя -> изменение, %. Замер базовой линии
+    # (из выбранных select), которого нет в результатах - пропущенный или удалённый, - тоже регрессия: имя -> None
+    regressions = {}
+    for name, reference in baseline['results'].items():
+        if select is not None and select not in name:
+            continue
+        current = results['results'].get(name)
+        if current is None:
+            regressions[name] = None
+            continue
+        change = (current['seconds'] / reference['seconds'] - 1) * 100
+        if change > threshold:
+            regressions[name] = change
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks of the solver, geometry and render paths")
+    parser.add_argument('--output', help="JSON file for the results")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="JSON file with the baseline results")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="allowed slowdown against the baseline, %%")
+    parser.add_argument('--select', help="run only benchmarks whose name contains this string")
+    parser.add_argument('--update-baseline', action='store_true', help="write the results to --baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(select=args.select)
+    baseline = None
+    if not args.update_baseline and os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+
+    for name, result in results['results'].items():
+        line = f"{name:<45} {result['seconds'] * 1e3:10.3f} ms"
+        if baseline is not None and name in baseline['results']:
+            line += f" {(result['seconds'] / baseline['results'][name]['seconds'] - 1) * 100:+8.1f} %"
+        print(line)
+    for name, reason in results['skipped'].items():
+        print(f"{name:<45} skipped ({reason})")
+
+    for path in filter(None, (args.output, args.baseline if args.update_baseline else None)):
+        with open(path, 'w') as file:
+            json.dump(results, file, indent=2)
+
+    if baseline is None:
+        return 0
+    regressions = compare(results, baseline, args.threshold, args.select)
+    for name, change in regressions.items():
+        if change is None:
+            print(f"Regression: {name} is in the baseline but missing from the results", file=sys.stderr)
+        else:
+            print(f"Regression: {name} is {change:.1f} % slower than the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
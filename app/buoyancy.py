@@ -0,0 +1,336 @@
+from math import sin, cos, asin, acos, floor, pi
+
+import numpy as np
+from numba import njit
+
+from app_utils import BallonetParameters
+
+# Столбцы таблицы дуг: x(t) = cx + s * r * cos(t), y(t) = cy + r * sin(t), t: t0 -> t1
+ARC_CX, ARC_CY, ARC_R, ARC_T0, ARC_T1, ARC_S = range(6)
+
+# Прямоугольник воды: поверхность, дно, левая и правая стенки
+WATER_BOUNDS = (0.0, -4.0, -4.0, 4.0)
+
+# Точки излома дуги с phi <= 2π: концы и не больше одного корня на каждое из шести семейств
+# t = base + 2πn (два - ватерлиния, по два - каждая стенка)
+MAX_BREAKPOINTS = 8
+
+
+def get_ballonet_arcs(params: BallonetParameters,
+                      minor: bool = False,
+                      new_dx: float | int = 0,
+                      new_dy: float | int = 0) -> np.ndarray:
+    # Та же параметризация, что и в calculate_ballonet_parameters, но без дискретизации
+    segments = params.get_segments()
+    arcs = np.empty((len(segments), 6), dtype=np.float64)
+    sign = -1.0 if minor else 1.0
+    for i, (name, phi, r, x, y, alpha, direction) in enumerate(segments):
+        if not 0 <= phi <= 2 * pi:
+            raise ValueError(f"Arc {name}: phi must be within [0, 2π], got {phi}")
+        t0, t1 = alpha, alpha + direction * phi
+        if name == 'DE':
+            t0, t1 = t1, t0
+        arcs[i] = sign * (x + new_dx), y + new_dy, r, t0, t1, sign
+    return arcs
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _arc_antiderivatives(t, cx, d, r, s):
+    # Первообразные -(y-w)dx, -x(y-w)dx и -(y-w)^2/2 dx вдоль дуги, d = cy - w
+    sin_t, cos_t = sin(t), cos(t)
+    sin_sq = t / 2 - sin(2 * t) / 4
+    area = s * r * (-d * cos_t + r * sin_sq)
+    moment_x = s * r * (cx * (-d * cos_t + r * sin_sq) + s * r * (d * sin_t ** 2 / 2 + r * sin_t ** 3 / 3))
+    moment_y = s * r / 2 * (-d ** 2 * cos_t + 2 * d * r * sin_sq + r ** 2 * (-cos_t + cos_t ** 3 / 3))
+    return area, moment_x, moment_y
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _push_root(buffer, count, base, lo, hi):
+    # Наименьшее t = base + 2πn больше lo, если оно меньше hi. При hi - lo <= 2π других корней в (lo, hi) нет
+    root = base + 2 * pi * (int(floor((lo - base) / (2 * pi))) + 1)
+    if root > lo and root < hi:
+        buffer[count] = root
+        count += 1
+    return count
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _arc_below_level(cx, cy, r, t0, t1, s, w, left, right, buffer):
+    # buffer - не меньше MAX_BREAKPOINTS элементов
+    lo, hi = min(t0, t1), max(t0, t1)
+    direction = 1.0 if t1 >= t0 else -1.0
+    d = cy - w
+
+    # Окружность целиком над водой или целиком в воде - без поиска точек излома
+    if d - r >= 0:
+        return 0.0, 0.0, 0.0, 0.0
+    if d + r <= 0 and left <= cx - r and cx + r <= right:
+        a_1, x_1, y_1 = _arc_antiderivatives(hi, cx, d, r, s)
+        a_0, x_0, y_0 = _arc_antiderivatives(lo, cx, d, r, s)
+        width = s * r * (cos(hi) - cos(lo))
+        return direction * (a_1 - a_0), direction * (x_1 - x_0), direction * (y_1 - y_0), direction * width
+
+    # Точки излома: пересечения дуги с ватерлинией и со стенками бассейна
+    buffer[0] = lo
+    count = 1
+    k = -d / r
+    if -1 < k < 1:
+        count = _push_root(buffer, count, asin(k), lo, hi)
+        count = _push_root(buffer, count, pi - asin(k), lo, hi)
+    for wall in (left, right):
+        k = (wall - cx) / (s * r)
+        if -1 < k < 1:
+            count = _push_root(buffer, count, acos(k), lo, hi)
+            count = _push_root(buffer, count, -acos(k), lo, hi)
+    buffer[count] = hi
+    count += 1
+
+    for i in range(2, count - 1):
+        value = buffer[i]
+        j = i - 1
+        while j > 0 and buffer[j] > value:
+            buffer[j + 1] = buffer[j]
+            j -= 1
+        buffer[j + 1] = value
+
+    area, moment_x, moment_y, width = 0.0, 0.0, 0.0, 0.0
+    for i in range(count - 1):
+        t_a, t_b = buffer[i], buffer[i + 1]
+        mid = (t_a + t_b) / 2
+        x_mid = cx + s * r * cos(mid)
+        if d + r * sin(mid) >= 0 or x_mid <= left or x_mid >= right:
+            continue
+        a_1, x_1, y_1 = _arc_antiderivatives(t_b, cx, d, r, s)
+        a_0, x_0, y_0 = _arc_antiderivatives(t_a, cx, d, r, s)
+        area += a_1 - a_0
+        moment_x += x_1 - x_0
+        moment_y += y_1 - y_0
+        width += s * r * (cos(t_b) - cos(t_a))
+
+    return direction * area, direction * moment_x, direction * moment_y, direction * width
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _chord_below_level(x0, y0, x1, y1, w, left, right):
+    # Отсечение отрезка по Лиангу-Барски: y < w, left < x < right
+    u0, u1 = 0.0, 1.0
+    dx, dy = x1 - x0, y1 - y0
+    for p, q in ((dy, w - y0), (-dx, x0 - left), (dx, right - x0)):
+        if p == 0:
+            if q < 0:
+                return 0.0, 0.0, 0.0, 0.0
+            continue
+        u = q / p
+        if p < 0:
+            u0 = max(u0, u)
+        else:
+            u1 = min(u1, u)
+    if u0 >= u1:
+        return 0.0, 0.0, 0.0, 0.0
+
+    # Подынтегральные выражения не выше второй степени: формула Симпсона точна
+    xa, xb = x0 + dx * u0, x0 + dx * u1
+    ea, eb = y0 + dy * u0 - w, y0 + dy * u1 - w
+    xm, em = (xa + xb) / 2, (ea + eb) / 2
+    length = xb - xa
+    area = -length * (ea + eb) / 2
+    moment_x = -length / 6 * (xa * ea + 4 * xm * em + xb * eb)
+    moment_y = -length / 12 * (ea ** 2 + 4 * em ** 2 + eb ** 2)
+    return area, moment_x, moment_y, length
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _outline_below_level(arcs, w, left, right, breakpoints):
+    # Формула Грина по контуру: на ватерлинии y = w и на вертикальных стенках
+    # подынтегральные выражения (-(y-w)dx и т.д.) обращаются в ноль, поэтому достаточно
+    # проинтегрировать части дуг и замыкающих хорд, лежащие в воде ниже уровня w.
+    # width = ∮[y < w] dx - производная площади по w (ширина сечения контура на уровне w)
+    area, moment_x, moment_y, width = 0.0, 0.0, 0.0, 0.0
+    n = arcs.shape[0]
+    for i in range(n):
+        cx, cy, r, t0, t1, s = arcs[i, 0], arcs[i, 1], arcs[i, 2], arcs[i, 3], arcs[i, 4], arcs[i, 5]
+        a_i, x_i, y_i, w_i = _arc_below_level(cx, cy, r, t0, t1, s, w, left, right, breakpoints)
+        area += a_i
+        moment_x += x_i
+        moment_y += y_i
+        width += w_i
+
+        nxt = arcs[(i + 1) % n]
+        a_i, x_i, y_i, w_i = _chord_below_level(cx + s * r * cos(t1), cy + r * sin(t1),
+                                           nxt[0] + nxt[5] * nxt[2] * cos(nxt[3]), nxt[1] + nxt[2] * sin(nxt[3]),
+                                           w, left, right)
+        area += a_i
+        moment_x += x_i
+        moment_y += y_i
+        width += w_i
+
+    return area, moment_x, moment_y, width
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_submerged_properties_jit(arcs, surface, bottom, left, right, breakpoints=None):
+    # breakpoints - рабочий массив (MAX_BREAKPOINTS,) вызывающего: шаговые ядра передают его, чтобы не выделять память
+    if breakpoints is None:
+        breakpoints = np.empty(MAX_BREAKPOINTS)
+    a_top, x_top, y_top, _ = _outline_below_level(arcs, surface, left, right, breakpoints)
+    a_bottom, x_bottom, y_bottom, _ = _outline_below_level(arcs, bottom, left, right, breakpoints)
+
+    # Знак площади зависит от обхода контура, координаты центра тяжести от него не зависят
+    area = a_top - a_bottom
+    if area == 0:
+        return 0.0, 0.0, 0.0
+
+    moment_x = x_top - x_bottom
+    moment_y = (y_top + surface * a_top) - (y_bottom + bottom * a_bottom)
+    return abs(area), moment_x / area, moment_y / area
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_submerged_area_jit(arcs, surface, bottom, left, right, breakpoints=None):
+    return get_submerged_properties_jit(arcs, surface, bottom, left, right, breakpoints)[0]
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_submerged_area_derivative_jit(arcs, surface, bottom, left, right, breakpoints=None):
+    # d(area)/d(new_dy): подъём контура на δ равносилен опусканию уровней воды на δ
+    if breakpoints is None:
+        breakpoints = np.empty(MAX_BREAKPOINTS)
+    a_top, _, _, width_top = _outline_below_level(arcs, surface, left, right, breakpoints)
+    a_bottom, _, _, width_bottom = _outline_below_level(arcs, bottom, left, right, breakpoints)
+    area = a_top - a_bottom
+    if area == 0:
+        return 0.0
+    return -(width_top - width_bottom) * (1.0 if area > 0 else -1.0)
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def transform_arcs_jit(arcs, gamma, new_dx, new_dy, out):
+    # Поворот контура на gamma против часовой стрелки вокруг начала координат и перенос на (new_dx, new_dy).
+    # У отражённых дуг (s = -1) параметр t поворачивается в обратную сторону
+    cos_g, sin_g = cos(gamma), sin(gamma)
+    for i in range(arcs.shape[0]):
+        cx, cy, s = arcs[i, 0], arcs[i, 1], arcs[i, 5]
+        out[i, 0] = cx * cos_g - cy * sin_g + new_dx
+        out[i, 1] = cx * sin_g + cy * cos_g + new_dy
+        out[i, 2] = arcs[i, 2]
+        out[i, 3] = arcs[i, 3] + s * gamma
+        out[i, 4] = arcs[i, 4] + s * gamma
+        out[i, 5] = s
+    return out
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def place_arcs_jit(template, new_dx, new_dy, out):
+    # template = get_ballonet_arcs(params, minor) без смещения
+    for i in range(template.shape[0]):
+        out[i, 0] = template[i, 0] + template[i, 5] * new_dx
+        out[i, 1] = template[i, 1] + new_dy
+        out[i, 2:] = template[i, 2:]
+    return out
+
+
+def get_flat_surface(water_bounds: tuple = WATER_BOUNDS) -> tuple[np.ndarray, np.ndarray]:
+    # Горизонтальная поверхность бассейна water_bounds в виде ломаной (x, y)
+    surface, _, left, right = water_bounds
+    return np.array([left, right], dtype=np.float64), np.array([surface, surface], dtype=np.float64)
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _surface_line(surface_x, surface_y, i):
+    # Поверхность на участке i (между surface_x[i - 1] и surface_x[i]): s(x) = s0 + k * (x - x0).
+    # За крайними отсчётами поверхность продолжается горизонтально
+    n = surface_x.shape[0]
+    if i == 0:
+        return surface_x[0], surface_y[0], 0.0
+    if i >= n:
+        return surface_x[n - 1], surface_y[n - 1], 0.0
+    x0, s0 = surface_x[i - 1], surface_y[i - 1]
+    return x0, s0, (surface_y[i] - s0) / (surface_x[i] - x0)
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _piece_below_line(xa, ya, xb, yb, x0, s0, k, left, right):
+    # Отсечение отрезка (xa < xb) по Лиангу-Барски: y < s0 + k * (x - x0), left < x < right
+    dx, dy = xb - xa, yb - ya
+    e0, de = ya - (s0 + k * (xa - x0)), dy - k * dx
+    u0, u1 = 0.0, 1.0
+    for p, q in ((de, -e0), (-dx, xa - left), (dx, right - xa)):
+        if p == 0:
+            if q < 0:
+                return 0.0, 0.0, 0.0
+            continue
+        u = q / p
+        if p < 0:
+            u0 = max(u0, u)
+        else:
+            u1 = min(u1, u)
+    if u0 >= u1:
+        return 0.0, 0.0, 0.0
+
+    # Подынтегральные выражения -(y-s)dx, -x(y-s)dx и -(y²-s²)/2 dx обращаются в ноль на поверхности
+    # и не выше второй степени по x: формула Симпсона точна
+    x_a, x_b = xa + dx * u0, xa + dx * u1
+    y_a, y_b = ya + dy * u0, ya + dy * u1
+    s_a, s_b = s0 + k * (x_a - x0), s0 + k * (x_b - x0)
+    x_m, y_m, s_m = (x_a + x_b) / 2, (y_a + y_b) / 2, (s_a + s_b) / 2
+    length = x_b - x_a
+    area = -length * ((y_a - s_a) + (y_b - s_b)) / 2
+    moment_x = -length / 6 * (x_a * (y_a - s_a) + 4 * x_m * (y_m - s_m) + x_b * (y_b - s_b))
+    moment_y = -length / 12 * ((y_a ** 2 - s_a ** 2) + 4 * (y_m ** 2 - s_m ** 2) + (y_b ** 2 - s_b ** 2))
+    return area, moment_x, moment_y
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def _polygon_below_surface(vertices, surface_x, surface_y, flat, level, left, right):
+    # Формула Грина по рёбрам многоугольника, разбитым по узлам ломаной поверхности
+    # (flat - горизонтальный уровень level вместо ломаной). Вертикальные рёбра и стенки вклада не дают
+    area, moment_x, moment_y = 0.0, 0.0, 0.0
+    n, n_surface = vertices.shape[0], surface_x.shape[0]
+    for i in range(n):
+        x0, y0 = vertices[i, 0], vertices[i, 1]
+        x1, y1 = vertices[(i + 1) % n, 0], vertices[(i + 1) % n, 1]
+        if x0 == x1:
+            continue
+        sign = 1.0
+        if x1 < x0:
+            x0, y0, x1, y1, sign = x1, y1, x0, y0, -1.0
+
+        if flat:
+            a_i, x_i, y_i = _piece_below_line(x0, y0, x1, y1, 0.0, level, 0.0, left, right)
+            area += sign * a_i
+            moment_x += sign * x_i
+            moment_y += sign * y_i
+            continue
+
+        slope = (y1 - y0) / (x1 - x0)
+        j = np.searchsorted(surface_x, x0, side='right')
+        xa, ya = x0, y0
+        while True:
+            xb, yb = x1, y1
+            if j < n_surface and surface_x[j] < x1:
+                xb, yb = surface_x[j], y0 + slope * (surface_x[j] - x0)
+            line_x, line_s, line_k = _surface_line(surface_x, surface_y, j)
+            a_i, x_i, y_i = _piece_below_line(xa, ya, xb, yb, line_x, line_s, line_k, left, right)
+            area += sign * a_i
+            moment_x += sign * x_i
+            moment_y += sign * y_i
+            if xb == x1:
+                break
+            xa, ya = xb, yb
+            j += 1
+
+    return area, moment_x, moment_y
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_submerged_polygon_jit(vertices, surface_x, surface_y, bottom, left, right):
+    # Площадь и центр тяжести части многоугольника vertices (N, 2) под ломаной поверхностью
+    # (surface_x возрастает) и над дном bottom, между стенками left и right. Без выделения памяти
+    a_top, x_top, y_top = _polygon_below_surface(vertices, surface_x, surface_y, False, 0.0, left, right)
+    a_bottom, x_bottom, y_bottom = _polygon_below_surface(vertices, surface_x, surface_y, True, bottom, left, right)
+
+    area = a_top - a_bottom
+    if area == 0:
+        return 0.0, 0.0, 0.0
+    return abs(area), (x_top - x_bottom) / area, (y_top - y_bottom) / area
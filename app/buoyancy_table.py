@@ -0,0 +1,170 @@
+import dataclasses
+import hashlib
+import json
+import os
+from typing import Optional
+
+import numpy as np
+from numba import njit
+
+from app_utils import BallonetParameters, get_cache_dir
+from buoyancy import get_ballonet_arcs, get_submerged_properties_jit, WATER_BOUNDS
+from plot_balloons import get_ballonet_coordinates, get_polygon_from_ballonet
+
+TABLE_METHODS = ('polygon', 'analytic')
+TABLE_VERSION = 2
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def interpolate_table_jit(start, step, values, slopes, new_dy):
+    # Кубический эрмитов сплайн на равномерной сетке (наклоны PCHIP сохраняют монотонность)
+    pos = (new_dy - start) / step
+    i = min(max(int(pos), 0), values.shape[0] - 2)
+    u = pos - i
+    h00 = (1 + 2 * u) * (1 - u) ** 2
+    h10 = u * (1 - u) ** 2
+    h01 = u ** 2 * (3 - 2 * u)
+    h11 = u ** 2 * (u - 1)
+    area = h00 * values[i, 0] + h10 * step * slopes[i, 0] + h01 * values[i + 1, 0] + h11 * step * slopes[i + 1, 0]
+    x_c = h00 * values[i, 1] + h10 * step * slopes[i, 1] + h01 * values[i + 1, 1] + h11 * step * slopes[i + 1, 1]
+    y_c = h00 * values[i, 2] + h10 * step * slopes[i, 2] + h01 * values[i + 1, 2] + h11 * step * slopes[i + 1, 2]
+    return max(area, 0.0), x_c, y_c + new_dy
+
+
+class BuoyancyTable:
+    def __init__(self,
+                 ballonet_params: BallonetParameters,
+                 minor: bool = False,
+                 new_dx: float | int = 0,
+                 grain: int = 100,
+                 water_bounds: tuple = WATER_BOUNDS,
+                 n_samples: int = 1_024,
+                 method: str = 'polygon',
+                 cache_dir: Optional[str] = None,
+                 use_cache: bool = True) -> None:
+
+        if method not in TABLE_METHODS:
+            raise ValueError(f"Unknown table method: {method}. Use one of {TABLE_METHODS}")
+
+        self.ballonet_params: BallonetParameters = ballonet_params
+        self.minor: bool = minor
+        self.new_dx: float = float(new_dx)
+        self.grain: int = grain
+        self.water_bounds: tuple = tuple(float(v) for v in water_bounds)
+        self.n_samples: int = n_samples
+        self.method: str = method
+
+        self.key: str = self.get_key()
+        self.path: str = os.path.join(cache_dir or get_cache_dir('buoyancy'), f"{self.key}.npz")
+
+        if use_cache and os.path.exists(self.path):
+            self.load(self.path)
+        else:
+            self.build()
+            if use_cache:
+                self.save(self.path)
+
+    def get_key(self) -> str:
+        description = {
+            'version': TABLE_VERSION,
+            'ballonet': dataclasses.asdict(self.ballonet_params),
+            'minor': self.minor,
+            'new_dx': self.new_dx,
+            'grain': self.grain,
+            'water_bounds': self.water_bounds,
+            'n_samples': self.n_samples,
+            'method': self.method,
+        }
+        return hashlib.sha256(json.dumps(description, sort_keys=True, default=float).encode()).hexdigest()
+
+    def exact(self, new_dy: float | int, new_dx: Optional[float | int] = None) -> tuple[float, float, float]:
+        new_dx = self.new_dx if new_dx is None else new_dx
+        if self.method == 'analytic':
+            arcs = get_ballonet_arcs(self.ballonet_params, self.minor, new_dx, new_dy)
+            return get_submerged_properties_jit(arcs, *self.water_bounds)
+
+        from shapely.geometry import box
+
+        surface, bottom, left, right = self.water_bounds
+        poly = get_polygon_from_ballonet(get_ballonet_coordinates(self.ballonet_params,
+                                                                  minor=self.minor,
+                                                                  new_dx=new_dx,
+                                                                  new_dy=new_dy,
+                                                                  grain=self.grain))
+        submerged = poly.intersection(box(left, bottom, right, surface))
+        if submerged.area == 0:
+            return 0.0, 0.0, 0.0
+        return submerged.area, submerged.centroid.x, submerged.centroid.y
+
+    def build(self) -> None:
+        # scipy и shapely импортируются только при построении таблицы: загрузка из кэша обходится без них
+        from scipy.interpolate import PchipInterpolator
+
+        # Осадки, при которых контур пересекает поверхность воды (за пределами - полностью над водой/в воде)
+        outline = get_polygon_from_ballonet(get_ballonet_coordinates(self.ballonet_params,
+                                                                     minor=self.minor,
+                                                                     new_dx=self.new_dx,
+                                                                     grain=self.grain))
+        _, y_min, _, y_max = outline.bounds
+        surface, bottom, _, _ = self.water_bounds
+        self.dy_range = (max(surface - y_max, bottom - y_min), surface - y_min)
+        # Ниже dy_floor контур уходит под дно бассейна
+        self.dy_floor = bottom - y_min
+        self.dy_grid = np.linspace(*self.dy_range, self.n_samples)
+
+        self.values = np.array([self.exact(new_dy) for new_dy in self.dy_grid], dtype=np.float64)
+        self.values[:, 2] -= self.dy_grid
+
+        # При нулевой площади центр тяжести не определён - берём ближайшее определённое значение
+        empty = self.values[:, 0] == 0
+        if np.any(empty) and not np.all(empty):
+            last = np.flatnonzero(~empty)[-1]
+            self.values[empty, 1:] = self.values[last, 1:]
+
+        self.slopes = PchipInterpolator(self.dy_grid, self.values, axis=0)(self.dy_grid, 1)
+        self.max_error = self.check_error()
+
+    def save(self, path: str) -> None:
+        np.savez(path, dy_grid=self.dy_grid, values=self.values, slopes=self.slopes,
+                 max_error=self.max_error, dy_floor=self.dy_floor)
+
+    def load(self, path: str) -> None:
+        with np.load(path) as data:
+            self.dy_grid = data['dy_grid']
+            self.values = data['values']
+            self.slopes = data['slopes']
+            self.max_error = float(data['max_error'])
+            self.dy_floor = float(data['dy_floor'])
+        self.dy_range = (self.dy_grid[0], self.dy_grid[-1])
+
+    def get_properties(self, new_dy: float | int,
+                       new_dx: Optional[float | int] = None) -> tuple[float, float, float]:
+        if new_dx is not None and new_dx != self.new_dx:
+            return self.exact(new_dy, new_dx)
+        if new_dy >= self.dy_range[1]:
+            return 0.0, 0.0, 0.0
+        if new_dy < self.dy_range[0]:
+            if new_dy >= self.dy_floor:
+                # Контур целиком под поверхностью и над дном: погружена та же часть (внутри стенок),
+                # что и на нижнем узле таблицы, только сдвинутая на new_dy
+                area, x_c, y_c = self.values[0]
+                return float(area), float(x_c), float(y_c) + new_dy
+            return self.exact(new_dy)
+
+        step = self.dy_grid[1] - self.dy_grid[0]
+        return interpolate_table_jit(self.dy_grid[0], step, self.values, self.slopes, new_dy)
+
+    def get_area(self, new_dy: float | int, new_dx: Optional[float | int] = None) -> float:
+        return self.get_properties(new_dy, new_dx)[0]
+
+    def check_error(self, n_points: Optional[int] = None) -> float:
+        # Максимальная ошибка площади в серединах интервалов таблицы (там, где сплайн дальше всего от узлов)
+        mids = (self.dy_grid[:-1] + self.dy_grid[1:]) / 2
+        if n_points is not None and n_points < mids.shape[0]:
+            mids = mids[np.linspace(0, mids.shape[0] - 1, n_points).astype(int)]
+        return max(abs(self.get_area(new_dy) - self.exact(new_dy)[0]) for new_dy in mids)
+
+
+if __name__ == '__main__':
+    table = BuoyancyTable(BallonetParameters(), minor=True, new_dx=-3)
+    print(f"{table.path=}\n{table.dy_range=}\n{table.max_error=}")
@@ -0,0 +1,210 @@
+import dataclasses
+import os
+
+import numpy as np
+import pytest
+from shapely.geometry import box
+
+from app_utils import Parameters, BallonetParameters, BalloonParameters
+from buoyancy import (get_ballonet_arcs, get_submerged_properties_jit, get_submerged_area_jit, transform_arcs_jit,
+                      get_submerged_polygon_jit, get_flat_surface, WATER_BOUNDS, MAX_BREAKPOINTS)
+from buoyancy_table import BuoyancyTable
+from plot_balloons import (get_ballonet_coordinates, get_ballonet_vertices, get_polygon_from_ballonet,
+                           transform_vertices, Polygon)
+from solve_eq import SystemOfEquations
+
+SURFACE, BOTTOM, LEFT, RIGHT = WATER_BOUNDS
+WATER_POLY = box(LEFT, BOTTOM, RIGHT, SURFACE)
+
+
+def get_reference(minor, new_dx, new_dy, grain=20_000):
+    poly = get_polygon_from_ballonet(get_ballonet_coordinates(BallonetParameters(), minor=minor,
+                                                              new_dx=new_dx, new_dy=new_dy, grain=grain))
+    return poly, poly.intersection(WATER_POLY)
+
+
+class TestClassAnalyticBuoyancy:
+    def test_matches_polygon_area(self):
+        for minor, new_dx in ((True, -3), (False, 3), (False, 0)):
+            for new_dy in (-3.5, -2, -0.9, -0.5, -0.3, -0.01, 0.5):
+                arcs = get_ballonet_arcs(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=new_dy)
+                _, reference = get_reference(minor, new_dx, new_dy)
+                assert abs(get_submerged_area_jit(arcs, *WATER_BOUNDS) - reference.area) < 1e-8
+
+    def test_matches_polygon_centroid(self):
+        for minor, new_dx, new_dy in ((True, -3, -0.5), (False, 3, -0.9), (False, 0, -4.5)):
+            arcs = get_ballonet_arcs(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=new_dy)
+            _, reference = get_reference(minor, new_dx, new_dy)
+            area, x_c, y_c = get_submerged_properties_jit(arcs, *WATER_BOUNDS)
+            assert round(x_c, 7) == round(reference.centroid.x, 7)
+            assert round(y_c, 7) == round(reference.centroid.y, 7)
+
+    def test_full_and_empty(self):
+        poly, _ = get_reference(False, 0, 0)
+        full = get_ballonet_arcs(BallonetParameters(), new_dy=-2)
+        empty = get_ballonet_arcs(BallonetParameters(), new_dy=0.5)
+        assert round(get_submerged_area_jit(full, *WATER_BOUNDS), 7) == round(poly.area, 7)
+        assert get_submerged_area_jit(empty, *WATER_BOUNDS) == 0
+
+    def test_rotated_matches_polygon(self):
+        for minor, new_dx in ((True, -3), (False, 3)):
+            arcs = get_ballonet_arcs(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=-1)
+            vertices = get_ballonet_vertices(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=-1, grain=20_000)
+            for gamma, y in ((0.05, 0.6), (-0.2, 0.8), (np.pi / 2, 0)):
+                placed = transform_arcs_jit(arcs, gamma, 0.0, y, np.empty_like(arcs))
+                reference = Polygon(transform_vertices(vertices, gamma, 0.0, y)).intersection(WATER_POLY)
+                area, x_c, y_c = get_submerged_properties_jit(placed, *WATER_BOUNDS)
+                assert abs(area - reference.area) < 1e-8
+                if not reference.is_empty:
+                    assert round(x_c, 7) == round(reference.centroid.x, 7)
+
+    def test_breakpoints(self):
+        # Дуги пересекают и ватерлинию, и правую стенку: наибольшее число точек излома
+        breakpoints = np.full(MAX_BREAKPOINTS, np.nan)
+        for new_dx, new_dy in ((3.5, -0.5), (3.9, -3.7), (3.9, 0)):
+            arcs = get_ballonet_arcs(BallonetParameters(), new_dx=new_dx, new_dy=new_dy)
+            _, reference = get_reference(False, new_dx, new_dy)
+            area = get_submerged_area_jit(arcs, *WATER_BOUNDS, breakpoints)
+            assert area == get_submerged_area_jit(arcs, *WATER_BOUNDS)
+            assert abs(area - reference.area) < 1e-8
+
+        segment = BallonetParameters().AD
+        params = dataclasses.replace(BallonetParameters(), AD=BalloonParameters(phi=7, r=segment.r, x=segment.x,
+                                                                                y=segment.y, _a=segment._a))
+        with pytest.raises(ValueError, match='phi'):
+            get_ballonet_arcs(params)
+
+    def test_monotone_in_draft(self):
+        areas = [get_submerged_area_jit(get_ballonet_arcs(BallonetParameters(), new_dy=dy), *WATER_BOUNDS)
+                 for dy in np.linspace(-2, 0.5, 200)]
+        assert np.all(np.diff(areas) <= 1e-12)
+
+
+class TestClassPolygonClipping:
+    def get_wave(self):
+        surface_x = np.linspace(-5, 5, 37)
+        return surface_x, 0.3 * np.sin(2 * surface_x)
+
+    def test_matches_shapely_flat(self):
+        surface_x, surface_y = get_flat_surface()
+        for minor, new_dx in ((True, -3), (False, 3), (False, 0)):
+            for new_dy in (-3.5, -0.9, -0.3, 0.5):
+                vertices = get_ballonet_vertices(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=new_dy)
+                reference = Polygon(vertices).intersection(WATER_POLY)
+                area, x_c, y_c = get_submerged_polygon_jit(vertices, surface_x, surface_y, BOTTOM, LEFT, RIGHT)
+                assert abs(area - reference.area) < 1e-12
+                if not reference.is_empty:
+                    assert abs(x_c - reference.centroid.x) < 1e-10 and abs(y_c - reference.centroid.y) < 1e-10
+
+    def test_matches_shapely_wave(self):
+        surface_x, surface_y = self.get_wave()
+        water = Polygon(np.vstack((np.column_stack((surface_x, surface_y)), [(5, BOTTOM), (-5, BOTTOM)])))
+        water = water.intersection(box(LEFT, BOTTOM, RIGHT, 1))
+        for minor, new_dx in ((True, -3), (False, 3)):
+            for new_dy in (-1, -0.6, -0.3):
+                vertices = get_ballonet_vertices(BallonetParameters(), minor=minor, new_dx=new_dx, new_dy=new_dy)
+                reference = Polygon(vertices).intersection(water)
+                area, x_c, y_c = get_submerged_polygon_jit(vertices, surface_x, surface_y, BOTTOM, LEFT, RIGHT)
+                assert abs(area - reference.area) < 1e-12
+                assert abs(x_c - reference.centroid.x) < 1e-10 and abs(y_c - reference.centroid.y) < 1e-10
+                reverse = get_submerged_polygon_jit(vertices[::-1].copy(), surface_x, surface_y, BOTTOM, LEFT, RIGHT)
+                assert abs(reverse[0] - area) < 1e-12
+
+
+class TestClassSolverBuoyancy:
+    def test_unknown_method(self):
+        try:
+            SystemOfEquations(Parameters(), BallonetParameters(), buoyancy='unknown')
+        except ValueError:
+            return
+        assert False
+
+    def test_trajectories_match(self):
+        solutions = {}
+        for method in ('polygon', 'analytic', 'table'):
+            solutions[method] = SystemOfEquations(Parameters(h=1), BallonetParameters(),
+                                                  t_end=0.5, eps=1e-3, buoyancy=method)
+            solutions[method].solve()
+
+        polygon = solutions['polygon']
+        for method in ('analytic', 'table'):
+            assert np.allclose(polygon.y_array, solutions[method].y_array, atol=1e-5)
+            assert np.allclose(polygon.p_array, solutions[method].p_array, atol=1e-2)
+            assert np.allclose(polygon.gamma_array, solutions[method].gamma_array, rtol=1e-3)
+
+    def test_pitch_trajectories_match(self):
+        solutions = {}
+        for method in ('polygon', 'analytic'):
+            solutions[method] = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.5, eps=1e-3,
+                                                  buoyancy=method, pitch=True)
+            solutions[method].solve()
+        assert np.allclose(solutions['polygon'].y_array, solutions['analytic'].y_array, atol=1e-5)
+        assert np.allclose(solutions['polygon'].gamma_array, solutions['analytic'].gamma_array, rtol=1e-3)
+
+    def test_water_surface(self):
+        flat = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.2, eps=1e-3,
+                                 water_surface=get_flat_surface())
+        default = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.2, eps=1e-3)
+        surface_x = np.linspace(-4, 4, 81)
+        wave = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.2, eps=1e-3,
+                                 water_surface=(surface_x, 0.5 + 0.1 * np.sin(3 * surface_x)))
+        for system in (flat, default, wave):
+            system.solve()
+        assert np.array_equal(flat.y_array, default.y_array)
+        assert wave.get_cylinder_volume() > default.get_cylinder_volume()
+        try:
+            SystemOfEquations(Parameters(), BallonetParameters(), buoyancy='analytic', water_surface=get_flat_surface())
+        except ValueError:
+            return
+        assert False
+
+    def test_table_covers_initial_placement(self):
+        # Начальное смещение (2.5, y - 1.2) и смещения (±l, y - h) из solve() обслуживаются своими таблицами
+        system = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.01, eps=1e-3, buoyancy='table')
+        keys = {(True, system.A_offset[0]), (False, system.B_offset[0]),
+                (True, float(system.A.x)), (False, float(system.B.x))}
+        assert set(system.tables) == keys
+        system.solve()
+        assert set(system.tables) == keys
+
+
+class TestClassBuoyancyTable:
+    def test_error_bound(self, tmp_path):
+        table = BuoyancyTable(BallonetParameters(), minor=True, new_dx=-3, cache_dir=str(tmp_path))
+        assert table.max_error < 1e-4
+        assert table.check_error(n_points=50) <= table.max_error
+        for new_dy in (-2, -1, -0.5, -0.1, 0.1, 1):
+            area, x_c, y_c = table.get_properties(new_dy)
+            exact_area, exact_x, exact_y = table.exact(new_dy)
+            assert abs(area - exact_area) < 1e-4
+            if exact_area > 1e-3:
+                assert abs(x_c - exact_x) < 1e-3
+                assert abs(y_c - exact_y) < 1e-3
+
+    def test_cached_on_disk(self, tmp_path):
+        table = BuoyancyTable(BallonetParameters(), minor=False, new_dx=3, cache_dir=str(tmp_path))
+        assert os.path.exists(table.path)
+
+        cached = BuoyancyTable(BallonetParameters(), minor=False, new_dx=3, cache_dir=str(tmp_path))
+        assert cached.path == table.path
+        assert np.array_equal(cached.values, table.values)
+
+        other = BuoyancyTable(BallonetParameters(), minor=False, new_dx=3, grain=50, cache_dir=str(tmp_path))
+        assert other.path != table.path
+
+    def test_fully_submerged(self, tmp_path, monkeypatch):
+        table = BuoyancyTable(BallonetParameters(), minor=True, new_dx=-3, cache_dir=str(tmp_path))
+        assert table.dy_floor < table.dy_range[0]
+        depths = np.linspace(table.dy_floor, table.dy_range[0], 7)[:-1]
+        expected = [table.exact(new_dy) for new_dy in depths]
+        # Погружённый баллонет не должен возвращать шаг к точному пересечению контуров
+        monkeypatch.setattr(table, 'exact', lambda *args: pytest.fail("exact() below the table"))
+        for new_dy, (exact_area, exact_x, exact_y) in zip(depths, expected):
+            area, x_c, y_c = table.get_properties(new_dy)
+            assert abs(area - exact_area) < 1e-9
+            assert abs(x_c - exact_x) < 1e-9
+            assert abs(y_c - exact_y) < 1e-9
+
+    def test_other_placement_is_exact(self, tmp_path):
+        table = BuoyancyTable(BallonetParameters(), minor=False, new_dx=3, cache_dir=str(tmp_path))
+        assert table.get_area(-0.5, new_dx=2.5) == table.exact(-0.5, new_dx=2.5)[0]
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from app_utils import Parameters, get_cache_dir
+from batch_solver import BatchResult, PARAMETERS_DTYPE
+from metrics import METRICS_DTYPE, get_metrics
+
+DATABASE_NAME, TRAJECTORIES_NAME = 'catalog.sqlite', 'trajectories'
+
+# Каналы файла траекторий прогона (N, len(CHANNELS), T); строки читаются по одной через np.load(mmap_mode='r')
+CHANNELS = ('y', 'p', 'w', 'gamma')
+
+PARAMETER_COLUMNS = PARAMETERS_DTYPE.names
+METRIC_COLUMNS = METRICS_DTYPE.names
+RUN_COLUMNS = ('sweep', 'scenario', 'status', 'last_index', 'elapsed') + PARAMETER_COLUMNS + METRIC_COLUMNS
+
+# Индекс на каждый показатель, параметр и состояние: условия запросов - любые сочетания столбцов
+INDEXED_COLUMNS = ('status',) + METRIC_COLUMNS + PARAMETER_COLUMNS
+
+
+def quote(name: str) -> str:
+    return f'"{name}"'
+
+
+SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS sweeps (
+        id TEXT PRIMARY KEY,
+        name TEXT,
+        created REAL NOT NULL,
+        n_scenarios INTEGER NOT NULL,
+        n_points INTEGER,
+        t_start REAL,
+        eps REAL,
+        trajectories INTEGER NOT NULL
+    )""",
+    f"""CREATE TABLE IF NOT EXISTS runs (
+        sweep TEXT NOT NULL REFERENCES sweeps(id) ON DELETE CASCADE,
+        scenario INTEGER NOT NULL,
+        status INTEGER NOT NULL,
+        last_index INTEGER NOT NULL,
+        elapsed REAL,
+        {', '.join(f'{quote(name)} REAL NOT NULL' for name in PARAMETER_COLUMNS)},
+        {', '.join(f'{quote(name)} {"INTEGER" if name == "leakage" else "REAL"}' for name in METRIC_COLUMNS)},
+        PRIMARY KEY (sweep, scenario)
+    )""",
+    *(f"CREATE INDEX IF NOT EXISTS {quote('runs_' + name)} ON runs ({quote(name)})" for name in INDEXED_COLUMNS),
+]
+
+
+@dataclass
+class CatalogRun:
+    sweep: str
+    scenario: int
+    params: Parameters
+    metrics: dict[str, Any]  # METRICS; nan разошедшихся сценариев хранится как NULL и читается как None
+    status: int
+    last_index: int
+    elapsed: Optional[float]
+    catalog: 'Catalog' = field(repr=False, compare=False)
+
+    def load_trajectory(self) -> dict[str, np.ndarray]:
+        return self.catalog.load_trajectory(self.sweep, self.scenario)
+
+
+def get_sweep_id(arrays: dict[str, np.ndarray]) -> str:
+    # По содержимому: повторное добавление тех же результатов заменяет запись прогона, а не дублирует её
+    digest = hashlib.sha256()
+    for name in sorted(arrays):
+        digest.update(name.encode() + b'\0' + np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()[:32]
+
+
+class Catalog:
+    def __init__(self, directory: Optional[str] = None) -> None:
+        # Каталог прогонов параметров: SQLite-таблица runs (параметры, показатели metrics.py, состояние) с индексами
+        # по столбцам и файлы траекторий прогонов. Запрос читает только таблицу, траектория сценария загружается
+        # по требованию одной строкой файла
+        self.directory: str = directory or get_cache_dir('catalog')
+        os.makedirs(os.path.join(self.directory, TRAJECTORIES_NAME), exist_ok=True)
+        self.connection = sqlite3.connect(os.path.join(self.directory, DATABASE_NAME))
+        self.connection.execute('PRAGMA foreign_keys = ON')
+        with self.connection:
+            for statement in SCHEMA:
+                self.connection.execute(statement)
+        self.trajectories: dict[str, np.ndarray] = {}
+
+    def get_trajectory_path(self, sweep: str) -> str:
+        return os.path.join(self.directory, TRAJECTORIES_NAME, f"{sweep}.npy")
+
+    def add(self, result: BatchResult, name: Optional[str] = None, trajectories: bool = True,
+            dtype: str = 'float32') -> str:
+        # result - BatchResult или SweepResult; показатели считаются get_metrics()
+        arrays = {'scenarios': result.scenarios, 'metrics': get_metrics(result), 'status': result.status,
+                  'last_index': result.last_index}
+        if isinstance(getattr(result, 'elapsed', None), np.ndarray) and result.elapsed.shape == result.status.shape:
+            arrays['elapsed'] = result.elapsed
+        if trajectories:
+            arrays.update(t=result.t, **{channel: getattr(result, channel).astype(dtype) for channel in CHANNELS})
+        return self.add_arrays(arrays, name)
+
+    def add_arrays(self, arrays: dict[str, np.ndarray], name: Optional[str] = None) -> str:
+        # arrays - словарь вида batch_cli.save_results() / load_results(); без 'y', ... - только показатели
+        sweep = get_sweep_id(arrays)
+        stored = all(channel in arrays for channel in CHANNELS)
+        grid = (None, None, None)
+        if stored:
+            t = arrays['t']
+            if t.shape[0] < 2:
+                raise ValueError("Trajectories must have at least two time points")
+            grid = (t.shape[0], float(t[0]), float(t[1] - t[0]))
+            path = self.get_trajectory_path(sweep)
+            data = np.stack([arrays[channel] for channel in CHANNELS], axis=1)
+            with open(f"{path}.tmp", 'wb') as file:
+                np.save(file, data)
+            os.replace(f"{path}.tmp", path)
+            self.trajectories.pop(sweep, None)
+
+        scenarios, metrics = arrays['scenarios'], arrays['metrics']
+        elapsed = arrays.get('elapsed')
+        rows = [(sweep, i, int(arrays['status'][i]), int(arrays['last_index'][i]),
+                 None if elapsed is None else float(elapsed[i]),
+                 *(float(scenarios[i][column]) for column in PARAMETER_COLUMNS),
+                 *(None if metrics.dtype[column] == np.float64 and np.isnan(metrics[i][column])
+                   else metrics[i][column].item() for column in METRIC_COLUMNS))
+                for i in range(scenarios.shape[0])]
+        with self.connection:
+            self.connection.execute('DELETE FROM sweeps WHERE id = ?', (sweep,))
+            self.connection.execute('INSERT INTO sweeps VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                    (sweep, name, time.time(), scenarios.shape[0], *grid, int(stored)))
+            self.connection.executemany(
+                f"INSERT INTO runs ({', '.join(map(quote, RUN_COLUMNS))}) VALUES ({', '.join('?' * len(RUN_COLUMNS))})",
+                rows)
+        return sweep
+
+    def add_file(self, path: str, name: Optional[str] = None) -> str:
+        # Файл результатов batch_cli
+        with np.load(path) as data:
+            return self.add_arrays({key: data[key] for key in data.files}, name or os.path.basename(path))
+
+    def query(self, where: str = '', args: Sequence[Any] = (), order_by: Optional[str] = None,
+              limit: Optional[int] = None) -> list[CatalogRun]:
+        # where - условие SQL по столбцам RUN_COLUMNS, например "peak_p < ? AND final_y > ?" с args=(2500, 0.5).
+        # Сравнения с NULL ложны: разошедшиеся сценарии не проходят условия на вещественные показатели
+        sql = f"SELECT {', '.join(map(quote, RUN_COLUMNS))} FROM runs"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        runs = []
+        n_params = len(PARAMETER_COLUMNS)
+        for row in self.connection.execute(sql, tuple(args)):
+            sweep, scenario, status, last_index, elapsed = row[:5]
+            params = Parameters(**dict(zip(PARAMETER_COLUMNS, row[5:5 + n_params])))
+            metrics = dict(zip(METRIC_COLUMNS, row[5 + n_params:]))
+            metrics['leakage'] = bool(metrics['leakage'])
+            runs.append(CatalogRun(sweep=sweep, scenario=scenario, params=params, metrics=metrics, status=status,
+                                   last_index=last_index, elapsed=elapsed, catalog=self))
+        return runs
+
+    def count(self, where: str = '', args: Sequence[Any] = ()) -> int:
+        sql = "SELECT COUNT(*) FROM runs" + (f" WHERE {where}" if where else '')
+        return self.connection.execute(sql, tuple(args)).fetchone()[0]
+
+    def get_sweeps(self) -> list[dict[str, Any]]:
+        cursor = self.connection.execute('SELECT * FROM sweeps ORDER BY created')
+        names = [column[0] for column in cursor.description]
+        return [dict(zip(names, row)) for row in cursor]
+
+    def load_trajectory(self, sweep: str, scenario: int) -> dict[str, np.ndarray]:
+        # Файл прогона отображается в память один раз; копируется только строка сценария
+        row = self.connection.execute('SELECT n_points, t_start, eps, trajectories FROM sweeps WHERE id = ?',
+                                      (sweep,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown sweep: {sweep}")
+        n_points, t_start, eps, stored = row
+        if not stored:
+            raise ValueError(f"Sweep {sweep} was added without trajectories")
+        if sweep not in self.trajectories:
+            self.trajectories[sweep] = np.load(self.get_trajectory_path(sweep), mmap_mode='r')
+        data = np.array(self.trajectories[sweep][scenario])
+        return {'t': t_start + eps * np.arange(n_points), **dict(zip(CHANNELS, data))}
+
+    def remove(self, sweep: str) -> None:
+        self.trajectories.pop(sweep, None)
+        with self.connection:
+            self.connection.execute('DELETE FROM sweeps WHERE id = ?', (sweep,))
+        try:
+            os.remove(self.get_trajectory_path(sweep))
+        except FileNotFoundError:
+            pass
+
+    def close(self) -> None:
+        self.trajectories.clear()
+        self.connection.close()
+
+    def __enter__(self) -> 'Catalog':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,78 @@
+import os
+import struct
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+
+CHECKPOINT_MAGIC = b'HCCKPT02'
+# magic, решатель, итерация, n_steps, eps, длины векторов параметров, состояния, записи и монитора установления
+CHECKPOINT_HEADER = struct.Struct('<8sBqqdqqqq')
+
+SOLVERS = ('solve', 'solve_compiled')
+
+
+@dataclass
+class Checkpoint:
+    solver: str
+    iteration: int  # следующий шаг интегрирования
+    n_steps: int
+    eps: float
+    params: np.ndarray
+    state: np.ndarray  # SystemOfEquations.get_state()
+    recorder_state: np.ndarray  # Recorder.get_state(): курсоры выдачи и незавершённые корзины
+    monitor_state: np.ndarray = field(default_factory=lambda: np.empty(0))  # SteadyStateMonitor.get_state()
+
+
+@dataclass
+class CheckpointPolicy:
+    path: str
+    every_steps: Optional[int] = None
+    every_seconds: Optional[float] = None
+    last_iteration: int = field(default=0, init=False)
+    last_time: float = field(default_factory=time.perf_counter, init=False)
+
+    def __post_init__(self):
+        if self.every_steps is None and self.every_seconds is None:
+            raise ValueError("Set every_steps and/or every_seconds")
+
+    def is_due(self, iteration: int) -> bool:
+        if self.every_steps is not None and iteration - self.last_iteration >= self.every_steps:
+            return True
+        return self.every_seconds is not None and time.perf_counter() - self.last_time >= self.every_seconds
+
+    def reset(self, iteration: int) -> None:
+        self.last_iteration, self.last_time = iteration, time.perf_counter()
+
+
+def save_checkpoint(path: str, checkpoint: Checkpoint) -> None:
+    # Запись во временный файл и атомарная замена: прерванная запись не портит прошлую контрольную точку
+    header = CHECKPOINT_HEADER.pack(CHECKPOINT_MAGIC, SOLVERS.index(checkpoint.solver), checkpoint.iteration,
+                                    checkpoint.n_steps, checkpoint.eps, checkpoint.params.shape[0],
+                                    checkpoint.state.shape[0], checkpoint.recorder_state.shape[0],
+                                    checkpoint.monitor_state.shape[0])
+    with open(f"{path}.tmp", 'wb') as f:
+        f.write(header)
+        for values in (checkpoint.params, checkpoint.state, checkpoint.recorder_state, checkpoint.monitor_state):
+            f.write(np.ascontiguousarray(values, dtype='<f8').tobytes())
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(f"{path}.tmp", path)
+
+
+def load_checkpoint(path: str) -> Checkpoint:
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, solver, iteration, n_steps, eps, n_params, n_state, n_recorder, n_monitor = \
+        CHECKPOINT_HEADER.unpack_from(data)
+    if magic != CHECKPOINT_MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+    values = np.frombuffer(data, dtype='<f8', offset=CHECKPOINT_HEADER.size).astype(np.float64)
+    if values.shape[0] != n_params + n_state + n_recorder + n_monitor:
+        raise ValueError(f"Truncated checkpoint: {path}")
+    return Checkpoint(solver=SOLVERS[solver], iteration=iteration, n_steps=n_steps, eps=eps,
+                      params=values[:n_params],
+                      state=values[n_params:n_params + n_state],
+                      recorder_state=values[n_params + n_state:n_params + n_state + n_recorder],
+                      monitor_state=values[n_params + n_state + n_recorder:])
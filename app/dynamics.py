@@ -0,0 +1,165 @@
+import dataclasses
+from math import sqrt
+
+import numpy as np
+from numba import njit
+
+from app_utils import Parameters
+from buoyancy import get_submerged_area_jit, get_submerged_area_derivative_jit, place_arcs_jit, MAX_BREAKPOINTS
+
+# Индексы в векторе параметров (порядок полей Parameters)
+(PARAM_M, PARAM_RHO, PARAM_S, PARAM_G, PARAM_N, PARAM_P_A, PARAM_I, PARAM_L,
+ PARAM_XI, PARAM_A, PARAM_B, PARAM_C, PARAM_K, PARAM_H) = range(14)
+
+# Непрерывная система: z = (p, y, γ)
+Z_P, Z_Y, Z_GAMMA = range(3)
+
+P_MIN, P_MAX = 600, 2964
+
+
+def get_params_array(params: Parameters) -> np.ndarray:
+    return np.array(dataclasses.astuple(params), dtype=np.float64)
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_Q_in_scalar_jit(a, b, c, p):
+    D = b ** 2 - 4 * a * (c - p)
+    return max((-b - sqrt(D)) / (2 * a), (-b + sqrt(D)) / (2 * a))
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_W_scalar_jit(Ax, Ay, Bx, By, r):
+    # F_x(A, B, B.x - r) - F_x(A, B, A.x + r)
+    down, up = Ax + r, Bx - r
+    return (((By - Ay) * (up ** 2 / 2 - Ax * up) / (Bx - Ax) + Ay * up) -
+            ((By - Ay) * (down ** 2 / 2 - Ax * down) / (Bx - Ax) + Ay * down))
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_buoyancy_volume_jit(A_dx, A_dy, B_dx, B_dy, A_template, B_template, water_bounds, A_arcs, B_arcs,
+                            breakpoints):
+    # (dx, dy) - смещения баллонетов, как new_dx/new_dy в get_ballonet_coordinates;
+    # A_arcs, B_arcs и breakpoints (MAX_BREAKPOINTS,) - рабочие массивы вызывающего
+    surface, bottom, left, right = water_bounds[0], water_bounds[1], water_bounds[2], water_bounds[3]
+    return (get_submerged_area_jit(place_arcs_jit(A_template, A_dx, A_dy, A_arcs), surface, bottom, left, right,
+                                   breakpoints) +
+            get_submerged_area_jit(place_arcs_jit(B_template, B_dx, B_dy, B_arcs), surface, bottom, left, right,
+                                   breakpoints))
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_rhs_jit(z, params, r, A_template, B_template, water_bounds):
+    # Предел явной схемы solve() при eps -> 0: y и γ в ней интегрируются как уравнения первого порядка,
+    # а поправка dW_dt = W - W_prev имеет порядок eps и исчезает
+    m, rho, S, g = params[PARAM_M], params[PARAM_RHO], params[PARAM_S], params[PARAM_G]
+    n, p_a, I, l = params[PARAM_N], params[PARAM_P_A], params[PARAM_I], params[PARAM_L]
+    xi, h = params[PARAM_XI], params[PARAM_H]
+    y = z[Z_Y]
+    Ax, Ay, Bx, By = -l, y, l, y
+
+    # Промежуточные стадии могут выйти за ограничения давления; расходы считаются, как в solve(),
+    # для давления в пределах [P_MIN, P_MAX] (за P_MAX дискриминант Q_in становится отрицательным)
+    p = min(max(z[Z_P], P_MIN), P_MAX)
+    S_gap = max(0.0, Ay - h) + max(0.0, By - h)
+    Q_in = get_Q_in_scalar_jit(params[PARAM_A], params[PARAM_B], params[PARAM_C], p)
+    Q_out = xi * sqrt(2 * p / rho) * S_gap
+    W = get_W_scalar_jit(Ax, Ay, Bx, By, r)
+
+    dz = np.empty(3)
+    dz[Z_P] = (n * p_a) / W * (Q_in - Q_out)
+    # Ограничение давления: производная, выводящая p за пределы [P_MIN, P_MAX], обнуляется
+    if (z[Z_P] >= P_MAX and dz[Z_P] > 0) or (z[Z_P] <= P_MIN and dz[Z_P] < 0):
+        dz[Z_P] = 0.0
+
+    V = get_buoyancy_volume_jit(Ax, Ay - h, Bx, By - h, A_template, B_template, water_bounds,
+                                np.empty_like(A_template), np.empty_like(B_template), np.empty(MAX_BREAKPOINTS))
+    F_a = rho * g * V
+    dz[Z_Y] = (S * p + F_a - m * g) / m
+    dz[Z_GAMMA] = (F_a * l * Ay / sqrt(Ax ** 2 + Ay ** 2)) / I
+    return dz
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_jacobian_jit(z, params, r, A_template, B_template, water_bounds):
+    # Аналитическая матрица Якоби get_rhs_jit по z = (p, y, γ)
+    m, rho, S, g = params[PARAM_M], params[PARAM_RHO], params[PARAM_S], params[PARAM_G]
+    n, p_a, I, l = params[PARAM_N], params[PARAM_P_A], params[PARAM_I], params[PARAM_L]
+    a, xi, h = params[PARAM_A], params[PARAM_XI], params[PARAM_H]
+    y = z[Z_Y]
+    Ax, Ay, Bx, By = -l, y, l, y
+    surface, bottom, left, right = water_bounds[0], water_bounds[1], water_bounds[2], water_bounds[3]
+
+    p = min(max(z[Z_P], P_MIN), P_MAX)
+    p_inside = 1.0 if P_MIN < z[Z_P] < P_MAX else 0.0
+    S_gap = max(0.0, Ay - h) + max(0.0, By - h)
+    dS_gap_dy = (1.0 if Ay > h else 0.0) + (1.0 if By > h else 0.0)
+    Q_in = get_Q_in_scalar_jit(a, params[PARAM_B], params[PARAM_C], p)
+    Q_out = xi * sqrt(2 * p / rho) * S_gap
+    W = get_W_scalar_jit(Ax, Ay, Bx, By, r)
+    dW_dy = (Bx - r) - (Ax + r)
+
+    # Q_in - больший корень a Q^2 + b Q + c - p = 0
+    dQ_in_dp = 1 / (2 * a * Q_in + params[PARAM_B]) * p_inside
+    dQ_out_dp = xi * S_gap / sqrt(2 * p * rho) * p_inside
+    dQ_out_dy = xi * sqrt(2 * p / rho) * dS_gap_dy
+
+    A_arcs = place_arcs_jit(A_template, Ax, Ay - h, np.empty_like(A_template))
+    B_arcs = place_arcs_jit(B_template, Bx, By - h, np.empty_like(B_template))
+    breakpoints = np.empty(MAX_BREAKPOINTS)
+    V = (get_submerged_area_jit(A_arcs, surface, bottom, left, right, breakpoints) +
+         get_submerged_area_jit(B_arcs, surface, bottom, left, right, breakpoints))
+    dV_dy = (get_submerged_area_derivative_jit(A_arcs, surface, bottom, left, right, breakpoints) +
+             get_submerged_area_derivative_jit(B_arcs, surface, bottom, left, right, breakpoints))
+    F_a = rho * g * V
+    norm = sqrt(Ax ** 2 + Ay ** 2)
+
+    jac = np.zeros((3, 3))
+    dp_dt = (n * p_a) / W * (Q_in - Q_out)
+    if not ((z[Z_P] >= P_MAX and dp_dt > 0) or (z[Z_P] <= P_MIN and dp_dt < 0)):
+        jac[Z_P, Z_P] = (n * p_a) / W * (dQ_in_dp - dQ_out_dp)
+        jac[Z_P, Z_Y] = -(n * p_a) / W ** 2 * dW_dy * (Q_in - Q_out) - (n * p_a) / W * dQ_out_dy
+    jac[Z_Y, Z_P] = S / m
+    jac[Z_Y, Z_Y] = rho * g * dV_dy / m
+    jac[Z_GAMMA, Z_Y] = l / I * (rho * g * dV_dy * Ay / norm + F_a * Ax ** 2 / norm ** 3)
+    return jac
+
+
+# Входы линеаризованной системы: возвышение воды над баллонетами A и B и добавка к напору вентилятора
+U_WAVE_A, U_WAVE_B, U_FAN = range(3)
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_input_matrix_jit(z, params, r, A_template, B_template, water_bounds):
+    # Производные get_rhs_jit по входам. Подъём воды на η равносилен опусканию баллонета на η;
+    # добавка δ к напору вентилятора p = a Q^2 + b Q + c + δ равносильна Q_in(p - δ)
+    m, rho, g = params[PARAM_M], params[PARAM_RHO], params[PARAM_G]
+    n, p_a, I, l = params[PARAM_N], params[PARAM_P_A], params[PARAM_I], params[PARAM_L]
+    a, xi, h = params[PARAM_A], params[PARAM_XI], params[PARAM_H]
+    y = z[Z_Y]
+    Ax, Ay, Bx, By = -l, y, l, y
+    surface, bottom, left, right = water_bounds[0], water_bounds[1], water_bounds[2], water_bounds[3]
+
+    p = min(max(z[Z_P], P_MIN), P_MAX)
+    p_inside = 1.0 if P_MIN < z[Z_P] < P_MAX else 0.0
+    S_gap = max(0.0, Ay - h) + max(0.0, By - h)
+    Q_in = get_Q_in_scalar_jit(a, params[PARAM_B], params[PARAM_C], p)
+    Q_out = xi * sqrt(2 * p / rho) * S_gap
+    W = get_W_scalar_jit(Ax, Ay, Bx, By, r)
+    dQ_in_dp = 1 / (2 * a * Q_in + params[PARAM_B]) * p_inside
+
+    A_arcs = place_arcs_jit(A_template, Ax, Ay - h, np.empty_like(A_template))
+    B_arcs = place_arcs_jit(B_template, Bx, By - h, np.empty_like(B_template))
+    breakpoints = np.empty(MAX_BREAKPOINTS)
+    dV_dy_A = get_submerged_area_derivative_jit(A_arcs, surface, bottom, left, right, breakpoints)
+    dV_dy_B = get_submerged_area_derivative_jit(B_arcs, surface, bottom, left, right, breakpoints)
+    moment = l * Ay / sqrt(Ax ** 2 + Ay ** 2) / I
+
+    u = np.zeros((3, 3))
+    dp_dt = (n * p_a) / W * (Q_in - Q_out)
+    if not ((z[Z_P] >= P_MAX and dp_dt > 0) or (z[Z_P] <= P_MIN and dp_dt < 0)):
+        u[Z_P, U_FAN] = -(n * p_a) / W * dQ_in_dp
+    u[Z_Y, U_WAVE_A] = -rho * g * dV_dy_A / m
+    u[Z_Y, U_WAVE_B] = -rho * g * dV_dy_B / m
+    u[Z_GAMMA, U_WAVE_A] = -rho * g * dV_dy_A * moment
+    u[Z_GAMMA, U_WAVE_B] = -rho * g * dV_dy_B * moment
+    return u
@@ -0,0 +1,109 @@
+from dataclasses import dataclass
+from typing import Iterable
+
+import numpy as np
+from numba import njit, prange
+
+from app_utils import Parameters, BallonetParameters
+from batch_solver import SAFE_FASTMATH
+from buoyancy import get_ballonet_arcs, WATER_BOUNDS
+from dynamics import get_input_matrix_jit, U_WAVE_A, U_WAVE_B, U_FAN, Z_P, Z_Y, Z_GAMMA
+from plot_balloons import get_ballonet_stations
+from stability import StabilityMap, analyze_batch, get_params_matrix
+from waves import SeaState, get_spectrum, G
+
+# Входы передаточных функций: амплитуда волны (станции баллонетов со сдвигом фаз по длине судна)
+# и добавка к напору вентилятора, Па
+INPUT_WAVE, INPUT_FAN = range(2)
+
+
+@njit(fastmath=SAFE_FASTMATH, parallel=True, error_model='numpy', cache=True)
+def get_input_batch_jit(params, r, A_template, B_template, water_bounds, trim, inputs):
+    for i in prange(params.shape[0]):
+        inputs[i] = get_input_matrix_jit(trim[i], params[i], r, A_template, B_template, water_bounds)
+
+
+def get_transfer_functions(jacobian: np.ndarray, inputs: np.ndarray, omega: np.ndarray) -> np.ndarray:
+    # H(iω) = (iωE - J)^{-1} B для (N, 3, 3) матриц J и (N, 3, M) матриц B:
+    # вся сетка частот - одно пакетное комплексное решение, результат (N, K, 3, M)
+    system = 1j * omega[:, None, None] * np.eye(3) - jacobian[:, None]
+    return np.linalg.solve(system, np.broadcast_to(inputs[:, None], system.shape[:-1] + inputs.shape[-1:]))
+
+
+def get_stations(ballonet_params: BallonetParameters, l: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Станции волнения SystemOfEquations без тангажа: линеаризованная модель ставит баллонеты так же
+    return get_ballonet_stations(ballonet_params, l)
+
+
+@dataclass
+class ResponseStatistics:
+    std: np.ndarray  # (N, 3): σ отклика z = (p, y, γ) на волнение
+    significant: np.ndarray  # 4σ - значительная высота (размах) отклика
+    zero_crossing_period: np.ndarray  # 2π sqrt(m0 / m2), с
+
+
+@dataclass
+class FrequencyResponse:
+    omega: np.ndarray  # (K,), рад/с
+    stability: StabilityMap
+    transfer: np.ndarray  # (N, K, 3, 2), комплексные: отклик z на единичную волну (INPUT_WAVE) и напор (INPUT_FAN)
+
+    def __len__(self) -> int:
+        return self.transfer.shape[0]
+
+    @property
+    def heave(self) -> np.ndarray:
+        # (N, K, 2): м на м волны и м на Па напора
+        return self.transfer[:, :, Z_Y]
+
+    @property
+    def pitch(self) -> np.ndarray:
+        # (N, K, 2): рад на м волны и рад на Па напора
+        return self.transfer[:, :, Z_GAMMA]
+
+    @property
+    def pressure(self) -> np.ndarray:
+        return self.transfer[:, :, Z_P]
+
+    def get_statistics(self, sea: SeaState) -> ResponseStatistics:
+        # Спектр отклика |H(ω)|² S(ω) и его моменты m0, m2 по сетке omega (метод трапеций).
+        # Сетка должна покрывать полосу спектра волнения
+        spectrum = np.abs(self.transfer[:, :, :, INPUT_WAVE]) ** 2 * get_spectrum(self.omega, sea)[:, None]
+        m0 = np.trapz(spectrum, self.omega, axis=1)
+        m2 = np.trapz(spectrum * self.omega[:, None] ** 2, self.omega, axis=1)
+        std = np.sqrt(m0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            period = 2 * np.pi * np.sqrt(m0 / m2)
+        return ResponseStatistics(std=std, significant=4 * std, zero_crossing_period=period)
+
+
+def get_frequency_response(scenarios: np.ndarray | Iterable[Parameters],
+                           ballonet_params: BallonetParameters,
+                           omega: np.ndarray,
+                           water_bounds: tuple = WATER_BOUNDS,
+                           gamma: float = 0.0) -> FrequencyResponse:
+    # Передаточные функции линеаризованной в точке равновесия системы (analyze_batch) для N сценариев.
+    # Волна длиннохребтовая, как в waves.get_elevation: η = a cos(ωt - kx) приходит на баллонеты
+    # с фазами -k x_A и -k x_B. Нейтральная мода γ даёт у тангажа особенность ω = 0 - сетка положительна
+    omega = np.asarray(omega, dtype=np.float64)
+    if omega.ndim != 1 or np.any(omega <= 0):
+        raise ValueError("omega must be a one-dimensional array of positive frequencies")
+
+    scenarios, params = get_params_matrix(scenarios)
+    stability = analyze_batch(scenarios, ballonet_params, water_bounds, gamma=gamma)
+    inputs = np.empty((len(stability), 3, 3))
+    get_input_batch_jit(params, float(ballonet_params.AD.r),
+                        get_ballonet_arcs(ballonet_params, minor=True),
+                        get_ballonet_arcs(ballonet_params, minor=False),
+                        np.array(water_bounds, dtype=np.float64), stability.trim, inputs)
+
+    transfer = np.full((len(stability), omega.shape[0], 3, 2), np.nan, dtype=np.complex128)
+    valid = stability.converged & np.all(np.isfinite(stability.jacobian), axis=(1, 2))
+    response = get_transfer_functions(stability.jacobian[valid], inputs[valid], omega)
+
+    A_x, B_x = get_stations(ballonet_params, scenarios['l'][valid])
+    k = omega ** 2 / G
+    transfer[valid, :, :, INPUT_WAVE] = (response[..., U_WAVE_A] * np.exp(-1j * np.outer(A_x, k))[..., None] +
+                                         response[..., U_WAVE_B] * np.exp(-1j * np.outer(B_x, k))[..., None])
+    transfer[valid, :, :, INPUT_FAN] = response[..., U_FAN]
+    return FrequencyResponse(omega=omega, stability=stability, transfer=transfer)
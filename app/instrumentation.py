@@ -0,0 +1,141 @@
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+# Фазы шага solve(): имя в отчёте -> метод SystemOfEquations
+PHASES = {
+    'dp_dt': 'update_pressure',
+    'W': 'update_W',
+    'S_gap': 'update_S_gap',
+    'update_water': 'update_water',
+    'get_cylinder_volume': 'get_cylinder_volume',
+    'update_ballonet_polygons': 'update_ballonet_polygons',
+    'recording': 'record',
+    'steady_state': 'update_monitor',
+    'checkpoint': 'save_checkpoint',
+}
+
+# Дополнительные захваты: HOVERCRAFT_PROFILE=cprofile,tracemalloc
+PROFILE_ENV = 'HOVERCRAFT_PROFILE'
+CAPTURES = ('cprofile', 'tracemalloc')
+
+# Строк статистики cProfile в отчёте
+PROFILE_TOP = 25
+
+
+def get_captures() -> tuple[str, ...]:
+    captures = tuple(name.strip().lower() for name in os.environ.get(PROFILE_ENV, '').split(',') if name.strip())
+    for name in captures:
+        if name not in CAPTURES:
+            raise ValueError(f"Unknown capture in {PROFILE_ENV}: {name}. Use any of {CAPTURES}")
+    return captures
+
+
+def get_peak_rss() -> Optional[int]:
+    # Пиковый размер резидентной памяти процесса, байт (ru_maxrss - в КиБ на Linux, в байтах на macOS)
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class Instrumentation:
+    def __init__(self, captures: Optional[tuple[str, ...]] = None) -> None:
+        # Накопительные таймеры и счётчики фаз solve(). Методы фаз подменяются обёртками только на
+        # экземпляре системы (attach()), поэтому без инструментирования цикл solve() не меняется
+        self.captures: tuple[str, ...] = get_captures() if captures is None else captures
+        self.times: dict[str, float] = dict.fromkeys(PHASES, 0.0)
+        self.counts: dict[str, int] = dict.fromkeys(PHASES, 0)
+        self.total: float = 0.0
+        self.iterations: int = 0
+        self.peak_rss: Optional[int] = None
+        self.peak_traced: Optional[int] = None
+        self.profile: Optional[cProfile.Profile] = None
+        self.tracing: bool = False  # tracemalloc запущен здесь, а не вызывающим кодом
+        self.started: float = 0.0
+
+    def wrap(self, phase: str, func: Callable) -> Callable:
+        times, counts, clock = self.times, self.counts, time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                times[phase] += clock() - start
+                counts[phase] += 1
+        return timed
+
+    def attach(self, system: Any) -> None:
+        for phase, method in PHASES.items():
+            setattr(system, method, self.wrap(phase, getattr(system, method)))
+
+    def detach(self, system: Any) -> None:
+        for method in PHASES.values():
+            system.__dict__.pop(method, None)
+
+    def start(self) -> None:
+        if 'tracemalloc' in self.captures:
+            self.tracing = not tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        if 'cprofile' in self.captures:
+            self.profile = self.profile or cProfile.Profile()
+            self.profile.enable()
+        self.started = time.perf_counter()
+
+    def stop(self, iterations: int) -> None:
+        self.total += time.perf_counter() - self.started
+        self.iterations += iterations
+        if self.profile is not None:
+            self.profile.disable()
+        if 'tracemalloc' in self.captures:
+            self.peak_traced = max(self.peak_traced or 0, tracemalloc.get_traced_memory()[1])
+            if self.tracing:
+                tracemalloc.stop()
+        self.peak_rss = get_peak_rss()
+
+    def get_profile_stats(self, top: int = PROFILE_TOP) -> list[dict]:
+        if self.profile is None:
+            return []
+        stats = pstats.Stats(self.profile, stream=io.StringIO())
+        rows = []
+        for (path, line, name), (_, n_calls, own, cumulative, _) in stats.stats.items():
+            rows.append({'function': f"{os.path.basename(path)}:{line}({name})", 'n_calls': n_calls,
+                         'own_time': own, 'cumulative_time': cumulative})
+        return sorted(rows, key=lambda row: row['cumulative_time'], reverse=True)[:top]
+
+    def report(self) -> dict:
+        # Время вне перечисленных фаз (уравнения y и γ, расстановка точек A и B с тангажем, цикл и вызов наблюдателя
+        # progress) - в 'other'
+        phases = {phase: {'time': self.times[phase], 'count': self.counts[phase],
+                          'share': self.times[phase] / self.total if self.total else 0.0}
+                  for phase in PHASES}
+        other = self.total - sum(self.times.values())
+        return {'total': self.total,
+                'iterations': self.iterations,
+                'time_per_iteration': self.total / self.iterations if self.iterations else 0.0,
+                'phases': phases,
+                'other': {'time': other, 'share': other / self.total if self.total else 0.0},
+                'peak_rss': self.peak_rss,
+                'peak_traced': self.peak_traced,
+                'profile': self.get_profile_stats()}
+
+    def save(self, path: str) -> None:
+        # Отчёт в JSON; при захвате cProfile рядом - полная статистика <path>.prof для pstats/snakeviz
+        with open(path, 'w') as file:
+            json.dump(self.report(), file, indent=2)
+        if self.profile is not None:
+            self.profile.dump_stats(os.path.splitext(path)[0] + '.prof')
@@ -0,0 +1,267 @@
+from dataclasses import dataclass, field
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+# Таблица Бутчера Дормана-Принса 5(4) и коэффициенты плотной выдачи 4-го порядка
+DP_C = np.array([0, 1 / 5, 3 / 10, 4 / 5, 8 / 9, 1])
+DP_A = (
+    (),
+    (1 / 5,),
+    (3 / 40, 9 / 40),
+    (44 / 45, -56 / 15, 32 / 9),
+    (19372 / 6561, -25360 / 2187, 64448 / 6561, -212 / 729),
+    (9017 / 3168, -355 / 33, 46732 / 5247, 49 / 176, -5103 / 18656),
+)
+DP_B = np.array([35 / 384, 0, 500 / 1113, 125 / 192, -2187 / 6784, 11 / 84, 0])
+DP_E = np.array([-71 / 57600, 0, 71 / 16695, -71 / 1920, 17253 / 339200, -22 / 525, 1 / 40])
+DP_P = np.array([
+    [1, -8048581381 / 2820520608, 8663915743 / 2820520608, -12715105075 / 11282082432],
+    [0, 0, 0, 0],
+    [0, 131558114200 / 32700410799, -68118460800 / 10900136933, 87487479700 / 32700410799],
+    [0, -1754552775 / 470086768, 14199869525 / 1410260304, -10690763975 / 1880347072],
+    [0, 127303824393 / 49829197408, -318862633887 / 49829197408, 701980252875 / 199316789632],
+    [0, -282668133 / 205662961, 2019193451 / 616988883, -1453857185 / 822651844],
+    [0, 40617522 / 29380423, -110615467 / 29380423, 69997945 / 29380423],
+])
+
+SAFETY, MIN_FACTOR, MAX_FACTOR = 0.9, 0.2, 10.0
+
+# Классы scipy.integrate; scipy импортируется при первом неявном интегрировании
+IMPLICIT_METHODS = ('BDF', 'Radau')
+
+
+@dataclass
+class Event:
+    name: str
+    function: Callable[[float, np.ndarray], float]
+    direction: int = 0  # 1 - только при росте function, -1 - только при убывании, 0 - оба
+    action: Optional[Callable[[float, np.ndarray], np.ndarray]] = None  # коррекция состояния в момент события
+
+
+@dataclass
+class IntegrationResult:
+    t: np.ndarray
+    z: np.ndarray
+    events: list[tuple[float, str]] = field(default_factory=list)
+    n_steps: int = 0
+    n_rejected: int = 0
+    n_rhs: int = 0
+
+
+def _dense(z0: np.ndarray, h: float, Q: np.ndarray, theta: float | np.ndarray) -> np.ndarray:
+    theta = np.atleast_1d(theta)
+    powers = np.cumprod(np.repeat(theta[:, None], 4, axis=1), axis=1)
+    return z0 + h * powers @ Q.T
+
+
+def _error_norm(err: np.ndarray, z0: np.ndarray, z1: np.ndarray, rtol: float, atol: np.ndarray) -> float:
+    scale = atol + rtol * np.maximum(np.abs(z0), np.abs(z1))
+    return float(np.sqrt(np.mean((err / scale) ** 2)))
+
+
+def _triggered(event: Event, g0: float, g1: float) -> bool:
+    if event.direction >= 0 and g0 < 0 < g1:
+        return True
+    return event.direction <= 0 and g0 > 0 > g1
+
+
+def _locate(event: Event, dense: Callable[[float], np.ndarray], t0: float, t1: float, g0: float) -> float:
+    # Бисекция по плотной выдаче; возвращается правый край интервала, где знак уже сменился,
+    # чтобы после перезапуска событие не сработало повторно
+    lo, hi = t0, t1
+    while hi - lo > 1e-13 * max(1.0, abs(t0)):
+        mid = (lo + hi) / 2
+        g_mid = event.function(mid, dense(mid))
+        if g_mid == 0 or (g_mid > 0) != (g0 > 0):
+            hi = mid
+        else:
+            lo = mid
+    return hi
+
+
+def _first_event(events: Sequence[Event], dense: Callable[[float], np.ndarray],
+                 t0: float, z0: np.ndarray, t1: float, z1: np.ndarray) -> tuple[Optional[Event], float]:
+    fired, t_event = None, t1
+    for event in events:
+        g0, g1 = event.function(t0, z0), event.function(t1, z1)
+        if _triggered(event, g0, g1):
+            t_located = _locate(event, dense, t0, t1, g0)
+            if fired is None or t_located < t_event:
+                fired, t_event = event, t_located
+    return fired, t_event
+
+
+def _initial_step(rhs, t0, z0, f0, rtol, atol) -> float:
+    scale = atol + rtol * np.abs(z0)
+    d0, d1 = np.sqrt(np.mean((z0 / scale) ** 2)), np.sqrt(np.mean((f0 / scale) ** 2))
+    h0 = 1e-6 if d0 < 1e-5 or d1 < 1e-5 else 0.01 * d0 / d1
+    f1 = rhs(t0 + h0, z0 + h0 * f0)
+    d2 = np.sqrt(np.mean(((f1 - f0) / scale) ** 2)) / h0
+    h1 = max(1e-6, h0 * 1e-3) if max(d1, d2) <= 1e-15 else (0.01 / max(d1, d2)) ** (1 / 5)
+    return min(100 * h0, h1)
+
+
+def dormand_prince(rhs: Callable[[float, np.ndarray], np.ndarray],
+                   z0: np.ndarray,
+                   t_eval: np.ndarray,
+                   rtol: float = 1e-6,
+                   atol: float | np.ndarray = 1e-8,
+                   events: Sequence[Event] = (),
+                   max_step: float = np.inf,
+                   first_step: Optional[float] = None) -> IntegrationResult:
+
+    t, t_end = float(t_eval[0]), float(t_eval[-1])
+    z = np.asarray(z0, dtype=np.float64).copy()
+    atol = np.broadcast_to(np.asarray(atol, dtype=np.float64), z.shape)
+
+    result = IntegrationResult(t=np.asarray(t_eval, dtype=np.float64), z=np.empty((len(t_eval), z.size)))
+    result.z[0] = z
+    next_out = 1
+
+    f = rhs(t, z)
+    result.n_rhs += 1
+    h = first_step or _initial_step(rhs, t, z, f, rtol, atol)
+    result.n_rhs += 1
+    K = np.empty((7, z.size))
+
+    while t < t_end:
+        h = min(h, max_step)
+        last = h >= t_end - t
+        if last:
+            h = t_end - t
+
+        K[0] = f
+        for stage in range(1, 6):
+            K[stage] = rhs(t + DP_C[stage] * h, z + h * np.dot(DP_A[stage], K[:stage]))
+        z_new = z + h * DP_B[:6] @ K[:6]
+        f_new = rhs(t + h, z_new)
+        K[6] = f_new
+        result.n_rhs += 6
+
+        error = _error_norm(h * DP_E @ K, z, z_new, rtol, atol)
+        if error > 1:
+            h *= max(MIN_FACTOR, SAFETY * error ** -0.2)
+            result.n_rejected += 1
+            continue
+
+        result.n_steps += 1
+        Q = K.T @ DP_P
+        t_new = t_end if last else t + h
+
+        def dense(t_out: float, t0=t, z0=z, h=h, Q=Q) -> np.ndarray:
+            return _dense(z0, h, Q, (t_out - t0) / h)[0]
+
+        # Самое раннее событие на шаге: шаг обрезается по нему, интегрирование перезапускается
+        fired, t_event = _first_event(events, dense, t, z, t_new, z_new)
+        if fired is not None:
+            t_new, z_new = t_event, dense(t_event)
+
+        while next_out < len(t_eval) and t_eval[next_out] <= t_new:
+            result.z[next_out] = dense(t_eval[next_out])
+            next_out += 1
+
+        if fired is not None:
+            result.events.append((t_new, fired.name))
+            if fired.action is not None:
+                z_new = fired.action(t_new, z_new)
+            f_new = rhs(t_new, z_new)
+            result.n_rhs += 1
+
+        t, z, f = t_new, z_new, f_new
+        factor = MAX_FACTOR if error == 0 else min(MAX_FACTOR, SAFETY * error ** -0.2)
+        h *= factor
+
+    result.z[next_out:] = z
+    return result
+
+
+def integrate_implicit(rhs: Callable[[float, np.ndarray], np.ndarray],
+                       jac: Optional[Callable[[float, np.ndarray], np.ndarray]],
+                       z0: np.ndarray,
+                       t_eval: np.ndarray,
+                       method: str = 'BDF',
+                       rtol: float = 1e-6,
+                       atol: float | np.ndarray = 1e-8,
+                       events: Sequence[Event] = (),
+                       max_step: float = np.inf) -> IntegrationResult:
+    # Неявные методы scipy (BDF, Radau) по шагам; события обрабатываются так же, как в dormand_prince:
+    # шаг обрезается по событию, решатель перезапускается из скорректированного состояния
+    if method not in IMPLICIT_METHODS:
+        raise ValueError(f"Unknown implicit method: {method}. Use one of {IMPLICIT_METHODS}")
+    import scipy.integrate
+    solver_class = getattr(scipy.integrate, method)
+
+    t, t_end = float(t_eval[0]), float(t_eval[-1])
+    z = np.asarray(z0, dtype=np.float64).copy()
+    result = IntegrationResult(t=np.asarray(t_eval, dtype=np.float64), z=np.empty((len(t_eval), z.size)))
+    result.z[0] = z
+    next_out = 1
+
+    def make_solver(t_start: float, z_start: np.ndarray):
+        return solver_class(rhs, t_start, z_start, t_end, rtol=rtol, atol=atol, jac=jac, max_step=max_step)
+
+    solver = make_solver(t, z)
+    while solver.status == 'running':
+        message = solver.step()
+        if solver.status == 'failed':
+            raise RuntimeError(f"{method} failed at t={solver.t}: {message}")
+        result.n_steps += 1
+
+        t_new, z_new = solver.t, solver.y.copy()
+        dense_output = solver.dense_output()
+        fired, t_event = _first_event(events, dense_output, t, z, t_new, z_new)
+        if fired is not None:
+            t_new, z_new = t_event, dense_output(t_event)
+
+        while next_out < len(t_eval) and t_eval[next_out] <= t_new:
+            result.z[next_out] = dense_output(t_eval[next_out])
+            next_out += 1
+
+        if fired is not None:
+            result.events.append((t_new, fired.name))
+            if fired.action is not None:
+                z_new = fired.action(t_new, z_new)
+            result.n_rhs += solver.nfev
+            solver = make_solver(t_new, z_new)
+        t, z = t_new, z_new
+
+    result.n_rhs += solver.nfev
+    result.z[next_out:] = z
+    return result
+
+
+if __name__ == '__main__':
+    import time
+    from app_utils import Parameters, BallonetParameters
+    from solve_eq import SystemOfEquations
+
+    # Сравнение явной схемы solve_compiled() с адаптивными методами по точности y(t) относительно eps = 1e-5
+    t_end, out_step = 10, 1e-3
+    reference = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=t_end, eps=1e-5, buoyancy='analytic')
+    reference.solve_compiled()
+    y_reference = reference.y_array[::int(round(out_step / 1e-5))]
+
+    for eps in (1e-3, 1e-4):
+        system = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=t_end, eps=eps, buoyancy='analytic')
+        system.solve_compiled()
+        start = time.perf_counter()
+        system = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=t_end, eps=eps, buoyancy='analytic')
+        system.solve_compiled()
+        elapsed = time.perf_counter() - start
+        error = np.max(np.abs(system.y_array[::int(round(out_step / eps))] - y_reference))
+        print(f"euler eps={eps:g}: steps={system.current_iteration}, time={elapsed:.3f}s, max |Δy|={error:.2e}")
+
+    for method in ('dopri5', 'BDF', 'Radau'):
+        SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=0.1, eps=out_step,
+                          buoyancy='analytic').solve_adaptive(method=method)
+        for rtol in (1e-3, 1e-6):
+            system = SystemOfEquations(Parameters(h=1), BallonetParameters(), t_end=t_end, eps=out_step,
+                                       buoyancy='analytic')
+            start = time.perf_counter()
+            system.solve_adaptive(method=method, rtol=rtol)
+            elapsed = time.perf_counter() - start
+            error = np.max(np.abs(system.y_array - y_reference))
+            print(f"{method} rtol={rtol:g}: steps={system.integration_stats['n_steps']}, "
+                  f"mean step={t_end / system.integration_stats['n_steps']:.2e}s, "
+                  f"time={elapsed:.3f}s, max |Δy|={error:.2e}")
@@ -0,0 +1,95 @@
+import importlib
+import time
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from numba import types
+
+# Все ядра объявлены с cache=True: машинный код сохраняется в __pycache__ рядом с модулем
+# (или в NUMBA_CACHE_DIR) и в новом процессе загружается с диска вместо компиляции.
+# Кэш сбрасывается сам при изменении исходника модуля ядра
+
+F4_1D = types.float32[::1]  # Point.to_array()
+F8, I8 = types.float64, types.int64
+F8_1D, F8_2D, F8_3D = types.float64[::1], types.float64[:, ::1], types.float64[:, :, ::1]
+I8_1D, B_1D = types.int64[::1], types.boolean[::1]
+
+# Аргументы ядер dynamics
+RHS = (F8_1D, F8_1D, F8, F8_2D, F8_2D, F8_1D)  # z, params, r, A_template, B_template, water_bounds
+
+# Группы ядер по путям решателя
+GROUPS = ('solve', 'compiled', 'analysis')
+
+
+@dataclass(frozen=True)
+class Kernel:
+    module: str
+    name: str
+    signatures: tuple[tuple, ...]
+    group: str
+
+    @property
+    def qualname(self) -> str:
+        return f"{self.module}.{self.name}"
+
+    def get_dispatcher(self):
+        return getattr(importlib.import_module(self.module), self.name)
+
+
+# Точки входа, вызываемые из Python. Ядра, вызываемые только из других ядер, компилируются
+# и кэшируются вместе с ними
+KERNELS: tuple[Kernel, ...] = (
+    # solve(): явная схема по шагам
+    Kernel('solve_eq', 'F_x_jit', ((F4_1D, F4_1D, F8),), 'solve'),
+    Kernel('solve_eq', 'get_S_gap_jit', ((F4_1D, F8),), 'solve'),
+    Kernel('solve_eq', 'get_Q_in_jit', ((F8, F8, F8, F8),), 'solve'),
+    Kernel('solve_eq', 'get_Q_out_jit', ((F8, F8, F8, F8),), 'solve'),
+    Kernel('solve_eq', 'get_d2y_dt2_jit', ((F8, F8, F8, F8),), 'solve'),
+    Kernel('solve_eq', 'get_cos_alpha_jit', ((F4_1D, types.Omitted(None)),), 'solve'),
+    Kernel('solve_eq', 'clamp_jit', ((F8, I8, I8),), 'solve'),
+    Kernel('buoyancy', 'transform_arcs_jit', ((F8_2D, F8, F8, F8, F8_2D),), 'solve'),
+    Kernel('buoyancy', 'get_submerged_area_jit', ((F8_2D, F8, F8, F8, F8, F8_1D),), 'solve'),
+    Kernel('buoyancy', 'get_submerged_polygon_jit', ((F8_2D, F8_1D, F8_1D, F8, F8, F8),), 'solve'),
+    Kernel('buoyancy_table', 'interpolate_table_jit', ((F8, F8, F8_2D, F8_2D, F8),), 'solve'),
+    # solve_compiled(), solve_batch(), прогоны параметров
+    Kernel('solve_kernel', 'euler_steps_jit',
+           ((*RHS, F8, I8, I8, F8_1D, F8_1D, F8_1D, F8_1D, F8_2D, F8_2D),), 'compiled'),
+    Kernel('batch_solver', 'euler_batch_jit',
+           ((F8_2D, F8, F8_2D, F8_2D, F8_1D, F8, I8, F8_2D, F8_2D, F8_2D, F8_2D, I8_1D, I8_1D),), 'compiled'),
+    # solve_adaptive(), устойчивость, частотные характеристики
+    Kernel('dynamics', 'get_rhs_jit', (RHS,), 'analysis'),
+    Kernel('dynamics', 'get_jacobian_jit', (RHS,), 'analysis'),
+    Kernel('dynamics', 'get_input_matrix_jit', (RHS,), 'analysis'),
+    Kernel('stability', 'analyze_batch_jit',
+           ((F8_2D, F8, F8_2D, F8_2D, F8_1D, F8, F8_2D, F8_3D, F8_2D, B_1D),), 'analysis'),
+    Kernel('frequency_response', 'get_input_batch_jit', ((F8_2D, F8, F8_2D, F8_2D, F8_1D, F8_2D, F8_3D),), 'analysis'),
+)
+
+
+def get_kernels(groups: Optional[Iterable[str]] = None) -> tuple[Kernel, ...]:
+    groups = GROUPS if groups is None else tuple(groups)
+    for group in groups:
+        if group not in GROUPS:
+            raise ValueError(f"Unknown kernel group: {group}. Use any of {GROUPS}")
+    return tuple(kernel for kernel in KERNELS if kernel.group in groups)
+
+
+def warmup(groups: Optional[Iterable[str]] = None) -> dict[str, float]:
+    # Компиляция (или загрузка из дискового кэша) ядер по явным сигнатурам до первого вызова.
+    # Возвращает время на ядро, с: при тёплом кэше - миллисекунды вместо секунд компиляции
+    times = {}
+    for kernel in get_kernels(groups):
+        dispatcher = kernel.get_dispatcher()
+        start = time.perf_counter()
+        for signature in kernel.signatures:
+            dispatcher.compile(signature)
+        times[kernel.qualname] = time.perf_counter() - start
+    return times
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    kernel_times = warmup()
+    for name, seconds in sorted(kernel_times.items(), key=lambda item: item[1], reverse=True):
+        print(f"{name:<45} {seconds * 1e3:10.1f} ms")
+    print(f"{'total':<45} {(time.perf_counter() - start) * 1e3:10.1f} ms")
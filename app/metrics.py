@@ -0,0 +1,85 @@
+import warnings
+from typing import Callable
+
+import numpy as np
+
+from batch_solver import BatchResult, STATUS_DIVERGED
+
+# Полоса установления: |y - y_final| не больше доли полного перемещения |y_final - y_0| (но не меньше SETTLING_ATOL, м)
+SETTLING_BAND = 0.02
+SETTLING_ATOL = 1e-3
+# Минимальная длительность хвоста в полосе, с: иначе сценарий считается не установившимся к концу прогона
+SETTLING_WINDOW = 1.0
+
+
+def get_valid(result: BatchResult, name: str) -> np.ndarray:
+    # Канал с nan после last_index: точки после остановки или сбоя сценария не участвуют в статистике
+    values = getattr(result, name).astype(np.float64, copy=True)
+    values[np.arange(values.shape[1]) > result.last_index[:, None]] = np.nan
+    return values
+
+
+def get_final(result: BatchResult, name: str) -> np.ndarray:
+    return getattr(result, name)[np.arange(result.last_index.shape[0]), result.last_index]
+
+
+def get_settling_time(result: BatchResult) -> np.ndarray:
+    # Начало хвоста ряда, на котором y не выходит из полосы установления вокруг конечного значения;
+    # nan - если хвост короче SETTLING_WINDOW
+    y = get_valid(result, 'y')
+    final = get_final(result, 'y')
+    tolerance = np.maximum(SETTLING_BAND * np.abs(final - y[:, 0]), SETTLING_ATOL)
+    outside = np.abs(y - final[:, None]) > tolerance[:, None]
+    last_outside = np.where(outside.any(axis=1), y.shape[1] - 1 - np.argmax(outside[:, ::-1], axis=1), -1)
+    settling = result.t[last_outside + 1]
+    settling[result.t[result.last_index] - settling < SETTLING_WINDOW] = np.nan
+    return settling
+
+
+def get_overshoot(result: BatchResult) -> np.ndarray:
+    # Заброс высоты за установившееся значение в долях полного перемещения
+    y = get_valid(result, 'y')
+    final = get_final(result, 'y')
+    step = final - y[:, 0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        excess = np.nanmax(np.sign(step)[:, None] * (y - final[:, None]), axis=1)
+        return np.where(np.abs(step) > SETTLING_ATOL, np.maximum(excess, 0.0) / np.abs(step), 0.0)
+
+
+def get_leakage(result: BatchResult) -> np.ndarray:
+    # Утечка под юбкой (S_gap > 0): точка A или B поднималась выше высоты цилиндра h
+    y, gamma = get_valid(result, 'y'), get_valid(result, 'gamma')
+    lift = np.abs(result.scenarios['l'][:, None] * np.sin(gamma))
+    with np.errstate(invalid='ignore'):
+        return np.any(y + lift > result.scenarios['h'][:, None], axis=1)
+
+
+# Скалярные показатели прогона: имя -> (N,) значения по BatchResult
+METRICS: dict[str, Callable[[BatchResult], np.ndarray]] = {
+    'final_y': lambda result: get_final(result, 'y'),
+    'final_p': lambda result: get_final(result, 'p'),
+    'final_w': lambda result: get_final(result, 'w'),
+    'peak_p': lambda result: np.nanmax(get_valid(result, 'p'), axis=1),
+    'min_p': lambda result: np.nanmin(get_valid(result, 'p'), axis=1),
+    'peak_y': lambda result: np.nanmax(get_valid(result, 'y'), axis=1),
+    'min_y': lambda result: np.nanmin(get_valid(result, 'y'), axis=1),
+    'max_gamma': lambda result: np.nanmax(np.abs(get_valid(result, 'gamma')), axis=1),
+    'settling_time': get_settling_time,
+    'overshoot': get_overshoot,
+    'leakage': get_leakage,
+}
+
+METRICS_DTYPE = np.dtype([(name, np.bool_ if name == 'leakage' else np.float64) for name in METRICS])
+
+
+def get_metrics(result: BatchResult) -> np.ndarray:
+    # Структурированный массив (N,) с полями METRICS_DTYPE; у разошедшихся сценариев вещественные показатели - nan
+    metrics = np.zeros(result.status.shape[0], dtype=METRICS_DTYPE)
+    diverged = (result.status & STATUS_DIVERGED) != 0
+    with np.errstate(invalid='ignore'), warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)  # nanmax по строкам сбойных сценариев без данных
+        for name, metric in METRICS.items():
+            metrics[name] = metric(result)
+            if metrics.dtype[name] == np.float64:
+                metrics[name][diverged] = np.nan
+    return metrics
@@ -1,9 +1,21 @@
-import matplotlib.pyplot as plt
 import numpy as np
 from math import pi
-from typing import List
+from typing import TYPE_CHECKING, List, Optional
 from app_utils import BallonetParameters, BallonetCoordinates
-from shapely.geometry import Polygon
+from buoyancy import get_submerged_polygon_jit, WATER_BOUNDS
+
+# Геометрия баллонетов без matplotlib и shapely: они импортируются при первом построении многоугольника
+# или графика (plotting.py), расчётный путь их не загружает
+if TYPE_CHECKING:
+    from shapely.geometry import Polygon
+
+
+def __getattr__(name: str):
+    # plot_balloons.Polygon остаётся доступным: shapely загружается при первом обращении
+    if name == 'Polygon':
+        from shapely.geometry import Polygon
+        return Polygon
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def calculate_ballonet_parameters(phi, r, x, y,
@@ -26,33 +38,54 @@ def get_ballonet_coordinates(params: BallonetParameters,
                              new_dx: float | int = 0,
                              new_dy: float | int = 0,
                              grain: int = 100) -> List[BallonetCoordinates]:
-    return [BallonetCoordinates(
-        name=name,
-        x=calculate_ballonet_parameters(phi, r, x + new_dx, y + new_dy, alpha, direction,
-                                        minor=minor, grain=grain, name=name)[0],
-        y=calculate_ballonet_parameters(phi, r, x + new_dx, y + new_dy, alpha, direction,
-                                        minor=minor, grain=grain, name=name)[1])
-        for name, phi, r, x, y, alpha, direction in params.get_segments()
-    ]
-
-
-def plot_data(params: BallonetParameters,
-              minor: bool = False,
-              new_dx: float | int = 0,
-              new_dy: float | int = 0,
-              grain: int = 100,
-              plot_borders=False) -> None:
-    plt.axis('equal')
-    for segment in get_ballonet_coordinates(params,
-                                            minor=minor, grain=grain,
-                                            new_dx=new_dx, new_dy=new_dy):
-        if plot_borders:
-            plt.scatter(segment.x[0], segment.y[0], color='red')
-            plt.scatter(segment.x[-1], segment.y[-1], color='blue')
-        plt.plot(segment.x, segment.y, color='black', linestyle='dotted', linewidth=4)
+    coordinates = []
+    for name, phi, r, x, y, alpha, direction in params.get_segments():
+        xs, ys = calculate_ballonet_parameters(phi, r, x + new_dx, y + new_dy, alpha, direction,
+                                               minor=minor, grain=grain, name=name)
+        coordinates.append(BallonetCoordinates(name=name, x=xs, y=ys))
+    return coordinates
+
+
+def get_ballonet_vertices(params: BallonetParameters,
+                          minor: bool = False,
+                          new_dx: float | int = 0,
+                          new_dy: float | int = 0,
+                          grain: int = 100) -> np.ndarray:
+    # Контур баллонета массивом (N, 2) в порядке обхода get_polygon_from_ballonet
+    return np.concatenate([np.column_stack((segment.x, segment.y))
+                           for segment in get_ballonet_coordinates(params, minor=minor, new_dx=new_dx,
+                                                                   new_dy=new_dy, grain=grain)])
+
 
+def get_ballonet_placements(l, pitch: bool = False) -> tuple[tuple[bool, float], tuple[bool, float]]:
+    # (minor, new_dx) баллонетов A и B относительно центра судна. minor отражает контур вместе со смещением,
+    # поэтому под концом плеча A (x = -l) лежит отражённый контур с new_dx = +l. Без тангажа A ставится,
+    # как в update_ballonet_polygons() исходной модели, по new_dx = A.x = -l (отражённый контур - справа от центра)
+    return (True, l if pitch else -l), (False, l)
+
+
+def get_ballonet_stations(params: BallonetParameters, l, pitch: bool = False) -> tuple:
+    # Абсциссы центров баллонетов A и B (средние вершин контура) в размещении get_ballonet_placements():
+    # станции волнения в SystemOfEquations и в частотных характеристиках. l может быть массивом
+    center = get_ballonet_vertices(params)[:, 0].mean()
+    return tuple((-1 if minor else 1) * (center + new_dx) for minor, new_dx in get_ballonet_placements(l, pitch))
+
+
+def transform_vertices(vertices: np.ndarray,
+                       gamma: float,
+                       new_dx: float | int = 0,
+                       new_dy: float | int = 0,
+                       out: Optional[np.ndarray] = None) -> np.ndarray:
+    # Поворот на gamma против часовой стрелки вокруг начала координат и перенос на (new_dx, new_dy)
+    cos_g, sin_g = np.cos(gamma), np.sin(gamma)
+    out = np.matmul(vertices, np.array([[cos_g, sin_g], [-sin_g, cos_g]]), out=out)
+    out += (new_dx, new_dy)
+    return out
+
+
+def get_polygon_from_ballonet(ballonet_segments: List[BallonetCoordinates]) -> 'Polygon':
+    from shapely.geometry import Polygon
 
-def get_polygon_from_ballonet(ballonet_segments: List[BallonetCoordinates]) -> Polygon:
     p_list = list()
     for s in ballonet_segments:
         p_list.extend([(x, y) for x, y in zip(s.x, s.y)])
@@ -60,26 +93,22 @@ def get_polygon_from_ballonet(ballonet_segments: List[BallonetCoordinates]) -> P
 
 
 if __name__ == '__main__':
-    poly_1 = get_polygon_from_ballonet(
-        get_ballonet_coordinates(BallonetParameters(),
-                                 minor=True, grain=1000, new_dy=20)
-    )
+    import matplotlib.pyplot as plt
+
+    vertices = get_ballonet_vertices(BallonetParameters(), minor=True, grain=1000, new_dx=-3, new_dy=-1)
 
-    # poly_2 = get_polygon_from_ballonet(
-    #     get_ballonet_coordinates(BallonetParameters(),
-    #                              minor=False, grain=300)
-    # )
+    # Волнистая поверхность воды: площадь под ней считается компилированным отсечением многоугольника
+    surface_x = np.linspace(-4, 4, 81)
+    surface_y = 0.2 * np.sin(3 * surface_x)
+    intersect_area, x_c, y_c = get_submerged_polygon_jit(vertices, surface_x, surface_y, *WATER_BOUNDS[1:])
 
     plt.axis('equal')
-    water_poly = Polygon([(-3, 0), (3, 0), (3, -3), (-3, -3)])
-    intersect_poly = poly_1.intersection(water_poly)
-    plt.plot(*water_poly.exterior.xy)
-    intersect_area = intersect_poly.area
+    plt.plot(surface_x, surface_y)
     plt.title(f"{intersect_area=}")
-    plt.plot(*intersect_poly.exterior.xy)
-    plt.plot(*poly_1.exterior.xy, linestyle='dotted', color='black', linewidth=2)
-    # plt.plot(*poly_2.exterior.xy)
+    plt.scatter(x_c, y_c, color='red')
+    plt.plot(*vertices.T, linestyle='dotted', color='black', linewidth=2)
 
+    # from plotting import plot_data
     # plot_data(BallonetParameters(), minor=True, grain=300)
     # plot_data(BallonetParameters(), minor=False, grain=300)
     plt.show()
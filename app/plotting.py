@@ -0,0 +1,158 @@
+import os
+from typing import TYPE_CHECKING, Optional
+
+import matplotlib.pyplot as plt
+import numpy as np
+from matplotlib.animation import FuncAnimation, FFMpegWriter
+
+from app_utils import BallonetParameters, BallonetCoordinates
+from plot_balloons import get_ballonet_coordinates, get_polygon_from_ballonet
+
+# Графики и анимация отделены от расчёта: solve_eq и plot_balloons импортируют этот модуль
+# (и matplotlib) только при вызове plot() / animate_model()
+if TYPE_CHECKING:
+    from solve_eq import SystemOfEquations
+
+PLOT_MAX_POINTS = 100_000
+
+
+def plot_data(params: BallonetParameters,
+              minor: bool = False,
+              new_dx: float | int = 0,
+              new_dy: float | int = 0,
+              grain: int = 100,
+              plot_borders=False) -> None:
+    plt.axis('equal')
+    for segment in get_ballonet_coordinates(params,
+                                            minor=minor, grain=grain,
+                                            new_dx=new_dx, new_dy=new_dy):
+        if plot_borders:
+            plt.scatter(segment.x[0], segment.y[0], color='red')
+            plt.scatter(segment.x[-1], segment.y[-1], color='blue')
+        plt.plot(segment.x, segment.y, color='black', linestyle='dotted', linewidth=4)
+
+
+def plot_solution(system: 'SystemOfEquations', max_elem: Optional[int] = None) -> None:
+    if max_elem is None:
+        max_elem = system.n_recorded
+
+    # Для длинных (в том числе отображённых в память) траекторий читается только каждая step-я точка
+    step = max(1, max_elem // PLOT_MAX_POINTS)
+    y = system.y_array[:max_elem:step]
+    p = system.p_array[:max_elem:step]
+    gamma = system.gamma_array[:max_elem:step]
+    W = system.w_array[:max_elem:step]
+    t = system.t_array[:max_elem:step]
+
+    plt.figure(figsize=(18, 8))
+    plt.subplot(2, 2, 1)
+    plt.grid()
+    plt.plot(t, y)
+    plt.title('Y')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Y')
+
+    plt.subplot(2, 2, 2)
+    plt.plot(t, gamma)
+    plt.grid()
+    plt.title('Gamma')
+    plt.xlabel('Time (s)')
+    plt.ylabel('Gamma')
+
+    plt.subplot(2, 2, 3)
+    plt.plot(t, p)
+    plt.grid()
+    plt.title('P')
+    plt.xlabel('Time (s)')
+    plt.ylabel('P')
+
+    plt.subplot(2, 2, 4)
+    plt.plot(t, W)
+    plt.grid()
+    plt.title('W')
+    plt.xlabel('Time (s)')
+    plt.ylabel('W')
+
+    plt.tight_layout()
+    plt.show()
+
+
+def animate_model(system: 'SystemOfEquations',
+                  save: bool = True,
+                  interval: int | float = 10,
+                  filename: str = "animation.mp4") -> None:
+    fig, ax = plt.subplots()
+    step = int(1 / (system.eps * 100))
+    ax.grid(True)
+    ax.axis('equal')
+    ax.set_title('Model Animation')
+    ax.set_xlabel('X')
+    ax.set_ylabel('Y')
+    ax.set_xlim(-system.params.l - 1, system.params.l + 1)
+    ax.set_ylim(min(system.y_array) - 5, max(system.y_array) + 5)
+    line, = ax.plot([], [], 'k-')
+    ballonet_poly, = ax.plot([], [], 'k-')
+    ballonet_poly_reverse, = ax.plot([], [], 'k-')
+
+    scatter_A = ax.scatter([], [], s=100, color='orange')
+    scatter_B = ax.scatter([], [], s=100, color='orange')
+    scatter_O = ax.scatter([], [], s=100, color='red')
+
+    water_surface = ax.fill_between([ax.get_xlim()[0], ax.get_xlim()[1]],
+                                    [0, 0],
+                                    ax.get_ylim()[0],
+                                    color='blue',
+                                    alpha=0.3)
+
+    def init() -> tuple:
+        line.set_data([], [])
+        ballonet_poly.set_data([], [])
+        ballonet_poly_reverse.set_data([], [])
+        scatter_A.set_offsets(np.empty((0, 2)))
+        scatter_B.set_offsets(np.empty((0, 2)))
+        scatter_O.set_offsets(np.empty((0, 2)))
+        return (line,
+                ballonet_poly, ballonet_poly_reverse,
+                scatter_A, scatter_B, scatter_O,
+                water_surface)
+
+    def update(frame):
+        A_pos = [system.A_positions[frame][0], system.A_positions[frame][1]]
+        B_pos = [system.B_positions[frame][0], system.B_positions[frame][1]]
+        O_pos = [0, system.y_array[frame]]
+        scatter_A.set_offsets(np.array(A_pos).reshape(1, 2))
+        scatter_B.set_offsets(np.array(B_pos).reshape(1, 2))
+        scatter_O.set_offsets(np.array(O_pos).reshape(1, 2))
+        line.set_data([A_pos[0], B_pos[0]], [A_pos[1], B_pos[1]])
+
+        coords: list[BallonetCoordinates] = get_ballonet_coordinates(system.ballonet_params,
+                                                                     minor=True,
+                                                                     new_dx=2.5,
+                                                                     new_dy=A_pos[1] - 1.2)
+        coords_reverse: list[BallonetCoordinates] = get_ballonet_coordinates(system.ballonet_params,
+                                                                             minor=False,
+                                                                             new_dx=2.5,
+                                                                             new_dy=B_pos[1] - 1.2)
+        ballonet_poly.set_data(
+            *get_polygon_from_ballonet(coords).exterior.xy
+        )
+        ballonet_poly_reverse.set_data(
+            *get_polygon_from_ballonet(coords_reverse).exterior.xy)
+
+        return (line,
+                ballonet_poly, ballonet_poly_reverse,
+                scatter_A, scatter_B, scatter_O,
+                water_surface)
+
+    ani = FuncAnimation(fig, update,
+                        frames=tuple(range(0, len(system.A_positions), step)),
+                        init_func=init,
+                        blit=True, interval=interval)
+
+    if save:
+        os.makedirs("animations", exist_ok=True)
+        writer = FFMpegWriter(fps=1000 // interval, metadata=dict(artist='User'), bitrate=1800)
+        ani.save(os.path.join("animations", filename), writer=writer)
+        print(f"Animation saved as animations/{filename}")
+
+    plt.show()
@@ -0,0 +1,90 @@
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+PROGRESS_INTERVAL = 0.5  # с между событиями
+
+# Часы читаются не на каждом шаге: число шагов до следующей проверки подбирается по скорости счёта так,
+# чтобы за интервал было около CHECKS_PER_INTERVAL проверок
+CHECKS_PER_INTERVAL = 4
+
+# Номер шага проверки без наблюдателя: цикл сравнивает с ним индекс и никогда его не достигает
+NEVER = sys.maxsize
+
+
+@dataclass
+class ProgressEvent:
+    iteration: int  # выполнено шагов, включая начальную точку (для прогона параметров - сценариев)
+    n_steps: int
+    t: float  # модельное время, с (для прогона параметров - 0)
+    elapsed: float  # с начала прогона, с
+    eta: Optional[float]  # оценка оставшегося времени, с (None, пока скорость неизвестна)
+    state: dict[str, float] = field(default_factory=dict)  # снимок состояния: y, p, W, γ
+    done: bool = False
+
+    @property
+    def fraction(self) -> float:
+        return self.iteration / self.n_steps if self.n_steps else 1.0
+
+
+class Progress:
+    def __init__(self, callback: Callable[[ProgressEvent], None], interval: float = PROGRESS_INTERVAL) -> None:
+        # Наблюдатель за прогоном: callback вызывается не чаще раза в interval секунд и один раз в конце.
+        # Цикл решателя только сравнивает индекс шага с next_check
+        self.callback: Callable[[ProgressEvent], None] = callback
+        self.interval: float = interval
+        self.n_steps: int = 0
+        self.eps: float = 0.0
+        self.first: int = 0
+        self.started: float = 0.0
+        self.last: float = 0.0
+        self.checked: int = 0
+        self.checked_at: float = 0.0
+        self.next_check: int = NEVER
+
+    def start(self, iteration: int, n_steps: int, eps: float) -> None:
+        self.n_steps, self.eps, self.first = n_steps, eps, iteration
+        self.started = self.last = self.checked_at = time.perf_counter()
+        self.checked = iteration
+        self.next_check = iteration + 1
+
+    def get_event(self, iteration: int, state: dict[str, float], now: float, done: bool = False) -> ProgressEvent:
+        elapsed = now - self.started
+        eta = None
+        if iteration > self.first and elapsed > 0:
+            eta = elapsed / (iteration - self.first) * (self.n_steps - iteration)
+        return ProgressEvent(iteration=iteration, n_steps=self.n_steps, t=(iteration - 1) * self.eps,
+                             elapsed=elapsed, eta=0.0 if done else eta, state=state, done=done)
+
+    def check(self, iteration: int) -> bool:
+        # Пора ли событие; заодно планирует следующую проверку по скорости с прошлой проверки
+        now = time.perf_counter()
+        rate = (iteration - self.checked) / max(now - self.checked_at, 1e-9)
+        self.checked, self.checked_at = iteration, now
+        self.next_check = iteration + max(1, int(rate * self.interval / CHECKS_PER_INTERVAL))
+        return now - self.last >= self.interval
+
+    def emit(self, iteration: int, state: dict[str, float], done: bool = False) -> None:
+        now = time.perf_counter()
+        self.last = now
+        self.callback(self.get_event(iteration, state, now, done))
+        if done:
+            self.next_check = NEVER
+
+
+class TqdmProgress:
+    def __init__(self, **kwargs) -> None:
+        # Вывод событий в терминал полосой tqdm; kwargs передаются tqdm
+        self.kwargs: dict = kwargs
+        self.bar = None
+
+    def __call__(self, event: ProgressEvent) -> None:
+        if self.bar is None:
+            from tqdm import tqdm
+            self.bar = tqdm(total=event.n_steps, **self.kwargs)
+        self.bar.update(event.iteration - self.bar.n)
+        self.bar.set_postfix({name: f"{value:.4g}" for name, value in event.state.items()}, refresh=False)
+        if event.done:
+            self.bar.close()
+            self.bar = None
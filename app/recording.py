@@ -0,0 +1,245 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from trajectory import TrajectoryWriter, load_trajectory, TRAJECTORY_CHANNELS, OUTPUT_CHUNK_SIZE
+
+# Огибающие min/max по корзинам выдачи; envelope_t - начало корзины
+ENVELOPE_VALUES = ('y', 'p', 'w', 'gamma')
+ENVELOPE_CHANNELS = {'envelope_t': (),
+                     **{f"{name}_{bound}": () for name in ENVELOPE_VALUES for bound in ('min', 'max')}}
+
+# Одна строка всех каналов траектории в развёрнутом виде (для контрольной точки)
+RECORDER_CARRY_SIZE = sum(int(np.prod(tail, dtype=int)) for tail in TRAJECTORY_CHANNELS.values())
+
+
+@dataclass
+class RecordingPolicy:
+    every: int = 1  # запись каждого every-го шага интегрирования
+    dt: Optional[float] = None  # фиксированная сетка выдачи с линейной интерполяцией между шагами
+    envelope: bool = False  # min/max y, p, w, γ по шагам внутри каждой корзины выдачи
+    windows: tuple[tuple[float, float], ...] = ()  # запись только внутри [t_start, t_end]; пусто - везде
+
+    def __post_init__(self):
+        if self.every < 1:
+            raise ValueError(f"every must be >= 1, got {self.every}")
+        if self.dt is not None and (self.dt <= 0 or self.every != 1):
+            raise ValueError("dt must be positive and cannot be combined with every")
+        for t_start, t_end in self.windows:
+            if t_start > t_end:
+                raise ValueError(f"Empty recording window: ({t_start}, {t_end})")
+
+    def get_bucket_width(self, eps: float) -> float:
+        return self.dt if self.dt is not None else self.every * eps
+
+    def estimate_rows(self, n_steps: int, eps: float) -> int:
+        return int(np.ceil(n_steps * eps / self.get_bucket_width(eps))) + 1
+
+    def in_windows(self, t: np.ndarray) -> np.ndarray:
+        if not self.windows:
+            return np.ones(t.shape, dtype=bool)
+        mask = np.zeros(t.shape, dtype=bool)
+        for t_start, t_end in self.windows:
+            mask |= (t >= t_start) & (t <= t_end)
+        return mask
+
+
+class Recorder:
+    def __init__(self,
+                 policy: RecordingPolicy,
+                 eps: float,
+                 n_steps: int,
+                 output_dir: Optional[str] = None,
+                 chunk_size: int = OUTPUT_CHUNK_SIZE,
+                 state: Optional[np.ndarray] = None) -> None:
+        # Строки шагов интегрирования копятся в блоке и обрабатываются векторно;
+        # результат уходит в память или в TrajectoryWriter (output_dir).
+        # state - результат get_state(): продолжение записи в output_dir с контрольной точки
+        self.policy: RecordingPolicy = policy
+        self.eps: float = eps
+        self.output_dir: Optional[str] = output_dir
+        self.chunk_size: int = chunk_size
+        self.n_seen: int = 0  # шагов интегрирования, прошедших через push()
+
+        self.block = {name: np.empty((chunk_size, *tail)) for name, tail in TRAJECTORY_CHANNELS.items()}
+        self.block_size: int = 0
+
+        # Сетка выдачи: номер следующего узла и последняя строка предыдущего блока для интерполяции
+        self.next_node: int = 0
+        self.carry: Optional[tuple] = None
+        # Открытая корзина огибающей: (номер, min, max)
+        self.open_bucket: Optional[tuple[int, np.ndarray, np.ndarray]] = None
+
+        rows, envelope_rows = 0, 0
+        if state is not None:
+            rows, envelope_rows = self.set_state(state)
+
+        if output_dir is None:
+            self.rows: list[tuple] = []
+            self.envelope_rows: list[tuple] = []
+        else:
+            self.writer = TrajectoryWriter(output_dir, policy.estimate_rows(n_steps, eps), chunk_size,
+                                           start_row=rows)
+            if policy.envelope:
+                self.envelope_writer = TrajectoryWriter(output_dir, policy.estimate_rows(n_steps, eps),
+                                                        chunk_size, channels=ENVELOPE_CHANNELS,
+                                                        start_row=envelope_rows)
+
+    def get_state(self) -> np.ndarray:
+        # Сбрасывает накопленный блок и буферы на диск; разбиение на блоки не влияет на результат записи.
+        # [n_seen, next_node, есть ли carry, carry, есть ли корзина, корзина, min, max,
+        #  строк траектории, строк огибающих]
+        if self.output_dir is None:
+            raise ValueError("Recorder state is only restorable with output_dir")
+        self.flush_block()
+        self.writer.sync()
+        envelope_rows = 0
+        if self.policy.envelope:
+            self.envelope_writer.sync()
+            envelope_rows = self.envelope_writer.cursor
+
+        carry = np.zeros(RECORDER_CARRY_SIZE)
+        if self.carry is not None:
+            carry = np.concatenate([np.ravel(value) for value in self.carry])
+        bucket = np.zeros(1 + 2 * len(ENVELOPE_VALUES))
+        if self.open_bucket is not None:
+            bucket = np.concatenate(([self.open_bucket[0]], self.open_bucket[1], self.open_bucket[2]))
+        return np.concatenate(([self.n_seen, self.next_node, self.carry is not None], carry,
+                               [self.open_bucket is not None], bucket,
+                               [self.writer.cursor, envelope_rows])).astype(np.float64)
+
+    def set_state(self, state: np.ndarray) -> tuple[int, int]:
+        self.n_seen, self.next_node = int(state[0]), int(state[1])
+        carry = state[3:3 + RECORDER_CARRY_SIZE]
+        if state[2]:
+            offsets = np.cumsum([0] + [int(np.prod(tail, dtype=int)) for tail in TRAJECTORY_CHANNELS.values()])
+            self.carry = tuple(carry[offsets[i]] if not tail else carry[offsets[i]:offsets[i + 1]].copy()
+                               for i, tail in enumerate(TRAJECTORY_CHANNELS.values()))
+        position = 3 + RECORDER_CARRY_SIZE
+        if state[position]:
+            n_values = len(ENVELOPE_VALUES)
+            bucket = state[position + 1:position + 2 + 2 * n_values]
+            self.open_bucket = (int(bucket[0]), bucket[1:1 + n_values].copy(), bucket[1 + n_values:].copy())
+        return int(state[-2]), int(state[-1])
+
+    def append(self, *row) -> None:
+        # Одна строка в порядке TRAJECTORY_CHANNELS (для поэлементного цикла solve())
+        for buffer, value in zip(self.block.values(), row):
+            buffer[self.block_size] = value
+        self.block_size += 1
+        if self.block_size == self.chunk_size:
+            self.flush_block()
+
+    def flush_block(self) -> None:
+        if self.block_size:
+            self.process(tuple(buffer[:self.block_size] for buffer in self.block.values()))
+        self.block_size = 0
+
+    def push(self, *columns) -> None:
+        # Блок последовательных шагов интегрирования, columns в порядке TRAJECTORY_CHANNELS
+        self.flush_block()
+        self.process(columns)
+
+    def process(self, columns: tuple) -> None:
+        n_rows = columns[0].shape[0]
+        if n_rows == 0:
+            return
+        if self.policy.envelope:
+            self.update_envelope(columns)
+        rows = self.select(columns)
+        mask = self.policy.in_windows(rows[0])
+        self.emit(tuple(column[mask] for column in rows))
+        self.n_seen += n_rows
+
+    def select(self, columns: tuple) -> tuple:
+        t = columns[0]
+        if self.policy.dt is None:
+            index = self.n_seen + np.arange(t.shape[0])
+            mask = index % self.policy.every == 0
+            return tuple(column[mask] for column in columns)
+
+        if self.carry is not None:
+            columns = tuple(np.concatenate((previous[None], column)) for previous, column in zip(self.carry, columns))
+            t = columns[0]
+        self.carry = tuple(column[-1].copy() for column in columns)
+
+        last_node = int(np.floor(t[-1] / self.policy.dt + 1e-9))
+        nodes = np.arange(self.next_node, last_node + 1) * self.policy.dt
+        self.next_node = max(self.next_node, last_node + 1)
+        rows = [nodes]
+        for column in columns[1:]:
+            if column.ndim == 1:
+                rows.append(np.interp(nodes, t, column))
+            else:
+                rows.append(np.column_stack([np.interp(nodes, t, column[:, j]) for j in range(column.shape[1])]))
+        return tuple(rows)
+
+    def get_buckets(self, t: np.ndarray) -> np.ndarray:
+        if self.policy.dt is None:
+            return (self.n_seen + np.arange(t.shape[0])) // self.policy.every
+        return np.floor(t / self.policy.dt + 1e-9).astype(np.int64)
+
+    def update_envelope(self, columns: tuple) -> None:
+        # Корзины не убывают по шагам: min/max считаются reduceat по границам корзин,
+        # последняя корзина блока остаётся открытой до следующего блока
+        buckets = self.get_buckets(columns[0])
+        values = np.column_stack(columns[1:1 + len(ENVELOPE_VALUES)])
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        buckets = buckets[starts]
+        low = np.minimum.reduceat(values, starts, axis=0)
+        high = np.maximum.reduceat(values, starts, axis=0)
+
+        if self.open_bucket is not None:
+            bucket, open_low, open_high = self.open_bucket
+            if buckets[0] == bucket:
+                low[0], high[0] = np.minimum(low[0], open_low), np.maximum(high[0], open_high)
+            else:
+                buckets = np.r_[bucket, buckets]
+                low, high = np.vstack((open_low, low)), np.vstack((open_high, high))
+        self.open_bucket = (buckets[-1], low[-1].copy(), high[-1].copy())
+        self.emit_envelope(buckets[:-1], low[:-1], high[:-1])
+
+    def emit_envelope(self, buckets: np.ndarray, low: np.ndarray, high: np.ndarray) -> None:
+        t = buckets * self.policy.get_bucket_width(self.eps)
+        mask = self.policy.in_windows(t)
+        columns = [t[mask]]
+        for i in range(len(ENVELOPE_VALUES)):
+            columns += [low[mask, i], high[mask, i]]
+        if self.output_dir is None:
+            self.envelope_rows.append(tuple(columns))
+        else:
+            self.envelope_writer.extend(*columns)
+
+    def emit(self, rows: tuple) -> None:
+        if self.output_dir is None:
+            self.rows.append(tuple(np.array(column) for column in rows))
+        else:
+            self.writer.extend(*rows)
+
+    def close(self) -> tuple[dict[str, np.ndarray], Optional[dict[str, np.ndarray]]]:
+        # Возвращает (траектория, огибающие или None): массивы в памяти или отображения файлов output_dir
+        self.flush_block()
+        if self.policy.envelope and self.open_bucket is not None:
+            bucket, low, high = self.open_bucket
+            self.emit_envelope(np.array([bucket]), low[None], high[None])
+            self.open_bucket = None
+
+        if self.output_dir is not None:
+            self.writer.close()
+            trajectory = load_trajectory(self.output_dir)
+            envelope = None
+            if self.policy.envelope:
+                self.envelope_writer.close()
+                envelope = load_trajectory(self.output_dir, channels=ENVELOPE_CHANNELS)
+            return trajectory, envelope
+
+        trajectory = {name: np.concatenate([row[i] for row in self.rows]) if self.rows
+                      else np.empty((0, *tail))
+                      for i, (name, tail) in enumerate(TRAJECTORY_CHANNELS.items())}
+        envelope = None
+        if self.policy.envelope:
+            envelope = {name: np.concatenate([row[i] for row in self.envelope_rows]) if self.envelope_rows
+                        else np.empty(0)
+                        for i, name in enumerate(ENVELOPE_CHANNELS)}
+        return trajectory, envelope
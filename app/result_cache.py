@@ -0,0 +1,145 @@
+import dataclasses
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+from typing import Any, Optional
+
+import numpy as np
+
+from app_utils import get_cache_dir
+
+# Модули, от исходников которых зависит результат решения: правка любого из них - новая версия кода
+# и промах по всем прежним записям
+CODE_MODULES = ('app_utils', 'buoyancy', 'buoyancy_table', 'dynamics', 'integrator', 'plot_balloons',
+                'recording', 'solve_eq', 'solve_kernel', 'steady_state', 'trajectory', 'waves')
+
+MAX_BYTES = 1 << 30  # предел размера кэша на диске, байт
+
+# Метаданные записи (число шагов, установление, события) - JSON в строковом массиве: .npz читается без pickle
+META_NAME = 'meta'
+
+
+@functools.lru_cache(maxsize=None)
+def get_code_version() -> str:
+    digest = hashlib.sha256()
+    for name in CODE_MODULES:
+        with open(importlib.util.find_spec(name).origin, 'rb') as file:
+            digest.update(name.encode() + b'\0' + file.read())
+    return digest.hexdigest()
+
+
+def get_description(value: Any) -> Any:
+    # Каноническое представление для ключа: числа - float (Parameters(m=16_000) и Parameters(m=16e3) совпадают),
+    # dataclass - словарь полей, массивы - форма и хэш данных
+    if dataclasses.is_dataclass(value):
+        return {field.name: get_description(getattr(value, field.name)) for field in dataclasses.fields(value)}
+    if isinstance(value, np.ndarray):
+        value = np.ascontiguousarray(value, dtype=np.float64)
+        return {'shape': value.shape, 'sha256': hashlib.sha256(value.tobytes()).hexdigest()}
+    if isinstance(value, dict):
+        return {str(key): get_description(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [get_description(item) for item in value]
+    if isinstance(value, (bool, str)) or value is None:
+        return value
+    return float(value)
+
+
+def get_result_key(params: Any, ballonet_params: Any, t_end: int | float, eps: float, solver: str,
+                   **options: Any) -> str:
+    # options - всё прочее, что меняет результат: плавучесть, тангаж, волнение, запись, установление,
+    # допуски адаптивного метода
+    description = {
+        'code': get_code_version(),
+        'params': get_description(params),
+        'ballonet': get_description(ballonet_params),
+        't_end': float(t_end),
+        'eps': float(eps),
+        'solver': solver,
+        'options': get_description(options),
+    }
+    return hashlib.sha256(json.dumps(description, sort_keys=True).encode()).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, directory: Optional[str] = None, max_bytes: int = MAX_BYTES) -> None:
+        # Записи - сжатые .npz с именем по ключу. Обращение обновляет время изменения файла,
+        # вытеснение удаляет записи с самым старым временем, пока размер не станет не больше max_bytes.
+        # Каталог можно делить между процессами (прогоны параметров): запись атомарна, гонки удаления безвредны
+        self.directory: str = directory or get_cache_dir('results')
+        self.max_bytes: int = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def load(self, key: str) -> Optional[tuple[dict[str, np.ndarray], dict]]:
+        path = self.get_path(key)
+        try:
+            with np.load(path) as data:
+                arrays = {name: data[name] for name in data.files if name != META_NAME}
+                meta = json.loads(str(data[META_NAME]))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError):
+            # Обрезанная или повреждённая запись считается промахом и удаляется
+            self.remove(path)
+            return None
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+        return arrays, meta
+
+    def store(self, key: str, arrays: dict[str, np.ndarray], meta: dict) -> None:
+        path = self.get_path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as file:
+            np.savez_compressed(file, **arrays, **{META_NAME: np.array(json.dumps(meta))})
+        os.replace(tmp_path, path)
+        self.evict()
+
+    def get_entries(self) -> list[tuple[float, int, str]]:
+        # (время последнего обращения, размер, путь) по возрастанию времени
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith('.npz'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def get_size(self) -> int:
+        return sum(size for _, size, _ in self.get_entries())
+
+    def evict(self) -> int:
+        entries = self.get_entries()
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(path)
+            total -= size
+            removed += 1
+        return removed
+
+    def clear(self) -> None:
+        for _, _, path in self.get_entries():
+            self.remove(path)
+
+    @staticmethod
+    def remove(path: str) -> None:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def __contains__(self, key: str) -> bool:
+        return os.path.exists(self.get_path(key))
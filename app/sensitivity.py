@@ -0,0 +1,96 @@
+from dataclasses import dataclass
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from app_utils import Parameters, BallonetParameters
+from batch_solver import BatchResult, solve_batch, get_scenarios, PARAMETERS_DTYPE, STATUS_DIVERGED
+from buoyancy import WATER_BOUNDS
+
+
+def _final(name: str) -> Callable[[BatchResult], np.ndarray]:
+    def output(result: BatchResult) -> np.ndarray:
+        return getattr(result, name)[np.arange(result.last_index.shape[0]), result.last_index]
+    return output
+
+
+# Выходы прогона: величина по строкам BatchResult для каждого сценария
+OUTPUTS: dict[str, Callable[[BatchResult], np.ndarray]] = {
+    'final_y': _final('y'),  # высота установления
+    'final_p': _final('p'),
+    'final_w': _final('w'),
+    'peak_p': lambda result: np.nanmax(result.p, axis=1),
+    'peak_y': lambda result: np.nanmax(result.y, axis=1),
+    'min_y': lambda result: np.nanmin(result.y, axis=1),
+}
+
+REL_STEP = 1e-3
+
+
+@dataclass
+class Sensitivity:
+    parameters: tuple[str, ...]
+    outputs: tuple[str, ...]
+    base: np.ndarray  # (n_outputs,) значения выходов в базовой точке
+    values: np.ndarray  # (n_parameters,) значения параметров в базовой точке
+    step: np.ndarray  # (n_parameters,) шаг центральной разности
+    matrix: np.ndarray  # (n_outputs, n_parameters): d(выход)/d(параметр)
+    elasticity: np.ndarray  # (d выход / выход) / (d параметр / параметр)
+
+    def get(self, output: str, parameter: str) -> float:
+        return float(self.matrix[self.outputs.index(output), self.parameters.index(parameter)])
+
+    def get_elasticity(self, output: str, parameter: str) -> float:
+        return float(self.elasticity[self.outputs.index(output), self.parameters.index(parameter)])
+
+
+def analyze_sensitivity(params: Parameters,
+                        ballonet_params: BallonetParameters,
+                        parameters: Optional[Sequence[str]] = None,
+                        outputs: Optional[Sequence[str]] = None,
+                        t_end: int | float = 30,
+                        eps: float = 0.01,
+                        rel_step: float = REL_STEP,
+                        water_bounds: tuple = WATER_BOUNDS) -> Sensitivity:
+    # Центральные разности по полям Parameters: базовый и 2 * n_parameters возмущённых сценариев
+    # интегрируются одним вызовом solve_batch() (явная схема solve_compiled()).
+    # Производные выходов, упирающихся в ограничения давления, равны нулю; разошедшиеся сценарии дают nan
+    parameters = tuple(PARAMETERS_DTYPE.names if parameters is None else parameters)
+    outputs = tuple(OUTPUTS if outputs is None else outputs)
+    for name in parameters:
+        if name not in PARAMETERS_DTYPE.names:
+            raise ValueError(f"Unknown parameter: {name}. Use fields of Parameters")
+    for name in outputs:
+        if name not in OUTPUTS:
+            raise ValueError(f"Unknown output: {name}. Use one of {tuple(OUTPUTS)}")
+
+    n = len(parameters)
+    scenarios = np.repeat(get_scenarios([params]), 2 * n + 1)
+    values = np.array([getattr(params, name) for name in parameters], dtype=np.float64)
+    step = rel_step * np.maximum(np.abs(values), 1.0)
+    for j, name in enumerate(parameters):
+        scenarios[name][1 + 2 * j] += step[j]
+        scenarios[name][2 + 2 * j] -= step[j]
+
+    result = solve_batch(scenarios, ballonet_params, t_end=t_end, eps=eps, water_bounds=water_bounds)
+    values_out = np.column_stack([OUTPUTS[name](result) for name in outputs])  # (2n + 1, n_outputs)
+    values_out[(result.status & STATUS_DIVERGED) != 0] = np.nan
+
+    matrix = (values_out[1::2] - values_out[2::2]).T / (2 * step)
+    base = values_out[0]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        elasticity = matrix * values / base[:, None]
+    return Sensitivity(parameters=parameters, outputs=outputs, base=base, values=values, step=step,
+                       matrix=matrix, elasticity=elasticity)
+
+
+if __name__ == '__main__':
+    import time
+
+    analyze_sensitivity(Parameters(h=1), BallonetParameters(), t_end=0.1)
+    start = time.perf_counter()
+    sensitivity = analyze_sensitivity(Parameters(h=1), BallonetParameters(), t_end=30, eps=1e-3)
+    print(f"{len(sensitivity.parameters)} parameters: {time.perf_counter() - start:.2f}s")
+    for i, output in enumerate(sensitivity.outputs):
+        print(output, ' '.join(f"{name}={e:+.3f}" for name, e in zip(sensitivity.parameters,
+                                                                     sensitivity.elasticity[i])))
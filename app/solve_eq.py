@@ -1,39 +1,65 @@
-import os
+import dataclasses
+import time
 from math import sqrt
-from typing import Optional, Any
+from typing import Optional, Any, Callable
 
-import matplotlib.pyplot as plt
 import numpy as np
-from matplotlib.animation import FuncAnimation, FFMpegWriter
-from numba import jit, njit
-from tqdm import tqdm
+from numba import njit
 
 from app_utils import (
     Parameters,
     BallonetParameters,
-    BallonetCoordinates,
     Point
 )
-from plot_balloons import (
-    get_ballonet_coordinates,
-    get_polygon_from_ballonet,
-    Polygon
+from plot_balloons import get_ballonet_placements, get_ballonet_stations, get_ballonet_vertices, transform_vertices
+from buoyancy import (
+    get_ballonet_arcs,
+    get_flat_surface,
+    get_submerged_area_jit,
+    get_submerged_polygon_jit,
+    transform_arcs_jit,
+    MAX_BREAKPOINTS,
+    WATER_BOUNDS
 )
+from buoyancy_table import BuoyancyTable
+from checkpoint import Checkpoint, CheckpointPolicy, save_checkpoint, load_checkpoint
+from dynamics import get_params_array, get_rhs_jit, get_jacobian_jit, Z_P, Z_Y, Z_GAMMA, P_MIN, P_MAX
+from frequency_response import FrequencyResponse, get_frequency_response
+from instrumentation import Instrumentation
+from integrator import dormand_prince, integrate_implicit, Event, IMPLICIT_METHODS
+from progress import Progress, ProgressEvent, TqdmProgress, PROGRESS_INTERVAL, NEVER
+from solve_kernel import euler_steps_jit, STATE_SIZE, STATE_P, STATE_W, STATE_Y, STATE_GAMMA
+from recording import Recorder, RecordingPolicy
+from result_cache import ResultCache, get_result_key
+from stability import Equilibrium, analyze_batch
+from steady_state import SteadyState, SteadyStateCriteria, SteadyStateMonitor
+from trajectory import get_n_steps, OUTPUT_CHUNK_SIZE
+from waves import SeaState, WaveField, SPECTRA
 
+BUOYANCY_METHODS = ('polygon', 'analytic', 'table')
 
-@jit(nopython=True, fastmath=True)
+ADAPTIVE_METHODS = ('dopri5', *IMPLICIT_METHODS)
+
+COMPILED_BLOCK = 4_096
+
+
+# Станции возвышения волны по ширине бассейна для buoyancy='polygon'
+WAVE_STATIONS = 65
+
+
+@njit(fastmath=True, cache=True)
 def F_x_jit(A, B, x):
     up = (B[1] - A[1]) * (x ** 2 / 2 - A[0] * x)
     down = B[0] - A[0]
     return up / down + A[1] * x
 
 
-@jit(nopython=True, fastmath=True)
+@njit(fastmath=True, cache=True)
 def get_S_gap_jit(UP, h):
     return max(0, UP[1] - h)
 
 
-@jit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def get_Q_in_jit(a, b, c, p):
     D = b ** 2 - 4 * a * (c - p)
     root1 = (-b - sqrt(D)) / (2 * a)
@@ -41,12 +67,12 @@ def get_Q_in_jit(a, b, c, p):
     return max(root1, root2)
 
 
-@jit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def get_Q_out_jit(xi, p, rho, S_gap):
     return xi * np.sqrt(2 * p / rho) * S_gap
 
 
-@jit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def get_cylinder_volume_jit(up_y, V_c, S, h):
     if up_y <= 0:
         return V_c
@@ -58,165 +84,728 @@ def get_cylinder_volume_jit(up_y, V_c, S, h):
     return V_c - V_upper_part
 
 
-@jit(fastmath=True)
+@njit(fastmath=True, cache=True)
 def get_d2y_dt2_jit(Fp, Fa, Fm, m):
     return (Fp + Fa - Fm) / m
 
 
+@njit(fastmath=True, cache=True)
+def get_cos_alpha_jit(v1, v2=None):
+    v2 = np.array([0, 1], dtype=np.float32) if v2 is None else v2
+    dot_prod = np.dot(v1, v2)
+    magnitude1, magnitude2 = np.linalg.norm(v1), np.linalg.norm(v2)
+
+    return dot_prod / (magnitude1 * magnitude2)
+
+
+@njit(fastmath=True, cache=True)
+def clamp_jit(value, min_value, max_value):
+    return min(max(value, min_value), max_value)
+
+
 class SystemOfEquations:
     def __init__(self,
                  params: Parameters,
                  ballonet_params: BallonetParameters,
                  t_end: int | float = 1_000,
-                 eps: float = 0.01) -> None:
+                 eps: float = 0.01,
+                 buoyancy: str = 'polygon',
+                 output_dir: Optional[str] = None,
+                 output_chunk_size: int = OUTPUT_CHUNK_SIZE,
+                 recording: Optional[RecordingPolicy] = None,
+                 checkpoint: Optional[CheckpointPolicy] = None,
+                 steady_state: Optional[SteadyStateCriteria] = None,
+                 pitch: bool = False,
+                 water_surface: Optional[tuple[np.ndarray, np.ndarray]] = None,
+                 waves: Optional[SeaState] = None,
+                 instrument: bool = False,
+                 progress: Optional[Callable[[ProgressEvent], None]] = None,
+                 progress_interval: float = PROGRESS_INTERVAL,
+                 result_cache: Optional[ResultCache] = None,
+                 recompute: bool = False) -> None:
+
+        if buoyancy not in BUOYANCY_METHODS:
+            raise ValueError(f"Unknown buoyancy method: {buoyancy}. Use one of {BUOYANCY_METHODS}")
+        if pitch and buoyancy == 'table':
+            raise ValueError("Buoyancy tables depend on the vertical offset only; use pitch with "
+                             "'polygon' or 'analytic' buoyancy")
+        if water_surface is not None and buoyancy != 'polygon':
+            raise ValueError("A non-flat water_surface requires 'polygon' buoyancy")
+        if water_surface is not None and waves is not None:
+            raise ValueError("Set either water_surface or waves")
+        if checkpoint is not None and output_dir is None:
+            raise ValueError("Checkpoints require output_dir: the recorded output must survive a restart")
 
         self.params: Parameters = params
         self.ballonet_params: BallonetParameters = ballonet_params
+        self.t_end: int | float = t_end
         self.eps: float = eps
+        self.buoyancy: str = buoyancy
+        # pitch - точки A, B и баллонеты поворачиваются на γ вокруг центра (0, y) (только solve())
+        self.pitch: bool = pitch
         self.current_iteration: int = 0
 
         self.p = (params.m * params.g) / params.S
-        self.gamma = 0
+        self.gamma = 0.0
         self.y = params.k
         self.W = params.S * params.k
-        self.S_gap = 0
+        self.S_gap = 0.0
 
-        self.dW_dt = 0
+        self.dW_dt = 0.0
 
-        self.t_array = np.arange(0, t_end, eps)
+        self.A = Point(x=-self.params.l, y=self.y)
+        self.B = Point(x=self.params.l, y=self.y)
 
-        self.y_array = np.zeros_like(self.t_array)
-        self.y_array[0] = self.y
+        # self.circle_S = np.pi * (self.params.r ** 2)
+        # self.V_cylinder = self.circle_S * self.params.h
 
-        self.p_array = np.zeros_like(self.t_array)
-        self.p_array[0] = self.p
+        # С output_dir или recording выдача идёт через Recorder: recording задаёт прореживание, сетку выдачи,
+        # огибающие и окна записи, output_dir - запись кусками в .npy-файлы вместо массивов в памяти.
+        # После решения t_array, y_array, ... - записанные строки (с output_dir - отображения файлов в память)
+        self.n_steps: int = get_n_steps(t_end, eps)
+        self.n_recorded: int = 0
+        self.output_dir: Optional[str] = output_dir
+        self.output_chunk_size: int = output_chunk_size
+        self.recording: Optional[RecordingPolicy] = recording
+        self.recorder: Optional[Recorder] = None
+        self.envelope: Optional[dict[str, np.ndarray]] = None
+        self.checkpoint: Optional[CheckpointPolicy] = checkpoint
 
-        self.w_array = np.zeros_like(self.t_array)
-        self.w_array[0] = self.W
+        # steady_state - ранняя остановка solve()/solve_compiled(), когда y, p и γ перестали меняться;
+        # итог (время установления и равновесие) - в self.steady_state, выдача обрезается до шага остановки
+        self.steady_state_criteria: Optional[SteadyStateCriteria] = steady_state
+        self.monitor: Optional[SteadyStateMonitor] = None
+        self.steady_state: Optional[SteadyState] = None
 
-        self.gamma_array = np.zeros_like(self.t_array)
-        self.gamma_array[0] = self.gamma
+        # instrument - таймеры и счётчики фаз solve() и пиковая память; захваты cProfile/tracemalloc
+        # включаются переменной окружения HOVERCRAFT_PROFILE. Без instrument цикл solve() не меняется
+        self.instrumentation: Optional[Instrumentation] = Instrumentation() if instrument else None
 
-        self.A = Point(x=-self.params.l, y=self.y)
-        self.B = Point(x=self.params.l, y=self.y)
+        # progress - наблюдатель за ходом решения (например, TqdmProgress()): вызывается не чаще раза
+        # в progress_interval секунд с номером шага, модельным временем, оценкой остатка и состоянием
+        self.progress: Optional[Progress] = None if progress is None else Progress(progress, progress_interval)
 
-        # self.circle_S = np.pi * (self.params.r ** 2)
-        # self.V_cylinder = self.circle_S * self.params.h
+        # result_cache - готовые результаты solve(), solve_compiled() и solve_adaptive() по ключу из параметров,
+        # настроек решения и версии кода; recompute - решить заново и перезаписать запись
+        self.result_cache: Optional[ResultCache] = result_cache
+        self.recompute: bool = recompute
 
-        self.A_positions = [self.A.to_array().copy()]
-        self.B_positions = [self.B.to_array().copy()]
+        if output_dir is None and recording is None:
+            self.t_array = np.arange(0, t_end, eps)
 
-        self.grain = 100
+            self.y_array = np.zeros_like(self.t_array)
+            self.y_array[0] = self.y
+
+            self.p_array = np.zeros_like(self.t_array)
+            self.p_array[0] = self.p
 
-        self.A_coords: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                            minor=True,
-                                                                            new_dx=2.5,
-                                                                            new_dy=self.A.y - 1.2,
-                                                                            grain=self.grain)
-        self.B_coords: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                            minor=False,
-                                                                            new_dx=2.5,
-                                                                            new_dy=self.B.y - 1.2,
-                                                                            grain=self.grain)
+            self.w_array = np.zeros_like(self.t_array)
+            self.w_array[0] = self.W
 
-        self.water_poly = Polygon(Polygon([(-4, 0), (4, 0), (4, -4), (-4, -4)]))
+            self.gamma_array = np.zeros_like(self.t_array)
+            self.gamma_array[0] = self.gamma
 
-        self.A_poly = get_polygon_from_ballonet(self.A_coords)
-        self.B_poly = get_polygon_from_ballonet(self.B_coords)
+            self.A_positions = [self.A.to_array().copy()]
+            self.B_positions = [self.B.to_array().copy()]
+
+        self.grain = 100
+
+        self.water_bounds = WATER_BOUNDS
+        # Поверхность воды - ломаная (x, y) с возрастающими x (для buoyancy='polygon'); по умолчанию - горизонтальная
+        # поверхность water_bounds. Дно и стенки бассейна берутся из water_bounds
+        surface_x, surface_y = get_flat_surface(self.water_bounds) if water_surface is None else water_surface
+        self.surface_x = np.ascontiguousarray(surface_x, dtype=np.float64)
+        self.surface_y = np.ascontiguousarray(surface_y, dtype=np.float64)
+        if self.surface_x.shape != self.surface_y.shape or np.any(np.diff(self.surface_x) <= 0):
+            raise ValueError("water_surface must be two arrays of equal length with increasing x")
+
+        # waves - нерегулярное волнение: возвышение η(t) в станциях считается кусками заранее, шаг solve()
+        # только выбирает строку. Для polygon станции покрывают бассейн и задают ломаную поверхность,
+        # для analytic и table станция одна на баллонет - местный уровень воды над его центром
+        self.A_wave, self.B_wave = 0.0, 0.0
+        self.waves: Optional[WaveField] = None
+        if waves is not None:
+            _, _, left, right = self.water_bounds
+            if buoyancy == 'polygon':
+                self.surface_x = np.linspace(left, right, WAVE_STATIONS)
+                self.surface_y = np.full(WAVE_STATIONS, float(self.water_bounds[0]))
+                stations = self.surface_x
+            else:
+                stations = get_ballonet_stations(ballonet_params, params.l, pitch)
+            self.waves = WaveField(waves, stations, eps)
+
+        # (new_dx, new_dy) баллонетов; начальное положение отличается от обновляемого в solve()
+        self.A_offset = (2.5, self.A.y - 1.2)
+        self.B_offset = (2.5, self.B.y - 1.2)
+
+        # Таблицы по (minor, new_dx): для начального смещения и для смещений из update_ballonet_polygons()
+        self.tables: dict[tuple[bool, float], BuoyancyTable] = {}
+        if buoyancy == 'table':
+            for minor, new_dx in ((True, self.A_offset[0]), (False, self.B_offset[0]),
+                                  (True, self.A.x), (False, self.B.x)):
+                self.get_table(minor, new_dx)
+        self.build_ballonet_templates()
+        self.build_ballonet_geometry()
+
+    def get_table(self, minor: bool, new_dx: int | float) -> BuoyancyTable:
+        key = (minor, float(new_dx))
+        if key not in self.tables:
+            self.tables[key] = BuoyancyTable(self.ballonet_params, minor=minor, new_dx=new_dx,
+                                             grain=self.grain, water_bounds=self.water_bounds)
+        return self.tables[key]
+
+    def build_ballonet_templates(self) -> None:
+        # Контуры баллонетов в связанной системе координат (начало - центр судна (0, y)) строятся один раз;
+        # на каждом шаге они только поворачиваются на γ и переносятся на y в place_ballonets().
+        # С тангажем каждый баллонет лежит под своим концом плеча и поворачивается вместе с ним
+        offsets = get_ballonet_placements(self.params.l, self.pitch)
+        if self.buoyancy == 'polygon':
+            self.A_template, self.B_template = (get_ballonet_vertices(self.ballonet_params, minor=minor, new_dx=dx,
+                                                                      new_dy=-self.params.h, grain=self.grain)
+                                                for minor, dx in offsets)
+        elif self.buoyancy == 'analytic':
+            self.A_template, self.B_template = (get_ballonet_arcs(self.ballonet_params, minor, dx, -self.params.h)
+                                                for minor, dx in offsets)
+
+    def build_ballonet_geometry(self) -> None:
+        # Начальное положение баллонетов задаётся смещениями A_offset/B_offset, а не шаблонами
+        if self.buoyancy == 'table':
+            return
+
+        if self.buoyancy == 'analytic':
+            self.A_arcs: np.ndarray = get_ballonet_arcs(self.ballonet_params, True, *self.A_offset)
+            self.B_arcs: np.ndarray = get_ballonet_arcs(self.ballonet_params, False, *self.B_offset)
+            self.breakpoints: np.ndarray = np.empty(MAX_BREAKPOINTS)
+            return
+
+        self.A_vertices = get_ballonet_vertices(self.ballonet_params, minor=True, new_dx=self.A_offset[0],
+                                                new_dy=self.A_offset[1], grain=self.grain)
+        self.B_vertices = get_ballonet_vertices(self.ballonet_params, minor=False, new_dx=self.B_offset[0],
+                                                new_dy=self.B_offset[1], grain=self.grain)
 
     def update_ballonet_polygons(self) -> None:
-        self.A_coords: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                            minor=True,
-                                                                            new_dx=self.A.x,
-                                                                            new_dy=self.A.y - self.params.h,
-                                                                            grain=self.grain)
-        self.B_coords: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                            minor=False,
-                                                                            new_dx=self.B.x,
-                                                                            new_dy=self.B.y - self.params.h,
-                                                                            grain=self.grain)
-        self.A_poly = get_polygon_from_ballonet(self.A_coords)
-        self.B_poly = get_polygon_from_ballonet(self.B_coords)
+        self.A_offset = (self.A.x, self.A.y - self.params.h)
+        self.B_offset = (self.B.x, self.B.y - self.params.h)
+        self.place_ballonets()
+
+    def place_ballonets(self) -> None:
+        gamma = self.gamma if self.pitch else 0.0
+        if self.buoyancy == 'analytic':
+            transform_arcs_jit(self.A_template, gamma, 0.0, self.y, self.A_arcs)
+            transform_arcs_jit(self.B_template, gamma, 0.0, self.y, self.B_arcs)
+        elif self.buoyancy == 'polygon':
+            transform_vertices(self.A_template, gamma, 0.0, self.y, out=self.A_vertices)
+            transform_vertices(self.B_template, gamma, 0.0, self.y, out=self.B_vertices)
+
+    def place_points(self) -> None:
+        # A и B - концы плеча длины l, повёрнутого на γ вокруг центра (0, y)
+        cos_g, sin_g = np.cos(self.gamma), np.sin(self.gamma)
+        self.A = Point(x=-self.params.l * cos_g, y=self.y - self.params.l * sin_g)
+        self.B = Point(x=self.params.l * cos_g, y=self.y + self.params.l * sin_g)
 
     @staticmethod
     def F_x(A: Point, B: Point, x: int | float) -> int | float:
-        return F_x_jit(A.to_array(), B.to_array(), x)
+        return F_x_jit(A.to_array(), B.to_array(), float(x))
 
     def get_W(self, A: Point, B: Point, down: int | float, up: int | float) -> int | float:
         return self.F_x(A, B, up) - self.F_x(A, B, down)
 
+    def update_water(self, idx: int) -> None:
+        # Поверхность воды в момент idx * eps
+        if self.waves is None:
+            return
+        elevation = self.waves.get_row(idx)
+        if self.buoyancy == 'polygon':
+            np.add(elevation, self.water_bounds[0], out=self.surface_y)
+        else:
+            self.A_wave, self.B_wave = elevation
+
     def get_cylinder_volume(self) -> int | float:
-        return self.A_poly.intersection(self.water_poly).area + self.B_poly.intersection(self.water_poly).area
+        surface, bottom, left, right = self.water_bounds
+        if self.buoyancy == 'table':
+            # Подъём воды на η равносилен опусканию баллонета на η
+            return (self.get_table(True, self.A_offset[0]).get_area(self.A_offset[1] - self.A_wave) +
+                    self.get_table(False, self.B_offset[0]).get_area(self.B_offset[1] - self.B_wave))
+        if self.buoyancy == 'analytic':
+            return (get_submerged_area_jit(self.A_arcs, surface + self.A_wave, bottom, left, right, self.breakpoints) +
+                    get_submerged_area_jit(self.B_arcs, surface + self.B_wave, bottom, left, right, self.breakpoints))
+        return (get_submerged_polygon_jit(self.A_vertices, self.surface_x, self.surface_y, bottom, left, right)[0] +
+                get_submerged_polygon_jit(self.B_vertices, self.surface_x, self.surface_y, bottom, left, right)[0])
         # return get_cylinder_volume_jit(upper_point.y, self.V_cylinder, self.circle_S, self.params.h)
 
     def get_S_gap(self, upper_point: Point) -> int | float:
-        return get_S_gap_jit(upper_point.to_array(), self.params.h)
-
-    def solve(self):
-        self.current_iteration = self.t_array.shape[0]
-        for idx in tqdm(range(1, self.current_iteration)):
+        return get_S_gap_jit(upper_point.to_array(), float(self.params.h))
+
+    def update_pressure(self) -> None:
+        dp_dt = self.get_dp_dt(W=self.W,
+                               Q_in=self.get_Q_in(),
+                               Q_out=self.get_Q_out(),
+                               dW_dt=self.dW_dt) * self.eps
+
+        self.p = self.clamp(value=self.p + dp_dt,
+                            min_value=600,
+                            max_value=2964)
+
+    def update_W(self) -> None:
+        # FIXME Changed: A.x + self.params.r | B.x - self.params.r
+        W_prev = self.W
+        self.W = self.get_W(A=self.A,
+                            B=self.B,
+                            down=self.A.x + self.ballonet_params.AD.r,
+                            up=self.B.x - self.ballonet_params.AD.r)
+
+        self.dW_dt = self.W - W_prev
+
+    def update_S_gap(self) -> None:
+        h = float(self.params.h)
+        self.S_gap = get_S_gap_jit(self.A.to_array(), h) + get_S_gap_jit(self.B.to_array(), h)
+
+    def solve(self, start: int = 1):
+        # start > 1 - продолжение с контрольной точки (resume()), выдача уже открыта.
+        # С instrument фазы шага замеряются обёртками на экземпляре (instrumentation.Instrumentation),
+        # отчёт - self.instrumentation.report()
+        key = self.get_result_key('solve') if start == 1 else None
+        if self.load_result(key):
+            return
+        if self.instrumentation is not None:
+            self.instrumentation.attach(self)
+            self.instrumentation.start()
+            try:
+                self.solve_steps(start)
+            finally:
+                self.instrumentation.stop(self.current_iteration - start)
+                self.instrumentation.detach(self)
+            return
+        self.solve_steps(start)
+        self.store_result(key)
+
+    def solve_steps(self, start: int) -> None:
+        if start == 1:
+            self.open_output()
+            if self.recorder is not None:
+                self.record(0)
+            self.open_monitor()
+            self.update_monitor(1)
+        self.current_iteration = self.n_steps
+        next_check = self.start_progress(start)
+        for idx in range(start, self.n_steps):
             ###################
-            dp_dt = self.get_dp_dt(W=self.W,
-                                   Q_in=self.get_Q_in(),
-                                   Q_out=self.get_Q_out(),
-                                   dW_dt=self.dW_dt) * self.eps
-
-            self.p = self.clamp(value=self.p + dp_dt,
-                                min_value=600,
-                                max_value=2964)
-
-            # FIXME Changed: A.x + self.params.r | B.x - self.params.r
-            self.W = self.get_W(A=self.A,
-                                B=self.B,
-                                down=self.A.x + self.ballonet_params.AD.r,
-                                up=self.B.x - self.ballonet_params.AD.r)
-
-            self.dW_dt = self.W - self.w_array[idx - 1]
-            self.S_gap = (get_S_gap_jit(self.A.to_array(), self.params.h) +
-                          get_S_gap_jit(self.B.to_array(), self.params.h))
-
-            self.w_array[idx] = self.W
-            self.p_array[idx] = self.p
+            self.update_pressure()
+            self.update_W()
+            self.update_S_gap()
             ###################
 
             # FIXME Changed:
             # V = self.get_cylinder_volume(self.A) + self.get_cylinder_volume(self.B)
 
+            self.update_water(idx - 1)
             V = self.get_cylinder_volume()
             d2y_dt2 = self.get_d2y_dt2(Fp=self.get_F_p(),
                                        Fm=self.params.m * self.params.g,
                                        Fa=self.get_F_a(V)) * self.eps
             self.y += d2y_dt2
-            self.y_array[idx] = self.y
             ###################
 
             d2gamma_dt2 = self.get_d2gamma_d2t(Fa=self.get_F_a(V),
                                                cos_a=self.get_cos_alpha(self.A.to_array())) * self.eps
 
-            # FIXME: нужно крутить точки
-            # if self.gamma > 0:
-            #     self.B.y += d2y_dt2
-            #     self.A.y -= d2y_dt2
-            # else:
-            #     self.A.y += d2y_dt2
-            #     self.B.y -= d2y_dt2
-
-            self.A.y += d2y_dt2
-            self.B.y += d2y_dt2
-
-            self.A_positions.append(self.A.to_array().copy())
-            self.B_positions.append(self.B.to_array().copy())
+            if self.pitch:
+                self.gamma += d2gamma_dt2
+                self.place_points()
+            else:
+                self.A.y += d2y_dt2
+                self.B.y += d2y_dt2
+                self.gamma += d2gamma_dt2
             self.update_ballonet_polygons()
             # #########
+            self.record(idx)
+            if self.update_monitor(idx + 1):
+                break
+            if self.checkpoint is not None and self.checkpoint.is_due(idx + 1):
+                self.save_checkpoint('solve', idx + 1, self.get_state())
+            if idx >= next_check:
+                next_check = self.update_progress(idx + 1)
+        self.close_output()
+        self.finish_progress()
+
+    def get_progress_state(self, state: Optional[np.ndarray] = None) -> dict[str, float]:
+        # state - вектор get_state() (solve_compiled() обновляет атрибуты системы только в конце)
+        if state is None:
+            return {'y': float(self.y), 'p': float(self.p), 'W': float(self.W), 'gamma': float(self.gamma)}
+        return {'y': float(state[STATE_Y]), 'p': float(state[STATE_P]),
+                'W': float(state[STATE_W]), 'gamma': float(state[STATE_GAMMA])}
+
+    def start_progress(self, start: int) -> int:
+        # Номер шага первой проверки; без наблюдателя - NEVER
+        if self.progress is None:
+            return NEVER
+        self.progress.start(start, self.n_steps, self.eps)
+        return self.progress.next_check
+
+    def update_progress(self, iteration: int, state: Optional[np.ndarray] = None) -> int:
+        if self.progress.check(iteration):
+            self.progress.emit(iteration, self.get_progress_state(state))
+        return self.progress.next_check
+
+    def finish_progress(self) -> None:
+        if self.progress is not None:
+            self.progress.emit(self.current_iteration, self.get_progress_state(), done=True)
+
+    def open_monitor(self) -> None:
+        self.steady_state = None
+        if self.steady_state_criteria is not None:
+            self.monitor = SteadyStateMonitor(self.steady_state_criteria, self.eps)
+
+    def update_monitor(self, iteration: int, values: Optional[np.ndarray] = None,
+                       W: Optional[float] = None) -> bool:
+        # values - (n, 3) y, p, γ шагов до iteration; без values - текущее состояние одной строкой.
+        # При установлении фиксирует итог и останавливает решение на iteration
+        if self.monitor is None:
+            return False
+        if values is None:
+            values = np.array([[self.y, self.p, self.gamma]])
+        if not self.monitor.update(values):
+            return False
+        window = self.monitor.bin_steps * self.steady_state_criteria.n_bins
+        self.current_iteration = iteration
+        self.steady_state = SteadyState(settling_time=(iteration - window) * self.eps,
+                                        t_stop=(iteration - 1) * self.eps, iteration=iteration,
+                                        y=float(values[-1, 0]), p=float(values[-1, 1]),
+                                        gamma=float(values[-1, 2]), W=self.W if W is None else float(W))
+        return True
+
+    def record(self, idx: int) -> None:
+        if self.recorder is not None:
+            self.recorder.append(idx * self.eps, self.y, self.p, self.W, self.gamma,
+                               self.A.to_array(), self.B.to_array())
+            return
+        self.y_array[idx] = self.y
+        self.p_array[idx] = self.p
+        self.w_array[idx] = self.W
+        self.gamma_array[idx] = self.gamma
+        self.A_positions.append(self.A.to_array().copy())
+        self.B_positions.append(self.B.to_array().copy())
+
+    def open_output(self) -> None:
+        if self.output_dir is None and self.recording is None:
+            return
+        self.recorder = Recorder(self.recording or RecordingPolicy(), self.eps, self.n_steps,
+                                 output_dir=self.output_dir, chunk_size=self.output_chunk_size)
+
+    def close_output(self) -> None:
+        if self.recorder is None:
+            self.n_recorded = self.current_iteration
+            if self.current_iteration < self.t_array.shape[0]:
+                self.t_array, self.y_array = self.t_array[:self.n_recorded], self.y_array[:self.n_recorded]
+                self.p_array, self.w_array = self.p_array[:self.n_recorded], self.w_array[:self.n_recorded]
+                self.gamma_array = self.gamma_array[:self.n_recorded]
+            return
+        trajectory, self.envelope = self.recorder.close()
+        self.recorder = None
+        self.set_output(trajectory)
+
+    def set_output(self, trajectory: dict[str, np.ndarray]) -> None:
+        self.n_recorded = trajectory['t'].shape[0]
+        self.t_array = trajectory['t']
+        self.y_array, self.p_array = trajectory['y'], trajectory['p']
+        self.w_array, self.gamma_array = trajectory['w'], trajectory['gamma']
+        self.A_positions, self.B_positions = trajectory['A_positions'], trajectory['B_positions']
+
+    def get_state(self) -> np.ndarray:
+        state = np.empty(STATE_SIZE, dtype=np.float64)
+        state[:] = (self.p, self.W, self.y, self.gamma, self.dW_dt, self.S_gap,
+                    self.A.x, self.A.y, self.B.x, self.B.y, *self.A_offset, *self.B_offset)
+        return state
+
+    def set_state(self, state: np.ndarray) -> None:
+        self.p, self.W, self.y, self.gamma, self.dW_dt, self.S_gap = (float(v) for v in state[:6])
+        self.A = Point(x=float(state[6]), y=float(state[7]))
+        self.B = Point(x=float(state[8]), y=float(state[9]))
+        self.A_offset = (float(state[10]), float(state[11]))
+        self.B_offset = (float(state[12]), float(state[13]))
+        # Состояние после шага: баллонеты на шаблонных местах
+        self.place_ballonets()
+
+    def solve_compiled(self, timeout: Optional[float] = None, start: int = 1) -> None:
+        # Весь цикл solve() в одном numba-ядре с аналитической плавучестью (buoyancy='analytic').
+        # Отличия от solve() - только float64 вместо float32 в Point.to_array():
+        # относительное расхождение траекторий y, p, γ не превышает 1e-6 на t_end = 3 с, eps = 1e-3.
+        # timeout - мягкий: ядро запускается блоками по COMPILED_BLOCK шагов, время проверяется между блоками
+        # (первый блок выполняется всегда). По истечении времени состояние сохраняется на достигнутом шаге,
+        # A_positions/B_positions обрезаются до него и выбрасывается TimeoutError
+        # С output_dir или recording ядро пишет в буферы размером output_chunk_size, которые уходят в Recorder.
+        # С контрольными точками и progress блоки не длиннее COMPILED_BLOCK, условие записи и наблюдатель
+        # проверяются между ними.
+        # С steady_state границы блоков совпадают с корзинами монитора: остановка ровно на шаге установления
+        if self.pitch or self.waves is not None:
+            raise ValueError("pitch and waves are supported by solve() only")
+        key = self.get_result_key('solve_compiled') if start == 1 else None
+        if self.load_result(key):
+            return
+        n_steps = self.n_steps
+        if start == 1:
+            self.open_output()
+            self.open_monitor()
+            self.update_monitor(1, np.array([[self.y, self.p, self.gamma]]))
+        if self.recorder is None:
+            block = n_steps if timeout is None and self.progress is None else COMPILED_BLOCK
+            A_positions = np.empty((n_steps, 2), dtype=np.float64)
+            B_positions = np.empty((n_steps, 2), dtype=np.float64)
+            A_positions[0] = self.A.x, self.A.y
+            B_positions[0] = self.B.x, self.B.y
+        else:
+            if start == 1:
+                self.recorder.append(0.0, self.y, self.p, self.W, self.gamma,
+                                     (self.A.x, self.A.y), (self.B.x, self.B.y))
+            block = self.output_chunk_size
+            if timeout is not None or self.checkpoint is not None or self.progress is not None:
+                block = min(block, COMPILED_BLOCK)
+            buffers = (np.empty(block), np.empty(block), np.empty(block), np.empty(block),
+                       np.empty((block, 2)), np.empty((block, 2)))
+
+        state = self.get_state()
+        params = get_params_array(self.params)
+        r = float(self.ballonet_params.AD.r)
+        A_template = get_ballonet_arcs(self.ballonet_params, minor=True)
+        B_template = get_ballonet_arcs(self.ballonet_params, minor=False)
+        water_bounds = np.array(self.water_bounds, dtype=np.float64)
+
+        deadline = time.perf_counter() + (timeout or 0)
+        settled = False
+        next_check = self.start_progress(start)
+        while start < n_steps and not settled:
+            stop = min(start + block, n_steps)
+            if self.monitor is not None:
+                stop = min(stop, (start // self.monitor.bin_steps + 1) * self.monitor.bin_steps)
+            if self.recorder is None:
+                euler_steps_jit(state, params, r, A_template, B_template, water_bounds, self.eps, start, stop,
+                                self.y_array, self.p_array, self.w_array, self.gamma_array,
+                                A_positions, B_positions)
+                values = (self.y_array[start:stop], self.p_array[start:stop], self.gamma_array[start:stop])
+            else:
+                euler_steps_jit(state, params, r, A_template, B_template, water_bounds, self.eps, 0, stop - start,
+                                *buffers)
+                self.recorder.push(np.arange(start, stop) * self.eps, *(buffer[:stop - start] for buffer in buffers))
+                values = (buffers[0][:stop - start], buffers[1][:stop - start], buffers[3][:stop - start])
+            start = stop
+            settled = self.update_monitor(start, np.column_stack(values), W=state[1])
+            if self.checkpoint is not None and start < n_steps and not settled and self.checkpoint.is_due(start):
+                self.save_checkpoint('solve_compiled', start, state)
+            if start >= next_check:
+                next_check = self.update_progress(start, state)
+            if timeout is not None and time.perf_counter() > deadline:
+                break
+
+        self.current_iteration = start
+        if self.recorder is None:
+            self.A_positions, self.B_positions = A_positions[:start], B_positions[:start]
+        self.close_output()
+        self.set_state(state)
+        self.finish_progress()
+        if start < n_steps and not settled:
+            raise TimeoutError(f"solve_compiled stopped at iteration {start}/{n_steps} after {timeout}s")
+        self.store_result(key)
+
+    def get_result_key(self, solver: str, **options) -> Optional[str]:
+        # None - результат не кэшируется: без result_cache, с выдачей в output_dir (результат - файлы каталога),
+        # с контрольными точками и с инструментированием (замеряется сам счёт)
+        if (self.result_cache is None or self.output_dir is not None or self.checkpoint is not None or
+                self.instrumentation is not None):
+            return None
+        return get_result_key(self.params, self.ballonet_params, self.t_end, self.eps, solver,
+                              buoyancy=self.buoyancy, pitch=self.pitch, water_bounds=self.water_bounds,
+                              surface_x=self.surface_x, surface_y=self.surface_y,
+                              waves=None if self.waves is None else self.waves.sea,
+                              recording=self.recording, steady_state=self.steady_state_criteria, **options)
+
+    def store_result(self, key: Optional[str], **meta) -> None:
+        if key is None:
+            return
+        arrays = {'t': self.t_array, 'y': self.y_array, 'p': self.p_array, 'w': self.w_array,
+                  'gamma': self.gamma_array, 'A_positions': np.asarray(self.A_positions),
+                  'B_positions': np.asarray(self.B_positions), 'state': self.get_state()}
+        for name, values in (self.envelope or {}).items():
+            arrays[f"envelope.{name}"] = values
+        meta.update(current_iteration=self.current_iteration, n_recorded=self.n_recorded,
+                    steady_state=None if self.steady_state is None else dataclasses.asdict(self.steady_state))
+        self.result_cache.store(key, arrays, meta)
+
+    def load_result(self, key: Optional[str]) -> bool:
+        # Восстанавливает выдачу и конечное состояние из result_cache; False - промах или recompute
+        if key is None or self.recompute:
+            return False
+        cached = self.result_cache.load(key)
+        if cached is None:
+            return False
+        arrays, meta = cached
+        self.current_iteration = meta['current_iteration']
+        if self.recording is None:
+            # Массивы выдачи заполняются на месте: прогон параметров подменяет их видами на общий блок памяти
+            n = self.n_recorded = meta['n_recorded']
+            for channel in ('t', 'y', 'p', 'w', 'gamma'):
+                array = getattr(self, f"{channel}_array")
+                array[:n] = arrays[channel]
+                setattr(self, f"{channel}_array", array[:n])
+            self.A_positions, self.B_positions = arrays['A_positions'], arrays['B_positions']
+        else:
+            self.set_output({name: arrays[name] for name in ('t', 'y', 'p', 'w', 'gamma',
+                                                             'A_positions', 'B_positions')})
+        envelope = {name[len('envelope.'):]: values for name, values in arrays.items() if name.startswith('envelope.')}
+        self.envelope = envelope or None
+        self.steady_state = None if meta['steady_state'] is None else SteadyState(**meta['steady_state'])
+        if 'events' in meta:
+            self.events = [tuple(event) for event in meta['events']]
+            self.integration_stats = meta['integration_stats']
+        self.set_state(arrays['state'])
+        if self.progress is not None:
+            self.start_progress(self.current_iteration)
+            self.finish_progress()
+        return True
+
+    def get_identity(self) -> np.ndarray:
+        # Параметры системы, геометрия баллонета и настройки модели (плавучесть, тангаж, поверхность воды
+        # или волнение): контрольная точка подходит только той же системе
+        settings = [BUOYANCY_METHODS.index(self.buoyancy), float(self.pitch)]
+        if self.waves is None:
+            surface = (self.surface_x, self.surface_y)
+        else:
+            # С волнением поверхность - не аргумент, а состояние шага (polygon перезаписывает surface_y)
+            sea = self.waves.sea
+            settings += [sea.Hs, sea.Tp, SPECTRA.index(sea.spectrum), sea.peak_enhancement, sea.n_components,
+                         *sea.omega_range, sea.seed]
+            surface = ()
+        return np.concatenate((get_params_array(self.params),
+                               get_ballonet_arcs(self.ballonet_params, minor=False).ravel(),
+                               np.array(self.water_bounds, dtype=np.float64),
+                               np.array(settings, dtype=np.float64), *surface))
+
+    def save_checkpoint(self, solver: str, iteration: int, state: np.ndarray) -> None:
+        monitor_state = np.empty(0) if self.monitor is None else self.monitor.get_state()
+        save_checkpoint(self.checkpoint.path, Checkpoint(solver=solver, iteration=iteration, n_steps=self.n_steps,
+                                                         eps=self.eps, params=self.get_identity(), state=state,
+                                                         recorder_state=self.recorder.get_state(),
+                                                         monitor_state=monitor_state))
+        self.checkpoint.reset(iteration)
+
+    def resume(self, path: str) -> None:
+        # Продолжает решение с контрольной точки path тем же методом. Система создаётся с теми же аргументами;
+        # выдача в output_dir обрезается до курсора контрольной точки, результат совпадает с непрерывным прогоном
+        checkpoint = load_checkpoint(path)
+        if (checkpoint.n_steps != self.n_steps or checkpoint.eps != self.eps or
+                not np.array_equal(checkpoint.params, self.get_identity())):
+            raise ValueError(f"Checkpoint {path} belongs to another system")
+        if self.output_dir is None:
+            raise ValueError("resume() requires output_dir")
+
+        self.set_state(checkpoint.state)
+        self.recorder = Recorder(self.recording or RecordingPolicy(), self.eps, self.n_steps,
+                                 output_dir=self.output_dir, chunk_size=self.output_chunk_size,
+                                 state=checkpoint.recorder_state)
+        self.open_monitor()
+        if self.monitor is not None and checkpoint.monitor_state.shape[0]:
+            self.monitor.set_state(checkpoint.monitor_state)
+        if self.checkpoint is not None:
+            self.checkpoint.reset(checkpoint.iteration)
+        getattr(self, checkpoint.solver)(start=checkpoint.iteration)
+
+    def analyze_equilibrium(self) -> Equilibrium:
+        # Точка равновесия (p, y, γ) и устойчивость без интегрирования по времени: метод Ньютона по
+        # непрерывной системе solve_adaptive() и собственные числа её матрицы Якоби.
+        # γ в правые части не входит - берётся текущий, соответствующая мода нейтральна
+        return analyze_batch([self.params], self.ballonet_params, self.water_bounds, gamma=self.gamma)[0]
+
+    def get_frequency_response(self, omega: np.ndarray) -> FrequencyResponse:
+        # Передаточные функции качки (p, y, γ) по волне и напору вентилятора в точке равновесия
+        # analyze_equilibrium(); вместе с SeaState даёт статистику отклика без интегрирования по времени
+        return get_frequency_response([self.params], self.ballonet_params, omega, self.water_bounds, gamma=self.gamma)
+
+    def get_events(self) -> list[Event]:
+        def clamp_to(bound: int | float):
+            def action(t: float, z: np.ndarray) -> np.ndarray:
+                z = z.copy()
+                z[Z_P] = bound
+                return z
+            return action
+
+        return [
+            Event('S_gap', lambda t, z: z[Z_Y] - self.params.h),
+            Event('p_max', lambda t, z: z[Z_P] - P_MAX, direction=1, action=clamp_to(P_MAX)),
+            Event('p_min', lambda t, z: z[Z_P] - P_MIN, direction=-1, action=clamp_to(P_MIN)),
+        ]
+
+    def solve_adaptive(self,
+                       method: str = 'dopri5',
+                       rtol: float = 1e-6,
+                       atol: float | tuple = (1e-3, 1e-8, 1e-10),
+                       max_step: float = np.inf) -> None:
+        # dopri5 - Дормана-Принс 5(4) с контролем ошибки; BDF/Radau - неявные методы scipy
+        # с аналитической матрицей Якоби. eps задаёт только шаг выдачи t_array.
+        # События (начало утечки S_gap и ограничения давления) находятся точно, шаг обрезается по ним
+        if method not in ADAPTIVE_METHODS:
+            raise ValueError(f"Unknown method: {method}. Use one of {ADAPTIVE_METHODS}")
+        if self.output_dir is not None or self.recording is not None or self.steady_state_criteria is not None:
+            raise ValueError("output_dir, recording and steady_state are supported by solve() and solve_compiled() only")
+        if self.pitch or self.waves is not None:
+            raise ValueError("pitch and waves are supported by solve() only")
+        key = self.get_result_key('solve_adaptive', method=method, rtol=rtol, atol=atol, max_step=max_step)
+        if self.load_result(key):
+            return
+
+        params = get_params_array(self.params)
+        r = float(self.ballonet_params.AD.r)
+        A_template = get_ballonet_arcs(self.ballonet_params, minor=True)
+        B_template = get_ballonet_arcs(self.ballonet_params, minor=False)
+        water_bounds = np.array(self.water_bounds, dtype=np.float64)
+
+        z0 = np.array([self.p, self.y, self.gamma], dtype=np.float64)
+        self.start_progress(1)  # шаги метода не совпадают с сеткой выдачи: только итоговое событие
+
+        def rhs(t: float, z: np.ndarray) -> np.ndarray:
+            return get_rhs_jit(z, params, r, A_template, B_template, water_bounds)
+
+        def jac(t: float, z: np.ndarray) -> np.ndarray:
+            return get_jacobian_jit(z, params, r, A_template, B_template, water_bounds)
+
+        if method == 'dopri5':
+            result = dormand_prince(rhs, z0, self.t_array, rtol=rtol, atol=atol, max_step=max_step,
+                                    events=self.get_events())
+        else:
+            result = integrate_implicit(rhs, jac, z0, self.t_array, method=method, rtol=rtol, atol=atol,
+                                        max_step=max_step, events=self.get_events())
+        self.store_continuous_solution(result.z)
+        self.finish_progress()
+        self.events = result.events
+        self.integration_stats = {'n_steps': result.n_steps,
+                                  'n_rejected': result.n_rejected,
+                                  'n_rhs': result.n_rhs}
+        self.store_result(key, events=self.events, integration_stats=self.integration_stats)
+
+    def store_continuous_solution(self, z: np.ndarray) -> None:
+        # Заполняет массивы выдачи так же, как solve(): точки A и B движутся вместе с y
+        self.current_iteration = self.n_recorded = self.n_steps
+        self.p_array[:] = z[:, Z_P]
+        self.y_array[:] = z[:, Z_Y]
+        self.gamma_array[:] = z[:, Z_GAMMA]
+        self.w_array[:] = self.y_array * (2 * self.params.l - 2 * self.ballonet_params.AD.r)
+        self.w_array[0] = self.W
 
-            self.gamma += d2gamma_dt2
-            self.gamma_array[idx] = self.gamma
+        self.A_positions = np.column_stack((np.full_like(self.y_array, -self.params.l), self.y_array))
+        self.B_positions = np.column_stack((np.full_like(self.y_array, self.params.l), self.y_array))
+
+        state = self.get_state()
+        state[:6] = (self.p_array[-1], self.w_array[-1], self.y_array[-1], self.gamma_array[-1],
+                     self.w_array[-1] - self.w_array[-2],
+                     2 * max(0.0, self.y_array[-1] - self.params.h))
+        state[6:10] = (-self.params.l, self.y_array[-1], self.params.l, self.y_array[-1])
+        state[10:] = (-self.params.l, self.y_array[-1] - self.params.h,
+                      self.params.l, self.y_array[-1] - self.params.h)
+        self.set_state(state)
 
     def get_d2y_dt2(self,
                     Fp: int | float,
                     Fm: int | float,
                     Fa: int | float) -> float:
-        return get_d2y_dt2_jit(Fp, Fa, Fm, self.params.m)
+        return get_d2y_dt2_jit(Fp, Fa, Fm, float(self.params.m))
 
     def get_dp_dt(self,
                   W: int | float,
@@ -239,27 +828,15 @@ class SystemOfEquations:
         return self.params.rho * self.params.g * V
 
     def get_Q_in(self) -> int | float:
-        return get_Q_in_jit(self.params.a, self.params.b, self.params.c, self.p)
-
-    @staticmethod
-    @njit(fastmath=True)
-    def get_cos_alpha(v1: np.array,
-                      v2: Optional[np.array] = None) -> float:
-        v2 = np.array([0, 1], dtype=np.float32) if v2 is None else v2
-        dot_prod = np.dot(v1, v2)
-        magnitude1, magnitude2 = np.linalg.norm(v1), np.linalg.norm(v2)
+        return get_Q_in_jit(float(self.params.a), float(self.params.b), float(self.params.c), self.p)
 
-        return dot_prod / (magnitude1 * magnitude2)
+    # Ядра модульного уровня: их перечисляет и прогревает kernels.py
+    get_cos_alpha = staticmethod(get_cos_alpha_jit)
 
     def get_Q_out(self) -> float:
-        return get_Q_out_jit(self.params.xi, self.p, self.params.rho, self.S_gap)
+        return get_Q_out_jit(float(self.params.xi), self.p, float(self.params.rho), self.S_gap)
 
-    @staticmethod
-    @jit(fastmath=True)
-    def clamp(value: int | float,
-              min_value: int | float,
-              max_value: int | float) -> int | float:
-        return min(max(value, min_value), max_value)
+    clamp = staticmethod(clamp_jit)
 
     def __repr__(self) -> str:
         separator = "\n" + "+" + ("-" * 50) + "\n"
@@ -283,137 +860,25 @@ class SystemOfEquations:
         return repr_str
 
     def plot(self, max_elem: Optional[int] = None) -> None:
-
         if self.current_iteration == 0:
             raise RuntimeError("Use .solve() method first")
-
-        if max_elem is None:
-            max_elem = self.t_array.shape[0]
-
-        y = self.y_array[:max_elem]
-        p = self.p_array[:max_elem]
-        gamma = self.gamma_array[:max_elem]
-        W = self.w_array[:max_elem]
-        t = self.t_array[:max_elem]
-
-        plt.figure(figsize=(18, 8))
-        plt.subplot(2, 2, 1)
-        plt.grid()
-        plt.plot(t, y)
-        plt.title('Y')
-        plt.xlabel('Time (s)')
-        plt.ylabel('Y')
-
-        plt.subplot(2, 2, 2)
-        plt.plot(t, gamma)
-        plt.grid()
-        plt.title('Gamma')
-        plt.xlabel('Time (s)')
-        plt.ylabel('Gamma')
-
-        plt.subplot(2, 2, 3)
-        plt.plot(t, p)
-        plt.grid()
-        plt.title('P')
-        plt.xlabel('Time (s)')
-        plt.ylabel('P')
-
-        plt.subplot(2, 2, 4)
-        plt.plot(t, W)
-        plt.grid()
-        plt.title('W')
-        plt.xlabel('Time (s)')
-        plt.ylabel('W')
-
-        plt.tight_layout()
-        plt.show()
+        from plotting import plot_solution
+        plot_solution(self, max_elem)
 
     def animate_model(self,
                       save: bool = True,
                       interval: int | float = 10,
                       filename: str = "animation.mp4") -> None:
-        fig, ax = plt.subplots()
-        step = int(1 / (self.eps * 100))
-        ax.grid(True)
-        ax.axis('equal')
-        ax.set_title('Model Animation')
-        ax.set_xlabel('X')
-        ax.set_ylabel('Y')
-        ax.set_xlim(-self.params.l - 1, self.params.l + 1)
-        ax.set_ylim(min(self.y_array) - 5, max(self.y_array) + 5)
-        line, = ax.plot([], [], 'k-')
-        ballonet_poly, = ax.plot([], [], 'k-')
-        ballonet_poly_reverse, = ax.plot([], [], 'k-')
-
-        scatter_A = ax.scatter([], [], s=100, color='orange')
-        scatter_B = ax.scatter([], [], s=100, color='orange')
-        scatter_O = ax.scatter([], [], s=100, color='red')
-
-        water_surface = ax.fill_between([ax.get_xlim()[0], ax.get_xlim()[1]],
-                                        [0, 0],
-                                        ax.get_ylim()[0],
-                                        color='blue',
-                                        alpha=0.3)
-
-        def init() -> tuple:
-            line.set_data([], [])
-            ballonet_poly.set_data([], [])
-            ballonet_poly_reverse.set_data([], [])
-            scatter_A.set_offsets(np.empty((0, 2)))
-            scatter_B.set_offsets(np.empty((0, 2)))
-            scatter_O.set_offsets(np.empty((0, 2)))
-            return (line,
-                    ballonet_poly, ballonet_poly_reverse,
-                    scatter_A, scatter_B, scatter_O,
-                    water_surface)
-
-        def update(frame):
-            A_pos = [self.A_positions[frame][0], self.A_positions[frame][1]]
-            B_pos = [self.B_positions[frame][0], self.B_positions[frame][1]]
-            O_pos = [0, self.y_array[frame]]
-            scatter_A.set_offsets(np.array(A_pos).reshape(1, 2))
-            scatter_B.set_offsets(np.array(B_pos).reshape(1, 2))
-            scatter_O.set_offsets(np.array(O_pos).reshape(1, 2))
-            line.set_data([A_pos[0], B_pos[0]], [A_pos[1], B_pos[1]])
-
-            coords: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                         minor=True,
-                                                                         new_dx=2.5,
-                                                                         new_dy=A_pos[1] - 1.2)
-            coords_reverse: list[BallonetCoordinates] = get_ballonet_coordinates(self.ballonet_params,
-                                                                                 minor=False,
-                                                                                 new_dx=2.5,
-                                                                                 new_dy=B_pos[1] - 1.2)
-            ballonet_poly.set_data(
-                *get_polygon_from_ballonet(coords).exterior.xy
-            )
-            ballonet_poly_reverse.set_data(
-                *get_polygon_from_ballonet(coords_reverse).exterior.xy)
-
-            return (line,
-                    ballonet_poly, ballonet_poly_reverse,
-                    scatter_A, scatter_B, scatter_O,
-                    water_surface)
-
-        ani = FuncAnimation(fig, update,
-                            frames=tuple(range(0, len(self.A_positions), step)),
-                            init_func=init,
-                            blit=True, interval=interval)
-
-        if save:
-            os.makedirs("animations", exist_ok=True)
-            writer = FFMpegWriter(fps=1000 // interval, metadata=dict(artist='User'), bitrate=1800)
-            ani.save(os.path.join("animations", filename), writer=writer)
-            print(f"Animation saved as animations/{filename}")
-
-        plt.show()
+        from plotting import animate_model
+        animate_model(self, save=save, interval=interval, filename=filename)
 
 
 def main() -> None:
     equations = SystemOfEquations(Parameters(h=1, m=16_000),
                                   BallonetParameters(),
                                   t_end=30,
-                                  eps=1e-3)
+                                  eps=1e-3,
+                                  progress=TqdmProgress())
     print(equations)
     equations.solve()
     print(equations)
@@ -0,0 +1,91 @@
+from math import sqrt
+
+import numpy as np
+from numba import njit
+
+from buoyancy import MAX_BREAKPOINTS
+from dynamics import (
+    get_Q_in_scalar_jit,
+    get_W_scalar_jit,
+    get_buoyancy_volume_jit,
+    PARAM_M, PARAM_RHO, PARAM_S, PARAM_G, PARAM_N, PARAM_P_A, PARAM_I, PARAM_L,
+    PARAM_XI, PARAM_A, PARAM_B, PARAM_C, PARAM_K, PARAM_H,
+    P_MIN, P_MAX
+)
+
+# Индексы в векторе состояния
+(STATE_P, STATE_W, STATE_Y, STATE_GAMMA, STATE_DW_DT, STATE_S_GAP,
+ STATE_AX, STATE_AY, STATE_BX, STATE_BY,
+ STATE_A_DX, STATE_A_DY, STATE_B_DX, STATE_B_DY) = range(14)
+STATE_SIZE = 14
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def get_initial_state_jit(params):
+    # Начальное состояние, как в SystemOfEquations.__init__
+    state = np.zeros(STATE_SIZE)
+    l, k = params[PARAM_L], params[PARAM_K]
+    state[STATE_P] = params[PARAM_M] * params[PARAM_G] / params[PARAM_S]
+    state[STATE_W] = params[PARAM_S] * k
+    state[STATE_Y] = k
+    state[STATE_AX], state[STATE_AY], state[STATE_BX], state[STATE_BY] = -l, k, l, k
+    state[STATE_A_DX], state[STATE_A_DY], state[STATE_B_DX], state[STATE_B_DY] = 2.5, k - 1.2, 2.5, k - 1.2
+    return state
+
+
+@njit(fastmath=True, error_model='numpy', cache=True)
+def euler_steps_jit(state, params, r, A_template, B_template, water_bounds, eps, start, stop,
+                    y_array, p_array, w_array, gamma_array, A_positions, B_positions):
+    # Повторяет шаг SystemOfEquations.solve() для индексов [start, stop), все величины в float64
+    m, rho, S, g = params[PARAM_M], params[PARAM_RHO], params[PARAM_S], params[PARAM_G]
+    n, p_a, I, l = params[PARAM_N], params[PARAM_P_A], params[PARAM_I], params[PARAM_L]
+    xi, a, b, c, h = params[PARAM_XI], params[PARAM_A], params[PARAM_B], params[PARAM_C], params[PARAM_H]
+
+    p, W, y, gamma = state[STATE_P], state[STATE_W], state[STATE_Y], state[STATE_GAMMA]
+    dW_dt, S_gap = state[STATE_DW_DT], state[STATE_S_GAP]
+    Ax, Ay, Bx, By = state[STATE_AX], state[STATE_AY], state[STATE_BX], state[STATE_BY]
+    A_dx, A_dy, B_dx, B_dy = state[STATE_A_DX], state[STATE_A_DY], state[STATE_B_DX], state[STATE_B_DY]
+
+    A_arcs = np.empty_like(A_template)
+    B_arcs = np.empty_like(B_template)
+    breakpoints = np.empty(MAX_BREAKPOINTS)
+
+    for idx in range(start, stop):
+        Q_in = get_Q_in_scalar_jit(a, b, c, p)
+        Q_out = xi * sqrt(2 * p / rho) * S_gap
+        dp_dt = (n * p_a) / W * (Q_in - Q_out - dW_dt) * eps
+        p = min(max(p + dp_dt, P_MIN), P_MAX)
+
+        W_new = get_W_scalar_jit(Ax, Ay, Bx, By, r)
+        dW_dt = W_new - W
+        W = W_new
+        S_gap = max(0.0, Ay - h) + max(0.0, By - h)
+
+        w_array[idx] = W
+        p_array[idx] = p
+
+        # Баллонеты ещё в положении с предыдущего шага, как и в solve()
+        V = get_buoyancy_volume_jit(A_dx, A_dy, B_dx, B_dy, A_template, B_template, water_bounds, A_arcs, B_arcs,
+                                    breakpoints)
+        F_a = rho * g * V
+        d2y_dt2 = (S * p + F_a - m * g) / m * eps
+        y += d2y_dt2
+        y_array[idx] = y
+
+        cos_a = Ay / sqrt(Ax ** 2 + Ay ** 2)
+        d2gamma_dt2 = (F_a * l * cos_a) / I * eps
+
+        Ay += d2y_dt2
+        By += d2y_dt2
+        A_positions[idx, 0], A_positions[idx, 1] = Ax, Ay
+        B_positions[idx, 0], B_positions[idx, 1] = Bx, By
+        A_dx, A_dy, B_dx, B_dy = Ax, Ay - h, Bx, By - h
+
+        gamma += d2gamma_dt2
+        gamma_array[idx] = gamma
+
+    state[STATE_P], state[STATE_W], state[STATE_Y], state[STATE_GAMMA] = p, W, y, gamma
+    state[STATE_DW_DT], state[STATE_S_GAP] = dW_dt, S_gap
+    state[STATE_AX], state[STATE_AY], state[STATE_BX], state[STATE_BY] = Ax, Ay, Bx, By
+    state[STATE_A_DX], state[STATE_A_DY], state[STATE_B_DX], state[STATE_B_DY] = A_dx, A_dy, B_dx, B_dy
+    return state
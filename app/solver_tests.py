@@ -0,0 +1,999 @@
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pytest
+
+from app_utils import Parameters, BallonetParameters, BalloonParameters
+from batch_cli import main as batch_main, read_scenarios, load_results
+from benchmarks import Benchmark, BenchmarkUnavailable, time_benchmark, compare, run_benchmarks
+from batch_solver import BatchResult, solve_batch, get_scenarios, get_parameters, STATUS_CLAMPED, STATUS_DIVERGED
+from catalog import Catalog
+from buoyancy import get_ballonet_arcs, WATER_BOUNDS
+from checkpoint import CheckpointPolicy, load_checkpoint
+from dynamics import get_params_array, get_rhs_jit, get_jacobian_jit, get_input_matrix_jit, PARAM_C
+from frequency_response import get_frequency_response, get_stations, INPUT_WAVE, INPUT_FAN
+from instrumentation import PHASES, PROFILE_ENV
+from kernels import KERNELS, warmup, get_kernels
+from metrics import get_metrics
+from progress import ProgressEvent
+from recording import RecordingPolicy
+from result_cache import ResultCache, get_result_key
+from sensitivity import analyze_sensitivity
+from solve_eq import SystemOfEquations
+from stability import analyze_batch
+from steady_state import SteadyStateCriteria, SteadyStateMonitor
+from trajectory import get_n_steps, load_trajectory
+from waves import SeaState, WaveField, get_components, get_elevation, SPECTRA
+from sweep_runner import run_sweep, SweepRunner, STATUS_TIMEOUT, STATUS_FAILED, STATUS_SETTLED
+
+
+class HangingCache(ResultCache):
+    # Чтение кэша для ключа hang_key зависает: имитация зависания сценария внутри процесса пула
+    def __init__(self, directory: str, hang_key: str) -> None:
+        super().__init__(directory)
+        self.hang_key = hang_key
+
+    def load(self, key):
+        if key == self.hang_key:
+            time.sleep(600)
+        return super().load(key)
+
+
+def get_system(**kwargs) -> SystemOfEquations:
+    kwargs.setdefault('t_end', 1)
+    kwargs.setdefault('eps', 1e-3)
+    kwargs.setdefault('buoyancy', 'analytic')
+    return SystemOfEquations(Parameters(h=1), BallonetParameters(), **kwargs)
+
+
+class TestClassCompiledSolver:
+    def test_matches_solve(self):
+        reference, compiled = get_system(), get_system()
+        reference.solve()
+        compiled.solve_compiled()
+
+        assert compiled.current_iteration == reference.current_iteration
+        for name in ('y_array', 'p_array', 'gamma_array', 'w_array'):
+            assert np.allclose(getattr(compiled, name), getattr(reference, name), rtol=1e-6, atol=0)
+        assert np.allclose(compiled.A_positions, np.array(reference.A_positions), rtol=1e-6)
+        assert np.allclose(compiled.B_positions, np.array(reference.B_positions), rtol=1e-6)
+        assert abs(compiled.y - reference.y) < 1e-6
+        assert abs(compiled.S_gap - reference.S_gap) < 1e-5
+
+    def test_state_round_trip(self):
+        system = get_system()
+        state = system.get_state()
+        system.set_state(state)
+        assert np.array_equal(system.get_state(), state)
+
+
+class TestClassAdaptiveSolver:
+    def test_converges_to_euler(self):
+        reference = get_system(eps=1e-5)
+        reference.solve_compiled()
+        adaptive = get_system(eps=1e-3)
+        adaptive.solve_adaptive()
+
+        assert adaptive.integration_stats['n_steps'] < 1_000
+        assert np.allclose(adaptive.y_array, reference.y_array[::100], atol=1e-4)
+        assert np.allclose(adaptive.p_array, reference.p_array[::100], atol=0.1)
+        assert np.allclose(adaptive.gamma_array, reference.gamma_array[::100], atol=1e-6)
+
+    def test_events(self):
+        system = get_system(eps=1e-3)
+        system.solve_adaptive()
+        names = [name for _, name in system.events]
+        assert names[0] == 'p_max'
+        assert 'S_gap' in names
+
+        t_gap = next(t for t, name in system.events if name == 'S_gap')
+        idx = np.searchsorted(system.t_array, t_gap)
+        assert system.y_array[idx - 1] <= system.params.h <= system.y_array[idx]
+        assert system.p_array.max() <= 2964 and system.p_array.min() >= 600
+
+    def test_output_grid(self):
+        system = get_system(eps=1e-2)
+        system.solve_adaptive()
+        assert system.current_iteration == system.t_array.shape[0]
+        assert len(system.A_positions) == system.t_array.shape[0]
+        assert system.y == system.y_array[-1]
+
+
+class TestClassImplicitSolver:
+    def test_jacobian(self):
+        system = get_system()
+        params = get_params_array(system.params)
+        r = system.ballonet_params.AD.r
+        A_template = get_ballonet_arcs(system.ballonet_params, minor=True)
+        B_template = get_ballonet_arcs(system.ballonet_params, minor=False)
+        water_bounds = np.array(system.water_bounds)
+
+        for z in ([2613, 0.7, 0], [2829, 1.3, 1e-3], [2000, 0.95, 1e-2]):
+            z = np.array(z, dtype=np.float64)
+            jac = get_jacobian_jit(z, params, r, A_template, B_template, water_bounds)
+            numeric = np.empty((3, 3))
+            for j in range(3):
+                dz = np.zeros(3)
+                dz[j] = 1e-6 * max(1.0, abs(z[j]))
+                numeric[:, j] = (get_rhs_jit(z + dz, params, r, A_template, B_template, water_bounds) -
+                                 get_rhs_jit(z - dz, params, r, A_template, B_template, water_bounds)) / (2 * dz[j])
+            assert np.allclose(jac, numeric, rtol=1e-6, atol=1e-9)
+
+    def test_methods_agree(self):
+        reference = get_system(eps=1e-3, t_end=3)
+        reference.solve_adaptive(method='dopri5', rtol=1e-8)
+        for method in ('BDF', 'Radau'):
+            system = get_system(eps=1e-3, t_end=3)
+            system.solve_adaptive(method=method)
+            assert system.integration_stats['n_steps'] < 300
+            assert np.allclose(system.y_array, reference.y_array, atol=1e-4)
+            assert np.allclose(system.gamma_array, reference.gamma_array, atol=1e-6)
+            assert [name for _, name in system.events] == ['p_max', 'S_gap']
+
+    def test_unknown_method(self):
+        try:
+            get_system().solve_adaptive(method='unknown')
+        except ValueError:
+            return
+        assert False
+
+
+class TestClassBatchSolver:
+    def test_matches_compiled(self):
+        params = [Parameters(h=1), Parameters(h=1, m=17_000, xi=0.8), Parameters(h=1.2, S=70)]
+        batch = solve_batch(params, BallonetParameters(), t_end=0.5, eps=1e-3)
+        assert batch.y.shape == (3, batch.t.shape[0])
+
+        for i, p in enumerate(params):
+            system = SystemOfEquations(p, BallonetParameters(), t_end=0.5, eps=1e-3, buoyancy='analytic')
+            system.solve_compiled()
+            assert np.array_equal(batch.y[i], system.y_array)
+            assert np.array_equal(batch.p[i], system.p_array)
+            assert np.array_equal(batch.gamma[i], system.gamma_array)
+
+    def test_divergence_is_masked(self):
+        # Начальное давление m g / S выше максимума характеристики вентилятора
+        scenarios = get_scenarios([Parameters(h=1), Parameters(h=1, m=19_000, S=55)])
+        batch = solve_batch(scenarios, BallonetParameters(), t_end=0.5, eps=1e-3)
+        assert batch.status[0] & STATUS_DIVERGED == 0
+        assert batch.status[0] & STATUS_CLAMPED
+        assert batch.status[1] & STATUS_DIVERGED
+        assert batch.last_index[0] == batch.t.shape[0] - 1
+
+        masked = batch.masked('y')
+        assert not masked.mask[0].any() and masked.mask[1].all()
+        assert batch.masked('p', flags=STATUS_CLAMPED | STATUS_DIVERGED).mask.all()
+
+    def test_scenarios_round_trip(self):
+        params = [Parameters(m=1), Parameters(xi=2)]
+        assert get_parameters(get_scenarios(params)) == params
+
+
+class TestClassSweepRunner:
+    def test_matches_compiled(self):
+        params = [Parameters(h=1), Parameters(h=1, m=17_000)]
+        ballonets = [BallonetParameters(),
+                     BallonetParameters(AD=BalloonParameters(phi=3.129, r=0.55, x=0.761343, y=0.98531, _a=0.977996))]
+        sweep = run_sweep(params, ballonets, t_end=0.5, eps=1e-3, processes=2, chunk_size=1)
+
+        for i in range(2):
+            system = SystemOfEquations(params[i], ballonets[i], t_end=0.5, eps=1e-3, buoyancy='analytic')
+            system.solve_compiled()
+            assert np.array_equal(sweep.y[i], system.y_array)
+            assert np.array_equal(sweep.gamma[i], system.gamma_array)
+            assert sweep.last_index[i] == system.t_array.shape[0] - 1
+        assert not np.any(sweep.status & (STATUS_DIVERGED | STATUS_TIMEOUT | STATUS_FAILED))
+
+    def test_resume(self, tmp_path):
+        params = [Parameters(h=1), Parameters(h=1, m=17_000), Parameters(h=1, m=19_000, S=55)]
+        first = run_sweep(params, BallonetParameters(), t_end=0.2, eps=1e-3, processes=1, directory=str(tmp_path))
+        assert first.status[2] & STATUS_DIVERGED
+
+        runner = SweepRunner(params, BallonetParameters(), t_end=0.2, eps=1e-3, directory=str(tmp_path))
+        resumed = runner.run()
+        assert runner.completed == {0, 1, 2}
+        assert np.array_equal(resumed.p[:2], first.p[:2])
+        assert np.array_equal(resumed.status, first.status)
+
+        try:
+            SweepRunner(params, BallonetParameters(), t_end=0.3, eps=1e-3, directory=str(tmp_path)).run()
+        except ValueError:
+            return
+        assert False
+
+    def test_timeout(self, tmp_path):
+        runner = SweepRunner([Parameters(h=1)], BallonetParameters(), t_end=20, eps=1e-3, timeout=0,
+                             directory=str(tmp_path))
+        sweep = runner.run()
+        assert sweep.status[0] & STATUS_TIMEOUT
+        assert not sweep.status[0] & STATUS_DIVERGED
+        assert 0 < sweep.last_index[0] < sweep.t.shape[0] - 1
+        assert np.isnan(sweep.y[0, -1])
+        assert runner.completed == set()
+        assert 'solve_compiled stopped' in sweep.errors[0]
+
+    def test_failure_is_reported(self, tmp_path):
+        # Дуга с phi > 2π отвергается get_ballonet_arcs внутри solve_compiled()
+        segment = BallonetParameters().AD
+        broken = BallonetParameters(AD=BalloonParameters(phi=7, r=segment.r, x=segment.x, y=segment.y, _a=segment._a))
+        params = [Parameters(h=1), Parameters(h=1)]
+        sweep = run_sweep(params, [BallonetParameters(), broken], t_end=0.1, eps=1e-3, processes=1,
+                          directory=str(tmp_path))
+        assert sweep.status[1] & STATUS_FAILED and not sweep.status[0] & STATUS_FAILED
+        assert list(sweep.errors) == [1]
+        assert 'ValueError' in sweep.errors[1] and 'phi' in sweep.errors[1]
+        with open(tmp_path / 'manifest.json') as file:
+            assert json.load(file)['errors'] == {'1': sweep.errors[1]}
+
+    def test_hard_timeout(self):
+        # Запуск процесса дольше жёсткого предела: кусок прерывается родителем, пул перезапускается
+        params = [Parameters(h=1), Parameters(h=1, m=17_000)]
+        runner = SweepRunner(params, BallonetParameters(), t_end=0.2, eps=1e-3, processes=1, chunk_size=1,
+                             timeout=0, hard_timeout_grace=1e-3)
+        sweep = runner.run()
+        assert np.all(sweep.status & STATUS_TIMEOUT)
+        assert np.all(np.isnan(sweep.y))
+        assert runner.completed == set()
+        assert all('hard timeout' in sweep.errors[i] for i in range(2))
+
+    def test_hard_timeout_keeps_finished(self, tmp_path):
+        # Второй сценарий куска зависает до начала счёта: первый сохраняет результат, третий решается в новом пуле
+        params = [Parameters(h=1), Parameters(h=1, m=17_000), Parameters(h=1, m=16_000)]
+        hanging = SystemOfEquations(params[1], BallonetParameters(), t_end=0.2, eps=1e-3, buoyancy='analytic',
+                                    result_cache=ResultCache(str(tmp_path / 'cache')))
+        cache = HangingCache(str(tmp_path / 'cache'), hanging.get_result_key('solve_compiled'))
+        runner = SweepRunner(params, BallonetParameters(), t_end=0.2, eps=1e-3, processes=1, chunk_size=3,
+                             timeout=1, hard_timeout_grace=2, directory=str(tmp_path / 'sweep'), result_cache=cache)
+        sweep = runner.run()
+        assert runner.completed == {0, 2} and list(sweep.errors) == [1]
+        assert sweep.status[1] & STATUS_TIMEOUT and 'hard timeout' in sweep.errors[1]
+        assert np.all(np.isnan(sweep.y[1])) and sweep.elapsed[1] > 0
+        reference = SystemOfEquations(params[0], BallonetParameters(), t_end=0.2, eps=1e-3, buoyancy='analytic')
+        reference.solve_compiled()
+        assert np.array_equal(sweep.y[0], reference.y_array)
+        with open(tmp_path / 'sweep' / 'manifest.json') as file:
+            assert json.load(file)['completed'].keys() == {'0', '2'}
+
+    def test_resume_without_results(self, tmp_path):
+        # Манифест без файла результатов или с файлом другой формы: прогон начинается заново
+        params = [Parameters(h=1), Parameters(h=1, m=17_000)]
+        first = run_sweep(params, BallonetParameters(), t_end=0.1, eps=1e-3, processes=1, directory=str(tmp_path))
+        for stale in (None, np.zeros((1, 4, 3))):
+            os.remove(tmp_path / 'results.npy')
+            if stale is not None:
+                np.save(tmp_path / 'results.npy', stale)
+            runner = SweepRunner(params, BallonetParameters(), t_end=0.1, eps=1e-3, processes=1,
+                                 directory=str(tmp_path))
+            resumed = runner.run()
+            assert runner.completed == {0, 1}
+            assert np.array_equal(resumed.y, first.y)
+            assert np.load(tmp_path / 'results.npy').shape == runner.shape
+
+
+class TestClassStreamingOutput:
+    def test_compiled_matches_memory(self, tmp_path):
+        reference = get_system()
+        reference.solve_compiled()
+        streamed = get_system(output_dir=str(tmp_path), output_chunk_size=97)
+        streamed.solve_compiled()
+
+        assert isinstance(streamed.y_array, np.memmap)
+        assert np.array_equal(streamed.t_array, reference.t_array)
+        for name in ('y_array', 'p_array', 'w_array', 'gamma_array', 'A_positions', 'B_positions'):
+            assert np.array_equal(getattr(streamed, name), getattr(reference, name))
+        assert streamed.y == reference.y
+
+    def test_solve_matches_memory(self, tmp_path):
+        reference = get_system(t_end=0.05)
+        reference.solve()
+        streamed = get_system(t_end=0.05, output_dir=str(tmp_path), output_chunk_size=16)
+        streamed.solve()
+
+        assert streamed.A_positions.shape == (reference.t_array.shape[0], 2)
+        assert np.array_equal(streamed.A_positions, np.array(reference.A_positions))
+        for name in ('y_array', 'p_array', 'w_array', 'gamma_array'):
+            assert np.array_equal(getattr(streamed, name), getattr(reference, name))
+
+    def test_timeout_trims_files(self, tmp_path):
+        system = get_system(t_end=20, output_dir=str(tmp_path), output_chunk_size=1_000)
+        try:
+            system.solve_compiled(timeout=0)
+        except TimeoutError:
+            pass
+        trajectory = load_trajectory(str(tmp_path))
+        assert trajectory['y'].shape == (system.current_iteration,)
+        assert trajectory['B_positions'].shape == (system.current_iteration, 2)
+        assert system.current_iteration < system.n_steps
+
+    def test_n_steps(self):
+        for t_end, eps in ((1, 1e-3), (30, 1e-4), (0.5, 0.3), (1_000, 0.01), (3, 0.1)):
+            assert get_n_steps(t_end, eps) == np.arange(0, t_end, eps).shape[0]
+
+
+class TestClassRecordingPolicy:
+    def get_reference(self) -> SystemOfEquations:
+        reference = get_system()
+        reference.solve_compiled()
+        return reference
+
+    def test_decimation_and_envelope(self):
+        reference = self.get_reference()
+        system = get_system(recording=RecordingPolicy(every=10, envelope=True), output_chunk_size=97)
+        system.solve_compiled()
+
+        assert system.n_recorded == 100
+        assert np.array_equal(system.t_array, reference.t_array[::10])
+        assert np.array_equal(system.y_array, reference.y_array[::10])
+        assert np.array_equal(system.B_positions, reference.B_positions[::10])
+        assert np.array_equal(system.envelope['y_min'], reference.y_array.reshape(-1, 10).min(axis=1))
+        assert np.array_equal(system.envelope['p_max'], reference.p_array.reshape(-1, 10).max(axis=1))
+        assert np.allclose(system.envelope['envelope_t'], system.t_array)
+
+    def test_output_grid(self):
+        reference = self.get_reference()
+        system = get_system(recording=RecordingPolicy(dt=2.5e-3, envelope=True), output_chunk_size=64)
+        system.solve_compiled()
+
+        grid = np.arange(0, reference.t_array[-1], 2.5e-3)
+        assert np.allclose(system.t_array, grid)
+        assert np.allclose(system.y_array, np.interp(grid, reference.t_array, reference.y_array), rtol=1e-12)
+        assert np.allclose(system.A_positions[:, 1], np.interp(grid, reference.t_array, reference.A_positions[:, 1]))
+        buckets = np.floor(reference.t_array / 2.5e-3 + 1e-9).astype(int)
+        assert np.array_equal(system.envelope['gamma_max'],
+                              [reference.gamma_array[buckets == b].max() for b in np.unique(buckets)])
+
+    def test_windows_streamed(self, tmp_path):
+        reference = self.get_reference()
+        policy = RecordingPolicy(every=5, windows=((0.1, 0.2), (0.5, 0.55)))
+        system = get_system(recording=policy, output_dir=str(tmp_path), output_chunk_size=50)
+        system.solve_compiled()
+
+        mask = policy.in_windows(reference.t_array) & (np.arange(reference.t_array.shape[0]) % 5 == 0)
+        assert isinstance(system.y_array, np.memmap)
+        assert np.array_equal(system.t_array, reference.t_array[mask])
+        assert np.array_equal(system.p_array, reference.p_array[mask])
+
+    def test_solve_decimation(self):
+        reference = get_system(t_end=0.05)
+        reference.solve()
+        system = get_system(t_end=0.05, recording=RecordingPolicy(every=4))
+        system.solve()
+        assert np.array_equal(system.y_array, reference.y_array[::4])
+        assert np.array_equal(system.A_positions, np.array(reference.A_positions)[::4])
+
+    def test_invalid_policy(self):
+        for kwargs in ({'every': 0}, {'dt': 0}, {'every': 2, 'dt': 1e-3}, {'windows': ((1, 0),)}):
+            try:
+                RecordingPolicy(**kwargs)
+            except ValueError:
+                continue
+            assert False
+
+
+class TestClassCheckpoint:
+    def test_resume_compiled(self, tmp_path):
+        policy = RecordingPolicy(dt=2.5e-3, envelope=True)
+        reference = get_system(t_end=10, output_dir=str(tmp_path / 'reference'), recording=policy)
+        reference.solve_compiled()
+
+        path = str(tmp_path / 'checkpoint.bin')
+        interrupted = get_system(t_end=10, output_dir=str(tmp_path / 'run'), recording=policy,
+                                 checkpoint=CheckpointPolicy(path, every_steps=1_000))
+        try:
+            interrupted.solve_compiled(timeout=0)
+        except TimeoutError:
+            pass
+        assert load_checkpoint(path).iteration == interrupted.current_iteration < interrupted.n_steps
+
+        resumed = get_system(t_end=10, output_dir=str(tmp_path / 'run'), recording=policy,
+                             checkpoint=CheckpointPolicy(path, every_steps=1_000))
+        resumed.resume(path)
+        for name in ('t_array', 'y_array', 'p_array', 'w_array', 'gamma_array', 'A_positions', 'B_positions'):
+            assert np.array_equal(getattr(resumed, name), getattr(reference, name))
+        for name in reference.envelope:
+            assert np.array_equal(resumed.envelope[name], reference.envelope[name])
+        assert np.array_equal(resumed.get_state(), reference.get_state())
+
+    def test_resume_solve(self, tmp_path):
+        reference = get_system(t_end=0.05, output_dir=str(tmp_path / 'reference'))
+        reference.solve()
+
+        path = str(tmp_path / 'checkpoint.bin')
+        interrupted = get_system(t_end=0.05, output_dir=str(tmp_path / 'run'),
+                                 checkpoint=CheckpointPolicy(path, every_steps=10))
+        record = interrupted.record
+
+        def preempted(idx: int) -> None:
+            if idx == 37:
+                raise KeyboardInterrupt
+            record(idx)
+
+        interrupted.record = preempted
+        try:
+            interrupted.solve()
+        except KeyboardInterrupt:
+            for f in interrupted.recorder.writer.files.values():
+                f.close()
+        assert load_checkpoint(path).iteration == 30
+
+        for kwargs in ({'buoyancy': 'polygon'}, {'pitch': True}, {'waves': SeaState()}):
+            with pytest.raises(ValueError, match='another system'):
+                get_system(t_end=0.05, output_dir=str(tmp_path / 'other'), **kwargs).resume(path)
+        surface = (np.array([-4.0, 0.0, 4.0]), np.array([0.0, 0.1, 0.0]))
+        assert not np.array_equal(get_system(buoyancy='polygon').get_identity(),
+                                  get_system(buoyancy='polygon', water_surface=surface).get_identity())
+
+        resumed = get_system(t_end=0.05, output_dir=str(tmp_path / 'run'))
+        resumed.resume(path)
+        for name in ('y_array', 'p_array', 'w_array', 'gamma_array', 'A_positions', 'B_positions'):
+            assert np.array_equal(getattr(resumed, name), getattr(reference, name))
+
+    def test_foreign_checkpoint(self, tmp_path):
+        path = str(tmp_path / 'checkpoint.bin')
+        get_system(t_end=0.01, output_dir=str(tmp_path / 'a'),
+                   checkpoint=CheckpointPolicy(path, every_steps=3)).solve()
+        other = SystemOfEquations(Parameters(h=1, m=17_000), BallonetParameters(), t_end=0.01, eps=1e-3,
+                                  buoyancy='analytic', output_dir=str(tmp_path / 'b'))
+        try:
+            other.resume(path)
+        except ValueError:
+            return
+        assert False
+
+
+class TestClassSteadyState:
+    def test_compiled_stops_at_equilibrium(self):
+        reference = get_system(t_end=30)
+        reference.solve_compiled()
+        system = get_system(t_end=30, steady_state=SteadyStateCriteria())
+        system.solve_compiled()
+
+        n = system.current_iteration
+        assert n < system.n_steps and system.steady_state.iteration == n
+        assert system.steady_state.settling_time < system.steady_state.t_stop == system.t_array[-1]
+        for name in ('y_array', 'p_array', 'w_array', 'gamma_array', 'A_positions'):
+            assert np.array_equal(getattr(system, name), getattr(reference, name)[:n])
+        assert abs(system.steady_state.y - reference.y) < 1e-2
+        assert abs(system.steady_state.p - reference.p) < 1e-1
+        assert system.steady_state.W == system.W == system.w_array[-1]
+
+    def test_solve_matches_compiled(self):
+        criteria = SteadyStateCriteria(window=0.5, y_rate=1e-3, p_rate=1)
+        compiled = get_system(t_end=30, steady_state=criteria)
+        compiled.solve_compiled()
+        system = get_system(t_end=30, steady_state=criteria)
+        system.solve()
+        assert system.current_iteration < system.n_steps
+        assert system.y_array.shape[0] == len(system.A_positions) == system.current_iteration
+        assert abs(system.steady_state.settling_time - compiled.steady_state.settling_time) < 0.1
+        assert abs(system.steady_state.y - compiled.steady_state.y) < 1e-3
+
+    def test_monitor_block_invariance(self):
+        rng = np.random.default_rng(0)
+        values = np.cumsum(rng.normal(size=(5_000, 3)) * np.exp(-np.arange(5_000) / 500)[:, None], axis=0)
+        criteria = SteadyStateCriteria(window=0.1, y_rate=0.1, p_rate=0.1, gamma_rate=0.1)
+        whole = SteadyStateMonitor(criteria, 1e-3)
+        assert whole.update(values)
+        split = SteadyStateMonitor(criteria, 1e-3)
+        offset = 0
+        for size in rng.integers(1, 300, size=1_000):
+            if split.update(values[offset:offset + size]):
+                break
+            offset += size
+        assert split.n_seen == whole.n_seen
+
+    def test_resume_compiled(self, tmp_path):
+        criteria = SteadyStateCriteria()
+        reference = get_system(t_end=30, output_dir=str(tmp_path / 'reference'), steady_state=criteria)
+        reference.solve_compiled()
+
+        path = str(tmp_path / 'checkpoint.bin')
+        interrupted = get_system(t_end=30, output_dir=str(tmp_path / 'run'), steady_state=criteria,
+                                 checkpoint=CheckpointPolicy(path, every_steps=5_000))
+        interrupted.solve_compiled()
+        assert 0 < load_checkpoint(path).iteration < interrupted.current_iteration
+        resumed = get_system(t_end=30, output_dir=str(tmp_path / 'run'), steady_state=criteria)
+        resumed.resume(path)
+        assert resumed.steady_state == reference.steady_state
+        assert np.array_equal(resumed.y_array, reference.y_array)
+
+    def test_sweep_holds_equilibrium(self):
+        result = run_sweep([Parameters(h=1)], BallonetParameters(), t_end=30, eps=1e-3, processes=1,
+                           steady_state=SteadyStateCriteria())
+        system = get_system(t_end=30, steady_state=SteadyStateCriteria())
+        system.solve_compiled()
+        assert result.status[0] & STATUS_SETTLED
+        assert np.all(result.y[0, system.current_iteration:] == system.steady_state.y)
+
+
+class TestClassPitch:
+    def test_points_follow_gamma(self):
+        system = get_system(t_end=0.5, pitch=True)
+        system.solve()
+        A, B = np.array(system.A_positions), np.array(system.B_positions)
+        gamma = system.gamma_array
+        assert np.allclose(np.hypot(*(B - A).T), 2 * system.params.l)
+        assert np.allclose(np.arctan2(*(B - A)[1:, ::-1].T), gamma[1:])
+        assert np.allclose((A + B)[1:, 1] / 2, system.y_array[1:])
+        assert system.gamma != 0 and system.B.y > system.A.y
+
+    def test_coupling(self):
+        # До первого ненулевого γ движение совпадает с чистой вертикальной качкой
+        heave, pitch = get_system(t_end=0.5), get_system(t_end=0.5, pitch=True)
+        heave.solve()
+        pitch.solve()
+        assert np.array_equal(heave.y_array[:2], pitch.y_array[:2])
+        assert not np.allclose(heave.y_array, pitch.y_array, rtol=0, atol=1e-9)
+
+    def test_ballonets_follow_arm_ends(self):
+        # Центр тяжести баллонета A - под концом плеча A и смещается по вертикали вместе с ним
+        system = get_system(pitch=True, buoyancy='polygon')
+        centroids = []
+        for gamma in (0.0, 0.05):
+            system.gamma = gamma
+            system.place_points()
+            system.place_ballonets()
+            centroids.append((system.A.y, system.A_vertices.mean(axis=0), system.B.y, system.B_vertices.mean(axis=0)))
+        (A_y0, A_c0, B_y0, B_c0), (A_y1, A_c1, B_y1, B_c1) = centroids
+        assert A_c0[0] < 0 < B_c0[0]
+        assert A_y1 < A_y0 and A_c1[1] < A_c0[1]
+        assert B_y1 > B_y0 and B_c1[1] > B_c0[1]
+        assert np.isclose(A_c1[1] - A_c0[1], -(B_c1[1] - B_c0[1]), rtol=1e-2)
+
+    def test_resume_solve(self, tmp_path):
+        reference = get_system(t_end=0.05, output_dir=str(tmp_path / 'reference'), pitch=True)
+        reference.solve()
+        path = str(tmp_path / 'checkpoint.bin')
+        interrupted = get_system(t_end=0.05, output_dir=str(tmp_path / 'run'), pitch=True,
+                                 checkpoint=CheckpointPolicy(path, every_steps=10))
+        interrupted.solve()
+        resumed = get_system(t_end=0.05, output_dir=str(tmp_path / 'run'), pitch=True)
+        resumed.resume(path)
+        assert np.array_equal(resumed.y_array, reference.y_array)
+        assert np.array_equal(resumed.B_positions, reference.B_positions)
+
+    def test_unsupported(self):
+        for kwargs, method in (({'buoyancy': 'table'}, None), ({}, 'solve_compiled'), ({}, 'solve_adaptive')):
+            try:
+                system = get_system(pitch=True, **kwargs)
+                getattr(system, method)()
+            except ValueError:
+                continue
+            assert False
+
+
+class TestClassWaves:
+    def test_significant_height(self):
+        for spectrum in SPECTRA:
+            amplitude, omega, _, _ = get_components(SeaState(Hs=2, Tp=8, spectrum=spectrum))
+            assert abs(4 * np.sqrt(np.sum(amplitude ** 2) / 2) - 2) < 0.02
+        elevation = get_elevation(SeaState(), np.arange(0, 3_000, 0.1), [0.0])
+        assert abs(4 * elevation.std() - SeaState().Hs) < 0.03
+
+    def test_chunks_match_direct(self):
+        sea, stations = SeaState(seed=3), np.linspace(-4, 4, 5)
+        field = WaveField(sea, stations, 1e-3, chunk_size=100)
+        for idx in (0, 5, 99, 100, 250, 3, 1_000):
+            assert np.allclose(field.get_row(idx), get_elevation(sea, [idx * 1e-3], stations)[0], atol=1e-12)
+
+    def test_solver_in_waves(self):
+        calm, reference = {}, get_system(t_end=0.5, buoyancy='polygon')
+        reference.solve()
+        for buoyancy in ('polygon', 'analytic', 'table'):
+            calm[buoyancy] = get_system(t_end=0.5, buoyancy=buoyancy, waves=SeaState(Hs=1e-9))
+            calm[buoyancy].solve()
+            assert np.allclose(calm[buoyancy].y_array, reference.y_array, atol=1e-5)
+
+        polygon = get_system(t_end=0.5, buoyancy='polygon', waves=SeaState(Hs=1, Tp=8))
+        analytic = get_system(t_end=0.5, buoyancy='analytic', waves=SeaState(Hs=1, Tp=8))
+        polygon.solve()
+        analytic.solve()
+        assert not np.allclose(polygon.y_array, reference.y_array, atol=1e-3)
+        assert np.allclose(polygon.y_array, analytic.y_array, atol=1e-3)
+        try:
+            analytic.solve_compiled()
+        except ValueError:
+            return
+        assert False
+
+
+class TestClassStability:
+    def test_trim_matches_simulation(self):
+        equilibrium = get_system().analyze_equilibrium()
+        system = get_system(t_end=30, steady_state=SteadyStateCriteria())
+        system.solve_compiled()
+        assert equilibrium.converged and equilibrium.stable
+        assert abs(equilibrium.p - system.p) < 0.05  # смещение явной схемы порядка eps
+        assert abs(equilibrium.y - system.y) < 1e-4
+        assert np.sum(np.abs(equilibrium.eigenvalues) < 1e-9) == 1  # γ - нейтральная мода
+
+    def test_eigenvalues_match_finite_differences(self):
+        stability = analyze_batch([Parameters(h=1)], BallonetParameters())
+        params = get_params_array(Parameters(h=1))
+        ballonet = BallonetParameters()
+        args = (params, ballonet.AD.r, get_ballonet_arcs(ballonet, minor=True),
+                get_ballonet_arcs(ballonet, minor=False), np.array(WATER_BOUNDS))
+        z, jacobian = stability.trim[0], np.empty((3, 3))
+        for j, step in enumerate((1e-2, 1e-6, 1e-6)):
+            dz = np.zeros(3)
+            dz[j] = step
+            jacobian[:, j] = (get_rhs_jit(z + dz, *args) - get_rhs_jit(z - dz, *args)) / (2 * step)
+        assert np.allclose(np.sort(np.linalg.eigvals(jacobian).real), np.sort(stability.eigenvalues[0].real),
+                           rtol=1e-4, atol=1e-6)
+
+    def test_batch_matches_single(self):
+        scenarios = [Parameters(h=h, m=m, S=60) for h, m in zip((0.5, 1.5, 1.0, 1.0), (12_000, 15_000, 18_500, 30_000))]
+        stability = analyze_batch(scenarios, BallonetParameters())
+        assert len(stability) == 4
+        for i, params in enumerate(scenarios):
+            single = SystemOfEquations(params, BallonetParameters(), buoyancy='analytic').analyze_equilibrium()
+            assert single.converged == stability[i].converged
+            assert np.allclose(single.eigenvalues, stability[i].eigenvalues, equal_nan=True)
+        converged = stability.converged
+        assert converged[:3].all() and not converged[3]  # 30 т не удерживаются ни давлением, ни баллонетами
+        assert np.abs(stability.residual[converged, :2]).max() < 1e-6
+
+
+class TestClassFrequencyResponse:
+    def test_input_matrix_matches_finite_differences(self):
+        params, ballonet = get_params_array(Parameters(h=1, m=18_500)), BallonetParameters()
+        A_template, B_template = get_ballonet_arcs(ballonet, minor=True), get_ballonet_arcs(ballonet, minor=False)
+        z = analyze_batch([Parameters(h=1, m=18_500)], ballonet).trim[0]
+        z[0] -= 50  # давление внутри [P_MIN, P_MAX], чтобы вход вентилятора не обнулялся ограничением
+        inputs = get_input_matrix_jit(z, params, ballonet.AD.r, A_template, B_template, np.array(WATER_BOUNDS))
+
+        def rhs(surface=0.0, fan=0.0):
+            shifted = params.copy()
+            shifted[PARAM_C] += fan
+            water_bounds = np.array(WATER_BOUNDS) + (surface, 0, 0, 0)
+            return get_rhs_jit(z, shifted, ballonet.AD.r, A_template, B_template, water_bounds)
+
+        assert np.abs(inputs[:, :2].sum(axis=1)).max() > 0
+        assert np.allclose(inputs[:, :2].sum(axis=1), (rhs(surface=1e-6) - rhs(surface=-1e-6)) / 2e-6, rtol=1e-4)
+        assert np.allclose(inputs[:, 2], (rhs(fan=1e-2) - rhs(fan=-1e-2)) / 2e-2, rtol=1e-4)
+
+    def test_limits(self):
+        omega = np.array([1e-4, 1e7])
+        response = get_frequency_response([Parameters(h=1), Parameters(h=1, m=18_500)], BallonetParameters(), omega)
+        jacobian = response.stability.jacobian
+        # Баллонеты над водой: волна не действует; под водой длинная волна поднимает судно на свою высоту
+        assert np.all(response.transfer[0, :, :, INPUT_WAVE] == 0)
+        assert abs(response.heave[1, 0, INPUT_WAVE] - 1) < 1e-3
+        # Напор входит только в уравнение p: iωH_p -> B_p на высоких частотах,
+        # на низких подъём стремится к статическому -(J^{-1} B)_y
+        inputs = np.array([1j * omega[1] * response.pressure[0, 1, INPUT_FAN], 0])
+        static = -np.linalg.solve(jacobian[0, :2, :2], inputs)[1]
+        assert abs(response.heave[0, 0, INPUT_FAN] - static) < 1e-3 * abs(static)
+
+    def test_stations_match_time_domain(self):
+        ballonet = BallonetParameters()
+        for params in (Parameters(h=1), Parameters(h=1, l=2.5)):
+            system = SystemOfEquations(params, ballonet, t_end=0.1, buoyancy='analytic', waves=SeaState())
+            A_x, B_x = get_stations(ballonet, np.array([params.l]))
+            assert np.array_equal(np.concatenate((A_x, B_x)), system.waves.stations)
+
+    def test_statistics(self):
+        omega = np.linspace(0.05, 5, 400)
+        system = SystemOfEquations(Parameters(h=1, m=18_500), BallonetParameters(), buoyancy='analytic')
+        response = system.get_frequency_response(omega)
+        calm, rough = response.get_statistics(SeaState(Hs=0.5)), response.get_statistics(SeaState(Hs=1))
+        assert np.allclose(rough.std, 2 * calm.std)
+        assert np.allclose(rough.significant, 4 * rough.std)
+        # Длинные волны: судно на баллонетах почти повторяет возвышение
+        assert 0.3 < rough.significant[0, 1] < 1
+        try:
+            system.get_frequency_response(np.array([0.0, 1.0]))
+        except ValueError:
+            return
+        assert False
+
+
+class TestClassSensitivity:
+    def test_matches_separate_runs(self):
+        sensitivity = analyze_sensitivity(Parameters(h=1), BallonetParameters(), parameters=('m', 'xi', 'c'),
+                                          outputs=('final_y', 'final_p'), t_end=5, eps=1e-3)
+        assert sensitivity.matrix.shape == (2, 3)
+        step = sensitivity.step[0]
+        final = []
+        for m in (16_000 + step, 16_000 - step):
+            system = SystemOfEquations(Parameters(h=1, m=m), BallonetParameters(), t_end=5, eps=1e-3,
+                                       buoyancy='analytic')
+            system.solve_compiled()
+            final.append((system.y_array[-1], system.p_array[-1]))
+        assert np.allclose(sensitivity.matrix[:, 0], (np.array(final[0]) - final[1]) / (2 * step), rtol=1e-6)
+
+    def test_elasticities(self):
+        sensitivity = analyze_sensitivity(Parameters(h=1), BallonetParameters(), t_end=30, eps=1e-3)
+        assert sensitivity.matrix.shape == (len(sensitivity.outputs), 14)
+        # В равновесии S p = m g: эластичности давления по m, g и S равны 1, 1 и -1
+        for name, expected in (('m', 1), ('g', 1), ('S', -1), ('xi', 0)):
+            assert abs(sensitivity.get_elasticity('final_p', name) - expected) < 1e-3
+        assert sensitivity.get('final_y', 'xi') < 0 < sensitivity.get('final_y', 'c')
+        try:
+            analyze_sensitivity(Parameters(h=1), BallonetParameters(), parameters=('r',))
+        except ValueError:
+            return
+        assert False
+
+
+class TestClassBenchmarks:
+    def test_compare(self):
+        result = time_benchmark(Benchmark('sum', lambda: lambda: sum(range(100)), number=10, repeat=2))
+        assert 0 < result['seconds'] <= result['mean']
+        baseline = {'results': {'a': {'seconds': 1.0}, 'b': {'seconds': 1.0}, 'c': {'seconds': 1.0}}}
+        results = {'results': {'a': {'seconds': 1.2}, 'b': {'seconds': 1.5}, 'd': {'seconds': 9.0}}}
+        assert compare(results, baseline, threshold=25) == {'b': 50.0, 'c': None}
+        assert compare(results, baseline, threshold=10).keys() == {'a', 'b', 'c'}
+        assert compare(results, baseline, threshold=25, select='b') == {'b': 50.0}
+
+    def test_errors(self):
+        def unavailable():
+            raise BenchmarkUnavailable("no display")
+
+        def broken():
+            raise ValueError("broken")
+
+        report = run_benchmarks([Benchmark('render', unavailable), Benchmark('sum', lambda: lambda: 1, repeat=1)])
+        assert report['skipped'] == {'render': "no display"} and report['results'].keys() == {'sum'}
+        with pytest.raises(ValueError, match="broken"):
+            run_benchmarks([Benchmark('broken', broken)])
+
+
+class TestClassInstrumentation:
+    def test_phases(self, tmp_path):
+        reference, system = get_system(buoyancy='polygon'), get_system(buoyancy='polygon', instrument=True)
+        reference.solve()
+        system.solve()
+        assert np.array_equal(system.y_array, reference.y_array)
+        assert not set(PHASES.values()) & set(vars(system))  # обёртки сняты после solve()
+
+        report = system.instrumentation.report()
+        assert report['iterations'] == system.n_steps - 1
+        for phase in ('dp_dt', 'W', 'S_gap', 'get_cylinder_volume', 'update_ballonet_polygons', 'recording'):
+            assert report['phases'][phase]['count'] >= report['iterations']
+        assert sum(p['time'] for p in report['phases'].values()) + report['other']['time'] == \
+            pytest.approx(report['total'])
+        assert report['peak_traced'] is None and report['profile'] == []
+
+        system.instrumentation.save(str(tmp_path / 'report.json'))
+        with open(tmp_path / 'report.json') as file:
+            assert json.load(file)['iterations'] == report['iterations']
+
+    def test_captures(self, tmp_path, monkeypatch):
+        monkeypatch.setenv(PROFILE_ENV, 'cprofile, tracemalloc')
+        system = get_system(t_end=0.1, instrument=True)
+        system.solve()
+        report = system.instrumentation.report()
+        assert report['peak_traced'] > 0 and report['profile']
+        system.instrumentation.save(str(tmp_path / 'report.json'))
+        assert os.path.exists(tmp_path / 'report.prof')
+
+
+class TestClassProgress:
+    def test_solve(self):
+        events: list[ProgressEvent] = []
+        reference, system = get_system(t_end=0.5), get_system(t_end=0.5, progress=events.append, progress_interval=0)
+        reference.solve()
+        system.solve()
+        assert np.array_equal(system.y_array, reference.y_array)
+        assert len(events) > 2 and events[-1].done and not any(event.done for event in events[:-1])
+        assert np.all(np.diff([event.iteration for event in events]) > 0)
+        assert events[-1].iteration == system.n_steps and events[-1].fraction == 1
+        assert events[-1].state['y'] == system.y and events[-1].t == pytest.approx(system.t_array[-1])
+        assert events[1].eta is not None and events[1].eta > 0
+
+        events.clear()
+        get_system(t_end=0.5, progress=events.append, progress_interval=1e3).solve()
+        assert len(events) == 1 and events[0].done
+
+    def test_solve_compiled(self):
+        events: list[ProgressEvent] = []
+        system = get_system(t_end=20, progress=events.append, progress_interval=0)
+        system.solve_compiled()
+        assert len(events) > 2 and events[-1].done and events[-1].iteration == system.n_steps
+        assert all(event.iteration % 4_096 == 1 or event.iteration == system.n_steps  # на границах блоков
+                   for event in events)
+        assert events[-1].state['y'] == system.y
+
+    def test_sweep(self):
+        events: list[ProgressEvent] = []
+        params = [Parameters(h=1, m=m) for m in (15_000, 16_000, 17_000)]
+        run_sweep(params, BallonetParameters(), t_end=0.1, eps=1e-3, processes=1, chunk_size=1,
+                  progress=events.append, progress_interval=0)
+        assert [event.iteration for event in events] == [1, 2, 3, 3] and events[-1].done
+        assert events[-1].state == {'completed': 3, 'timeout': 0, 'failed': 0}
+
+
+class TestClassKernels:
+    def test_warmup(self):
+        # После прогрева пути решателя не компилируют новых специализаций, в том числе
+        # для целочисленных полей Parameters
+        times = warmup()
+        assert set(times) == {kernel.qualname for kernel in KERNELS}
+        signatures = {kernel.qualname: list(kernel.get_dispatcher().signatures) for kernel in KERNELS}
+        for buoyancy in ('polygon', 'analytic', 'table'):
+            get_system(t_end=0.1, buoyancy=buoyancy).solve()
+        get_system(t_end=0.1).solve_compiled()
+        get_system(t_end=0.1).solve_adaptive()
+        solve_batch([Parameters(h=1, m=16_000, rho=1_000)], BallonetParameters(), t_end=0.1, eps=1e-2)
+        get_frequency_response([Parameters(h=1)], BallonetParameters(), np.array([1.0]))
+        assert {kernel.qualname: list(kernel.get_dispatcher().signatures) for kernel in KERNELS} == signatures
+
+    def test_groups(self):
+        assert get_kernels() == KERNELS
+        assert {kernel.group for kernel in get_kernels(('compiled',))} == {'compiled'}
+        with pytest.raises(ValueError):
+            get_kernels(('gpu',))
+
+
+class TestClassImports:
+    def test_compute_path(self):
+        # Расчётные модули не загружают графику, shapely и тяжёлые подпакеты scipy
+        script = ("import sys, solve_eq, batch_solver, sweep_runner, sensitivity, kernels\n"
+                  "print(' '.join(sorted(sys.modules)))")
+        modules = set(subprocess.run([sys.executable, '-c', script], cwd=os.path.dirname(os.path.abspath(__file__)),
+                                     check=True, capture_output=True, text=True).stdout.split())
+        for module in ('matplotlib', 'shapely', 'tqdm', 'scipy.interpolate', 'scipy.integrate'):
+            assert module not in modules
+
+
+
+class TestClassMetrics:
+    def test_step_response(self):
+        # Затухающий переходный процесс 0 -> 1 с забросом; второй сценарий разошёлся
+        t = np.arange(0, 20, 0.01)
+        y = np.tile(1 - np.exp(-0.5 * t) * np.cos(2 * t), (2, 1))
+        result = BatchResult(scenarios=get_scenarios([Parameters(h=1.1), Parameters(h=1.1)]), t=t, y=y,
+                             p=np.full_like(y, 2_000.0), w=y * 60, gamma=np.zeros_like(y),
+                             status=np.array([0, STATUS_DIVERGED]), last_index=np.array([t.shape[0] - 1] * 2))
+        metrics = get_metrics(result)
+        assert metrics['final_y'][0] == y[0, -1] and metrics['peak_p'][0] == 2_000
+        assert metrics['overshoot'][0] == pytest.approx((y[0].max() - y[0, -1]) / (y[0, -1] - y[0, 0]))
+        outside = np.flatnonzero(np.abs(y[0] - y[0, -1]) > 0.02 * (y[0, -1] - y[0, 0]))
+        assert metrics['settling_time'][0] == pytest.approx(t[outside[-1] + 1])
+        assert metrics['leakage'][0] and np.isnan(metrics['final_y'][1])
+
+    def test_batch(self):
+        result = solve_batch([Parameters(h=1), Parameters(h=3)], BallonetParameters(), t_end=1, eps=1e-2)
+        metrics = get_metrics(result)
+        assert np.array_equal(metrics['final_y'], result.y[:, -1])
+        assert np.array_equal(metrics['leakage'], np.any(result.y > result.scenarios['h'][:, None], axis=1))
+        assert np.all(np.isnan(metrics['settling_time']))  # за 1 с полоса установления не достигнута
+
+
+class TestClassBatchCLI:
+    def test_read(self, tmp_path):
+        (tmp_path / 'input.json').write_text(json.dumps({'m': '15000', 'h': '1'}))
+        (tmp_path / 'many.csv').write_text('m,xi\n14000,\n16000,0.5\n')
+        (tmp_path / 'bad.jsonl').write_text('{"m": 1}\n\n{"mass": 1}\n')
+        params = read_scenarios([str(tmp_path / 'input.json'), str(tmp_path / 'many.csv')])
+        assert params == [Parameters(m=15_000, h=1), Parameters(m=14_000), Parameters(m=16_000, xi=0.5)]
+        with pytest.raises(ValueError, match='bad.jsonl:3'):
+            read_scenarios([str(tmp_path / 'bad.jsonl')])
+        with pytest.raises(ValueError):
+            read_scenarios(['-'])
+
+    def test_main(self, tmp_path):
+        (tmp_path / 'input.json').write_text(json.dumps([{'m': '15000', 'h': '1'}, {'m': '16000', 'h': '1'}]))
+        output = str(tmp_path / 'out' / 'results.npz')
+        code = batch_main([str(tmp_path / 'input.json'), '--t-end', '0.1', '--eps', '1e-3', '--processes', '1',
+                           '--output', output])
+        assert code == 0
+        results = load_results(output)
+        assert list(results['scenarios']['m']) == [15_000, 16_000]
+        assert results['y'].shape == (2, 100) and results['y'].dtype == np.float32
+        reference = SystemOfEquations(Parameters(m=15_000, h=1), BallonetParameters(), t_end=0.1, eps=1e-3,
+                                      buoyancy='analytic')
+        reference.solve_compiled()
+        assert np.array_equal(results['y'][0], reference.y_array.astype(np.float32))
+        assert results['metrics']['final_y'][0] == reference.y_array[-1]
+        assert batch_main([str(tmp_path / 'missing.json')]) == 2
+
+
+class TestClassResultCache:
+    def test_key(self):
+        ballonet = BallonetParameters()
+        key = get_result_key(Parameters(m=16_000), ballonet, 1, 1e-3, 'solve_compiled')
+        assert key == get_result_key(Parameters(m=16e3), ballonet, 1.0, 1e-3, 'solve_compiled')
+        assert key != get_result_key(Parameters(m=15e3), ballonet, 1, 1e-3, 'solve_compiled')
+        assert key != get_result_key(Parameters(m=16e3), ballonet, 1, 1e-3, 'solve')
+        assert key != get_result_key(Parameters(m=16e3), ballonet, 1, 1e-3, 'solve_compiled', pitch=True)
+
+    def test_hit(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        reference = get_system(result_cache=cache)
+        reference.solve_compiled()
+        assert len(cache.get_entries()) == 1
+
+        cached = get_system(result_cache=cache)
+        cached.solve_compiled()
+        for name in ('t_array', 'y_array', 'p_array', 'w_array', 'gamma_array', 'A_positions', 'B_positions'):
+            assert np.array_equal(getattr(cached, name), getattr(reference, name))
+        assert np.array_equal(cached.get_state(), reference.get_state())
+        assert cached.current_iteration == reference.current_iteration
+
+        adaptive = get_system(result_cache=cache)
+        adaptive.solve_adaptive()
+        cached = get_system(result_cache=cache)
+        cached.solve_adaptive()
+        assert cached.integration_stats == adaptive.integration_stats
+        assert np.array_equal(cached.y_array, adaptive.y_array)
+        assert len(cache.get_entries()) == 2
+
+    def test_recompute(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        get_system(result_cache=cache).solve_compiled()
+        path = cache.get_entries()[0][2]
+        os.utime(path, (0, 0))
+        get_system(result_cache=cache, recompute=True).solve_compiled()
+        assert os.stat(path).st_mtime > 0
+
+    def test_eviction(self, tmp_path):
+        cache = ResultCache(str(tmp_path))
+        keys = []
+        for i, m in enumerate((14_000, 15_000, 16_000)):
+            system = SystemOfEquations(Parameters(m=m, h=1), BallonetParameters(), t_end=1, eps=1e-3,
+                                       buoyancy='analytic', result_cache=cache)
+            system.solve_compiled()
+            keys.append(system.get_result_key('solve_compiled'))
+            os.utime(cache.get_path(keys[-1]), (i, i))
+        # Обращение к первой записи делает самой старой вторую
+        assert cache.load(keys[0]) is not None
+        cache.max_bytes = cache.get_size() - 1
+        assert cache.evict() == 1
+        assert keys[1] not in cache and keys[0] in cache and keys[2] in cache
+
+    def test_sweep(self, tmp_path):
+        cache = ResultCache(str(tmp_path / 'cache'))
+        params = [Parameters(h=1, m=m) for m in (15_000, 16_000)]
+        reference = run_sweep(params, BallonetParameters(), t_end=0.1, eps=1e-3, processes=1, result_cache=cache)
+        assert len(cache.get_entries()) == 2
+        cached = run_sweep(params, BallonetParameters(), t_end=0.1, eps=1e-3, processes=1, result_cache=cache)
+        assert np.array_equal(cached.y, reference.y) and np.array_equal(cached.status, reference.status)
+
+
+class TestClassCatalog:
+    def test_query(self, tmp_path):
+        result = solve_batch([Parameters(h=1, m=m) for m in (14_000, 15_000, 16_000)], BallonetParameters(),
+                             t_end=2, eps=1e-3)
+        metrics = get_metrics(result)
+        with Catalog(str(tmp_path)) as catalog:
+            sweep = catalog.add(result, name='masses')
+            assert catalog.add(result) == sweep and catalog.count() == 3
+
+            threshold = float(np.median(metrics['peak_p']))
+            runs = catalog.query('peak_p < ? AND final_y > ?', (threshold, 0.5), order_by='m')
+            expected = [i for i in range(3) if metrics['peak_p'][i] < threshold and metrics['final_y'][i] > 0.5]
+            assert [run.scenario for run in runs] == expected
+            for run in runs:
+                assert run.params == Parameters(h=1, m=result.scenarios['m'][run.scenario])
+                assert run.metrics['max_gamma'] == metrics['max_gamma'][run.scenario]
+                assert run.metrics['leakage'] == metrics['leakage'][run.scenario]
+            plan = ' '.join(str(row) for row in catalog.connection.execute(
+                'EXPLAIN QUERY PLAN SELECT * FROM runs WHERE peak_p < 2500'))
+            assert 'runs_peak_p' in plan
+
+            assert not catalog.trajectories
+            trajectory = catalog.query(order_by='m', limit=1)[0].load_trajectory()
+            assert np.array_equal(trajectory['t'], result.t)
+            assert np.array_equal(trajectory['y'], result.y[0].astype(np.float32))
+
+            catalog.remove(sweep)
+            assert catalog.count() == 0 and not catalog.get_sweeps()
+
+    def test_batch_cli(self, tmp_path):
+        (tmp_path / 'input.json').write_text(json.dumps([{'m': '15000', 'h': '1'}]))
+        code = batch_main([str(tmp_path / 'input.json'), '--t-end', '0.1', '--eps', '1e-3', '--processes', '1',
+                           '--output', str(tmp_path / 'results.npz'), '--catalog', str(tmp_path / 'catalog'),
+                           '--metrics-only'])
+        assert code == 0
+        with Catalog(str(tmp_path / 'catalog')) as catalog:
+            (run,) = catalog.query('m = 15000')
+            with pytest.raises(ValueError):
+                run.load_trajectory()
+            sweep = catalog.add_file(str(tmp_path / 'results.npz'))
+            assert catalog.get_sweeps()[-1]['name'] == 'results.npz' and catalog.count('sweep = ?', (sweep,)) == 1
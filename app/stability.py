@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from math import sqrt, isfinite
+from typing import Iterable
+
+import numpy as np
+from numba import njit, prange
+
+from app_utils import Parameters, BallonetParameters
+from batch_solver import get_scenarios, PARAMETERS_DTYPE, SAFE_FASTMATH
+from buoyancy import get_ballonet_arcs, WATER_BOUNDS
+from dynamics import (
+    get_rhs_jit,
+    get_jacobian_jit,
+    get_Q_in_scalar_jit,
+    PARAM_M, PARAM_RHO, PARAM_S, PARAM_G, PARAM_XI, PARAM_A, PARAM_B, PARAM_C, PARAM_H,
+    Z_P, Z_Y, Z_GAMMA,
+    P_MIN, P_MAX
+)
+
+TRIM_TOLERANCE = 1e-10
+TRIM_MAX_ITERATIONS = 50
+TRIM_RESIDUAL = 1e-6  # |f_p| / P_MAX + |f_y| в найденной точке
+
+# Собственные числа меньше по модулю считаются нейтральными (γ не входит в правые части: λ = 0)
+NEUTRAL_EIGENVALUE = 1e-9
+
+
+@njit(fastmath=SAFE_FASTMATH, error_model='numpy', cache=True)
+def get_trim_guess_jit(params, z):
+    # Баллонеты над водой: S p = m g, а утечка через зазор равна подаче Q_in(p)
+    p = min(max(params[PARAM_M] * params[PARAM_G] / params[PARAM_S], P_MIN), P_MAX)
+    Q_in = get_Q_in_scalar_jit(params[PARAM_A], params[PARAM_B], params[PARAM_C], p)
+    z[Z_P] = p
+    z[Z_Y] = params[PARAM_H] + Q_in / (params[PARAM_XI] * sqrt(2 * p / params[PARAM_RHO])) / 2
+    return z
+
+
+@njit(fastmath=SAFE_FASTMATH, error_model='numpy', cache=True)
+def find_saturated_trim_jit(z, params, r, A_template, B_template, water_bounds):
+    # m g / S >= P_MAX: давление упирается в P_MAX, недостающую силу даёт плавучесть баллонетов.
+    # Объём под водой не возрастает с y - корень уравнения по y ищется делением отрезка
+    # между дном бассейна и положением без погружения
+    z[Z_P] = P_MAX
+    low, high = water_bounds[1], z[Z_Y]
+    z[Z_Y] = low
+    if get_rhs_jit(z, params, r, A_template, B_template, water_bounds)[Z_Y] < 0:
+        return False
+    for _ in range(200):
+        z[Z_Y] = (low + high) / 2
+        if get_rhs_jit(z, params, r, A_template, B_template, water_bounds)[Z_Y] > 0:
+            low = z[Z_Y]
+        else:
+            high = z[Z_Y]
+        if high - low <= TRIM_TOLERANCE * max(abs(high), 1.0):
+            break
+    z[Z_Y] = (low + high) / 2
+    return True
+
+
+@njit(fastmath=SAFE_FASTMATH, error_model='numpy', cache=True)
+def find_trim_jit(z, params, r, A_template, B_template, water_bounds):
+    # Метод Ньютона по (p, y) с дроблением шага; γ не входит в правые части и остаётся заданным
+    # Если при P_MAX зазор не закрыт (утечка больше подачи), давление ниже насыщения - уточняется Ньютоном
+    if params[PARAM_M] * params[PARAM_G] / params[PARAM_S] >= P_MAX:
+        if not find_saturated_trim_jit(z, params, r, A_template, B_template, water_bounds):
+            return False
+        if get_rhs_jit(z, params, r, A_template, B_template, water_bounds)[Z_P] >= 0:
+            return True
+    f = get_rhs_jit(z, params, r, A_template, B_template, water_bounds)
+    norm = abs(f[Z_P]) / P_MAX + abs(f[Z_Y])
+    for _ in range(TRIM_MAX_ITERATIONS):
+        jac = get_jacobian_jit(z, params, r, A_template, B_template, water_bounds)
+        det = jac[Z_P, Z_P] * jac[Z_Y, Z_Y] - jac[Z_P, Z_Y] * jac[Z_Y, Z_P]
+        if det != 0:
+            dp = -(jac[Z_Y, Z_Y] * f[Z_P] - jac[Z_P, Z_Y] * f[Z_Y]) / det
+            dy = -(jac[Z_P, Z_P] * f[Z_Y] - jac[Z_Y, Z_P] * f[Z_P]) / det
+        else:
+            return False
+
+        p, y, step = z[Z_P], z[Z_Y], 1.0
+        while step > 1e-6:
+            z[Z_P], z[Z_Y] = p + step * dp, y + step * dy
+            f = get_rhs_jit(z, params, r, A_template, B_template, water_bounds)
+            new_norm = abs(f[Z_P]) / P_MAX + abs(f[Z_Y])
+            if isfinite(new_norm) and new_norm < norm:
+                break
+            step /= 2
+        norm = new_norm
+        if abs(step * dp) <= TRIM_TOLERANCE * abs(p) and abs(step * dy) <= TRIM_TOLERANCE * max(abs(y), 1.0):
+            return norm <= TRIM_RESIDUAL
+    return False
+
+
+@njit(fastmath=SAFE_FASTMATH, parallel=True, error_model='numpy', cache=True)
+def analyze_batch_jit(params, r, A_template, B_template, water_bounds, gamma, trim, jacobian, residual, converged):
+    for i in prange(params.shape[0]):
+        get_trim_guess_jit(params[i], trim[i])
+        trim[i, Z_GAMMA] = gamma
+        converged[i] = find_trim_jit(trim[i], params[i], r, A_template, B_template, water_bounds)
+        residual[i] = get_rhs_jit(trim[i], params[i], r, A_template, B_template, water_bounds)
+        jacobian[i] = get_jacobian_jit(trim[i], params[i], r, A_template, B_template, water_bounds)
+
+
+@dataclass
+class Equilibrium:
+    p: float
+    y: float
+    gamma: float
+    converged: bool
+    stable: bool
+    jacobian: np.ndarray
+    eigenvalues: np.ndarray
+    damping: np.ndarray  # ζ = -Re λ / |λ|; nan у нейтральных мод
+    natural_frequency: np.ndarray  # |λ| / 2π, Гц
+    frequency: np.ndarray  # |Im λ| / 2π, Гц (0 у апериодических мод)
+
+
+@dataclass
+class StabilityMap:
+    scenarios: np.ndarray
+    trim: np.ndarray  # (N, 3): p, y, γ
+    residual: np.ndarray  # правые части в точке равновесия
+    converged: np.ndarray
+    jacobian: np.ndarray  # (N, 3, 3) по z = (p, y, γ)
+    eigenvalues: np.ndarray  # (N, 3), комплексные
+    damping: np.ndarray
+    natural_frequency: np.ndarray
+    frequency: np.ndarray
+    stable: np.ndarray  # сошлось, и все ненейтральные моды затухают
+
+    def __len__(self) -> int:
+        return self.trim.shape[0]
+
+    def __getitem__(self, i: int) -> Equilibrium:
+        return Equilibrium(p=float(self.trim[i, Z_P]), y=float(self.trim[i, Z_Y]),
+                           gamma=float(self.trim[i, Z_GAMMA]), converged=bool(self.converged[i]),
+                           stable=bool(self.stable[i]), jacobian=self.jacobian[i],
+                           eigenvalues=self.eigenvalues[i], damping=self.damping[i],
+                           natural_frequency=self.natural_frequency[i], frequency=self.frequency[i])
+
+
+def get_params_matrix(scenarios: np.ndarray | Iterable[Parameters]) -> tuple[np.ndarray, np.ndarray]:
+    # Структурированный массив сценариев и (N, 14) - строки get_params_array()
+    if not isinstance(scenarios, np.ndarray):
+        scenarios = get_scenarios(scenarios)
+    return scenarios, np.column_stack([scenarios[name] for name in PARAMETERS_DTYPE.names]).astype(np.float64)
+
+
+def analyze_batch(scenarios: np.ndarray | Iterable[Parameters],
+                  ballonet_params: BallonetParameters,
+                  water_bounds: tuple = WATER_BOUNDS,
+                  gamma: float = 0.0) -> StabilityMap:
+    # Точка равновесия и линеаризация непрерывной системы get_rhs_jit (аналитическая плавучесть)
+    # для N наборов Parameters с общим баллонетом; сценарии считаются параллельно
+    scenarios, params = get_params_matrix(scenarios)
+    n = params.shape[0]
+    trim, residual = np.empty((n, 3)), np.empty((n, 3))
+    jacobian = np.empty((n, 3, 3))
+    converged = np.zeros(n, dtype=np.bool_)
+    analyze_batch_jit(params, float(ballonet_params.AD.r),
+                      get_ballonet_arcs(ballonet_params, minor=True),
+                      get_ballonet_arcs(ballonet_params, minor=False),
+                      np.array(water_bounds, dtype=np.float64), float(gamma),
+                      trim, jacobian, residual, converged)
+
+    eigenvalues = np.full((n, 3), np.nan, dtype=np.complex128)
+    finite = np.all(np.isfinite(jacobian), axis=(1, 2))
+    eigenvalues[finite] = np.linalg.eigvals(jacobian[finite])
+    modulus = np.abs(eigenvalues)
+    neutral = modulus < NEUTRAL_EIGENVALUE
+    with np.errstate(invalid='ignore', divide='ignore'):
+        damping = np.where(neutral, np.nan, -eigenvalues.real / modulus)
+    stable = converged & finite & np.all(neutral | (eigenvalues.real < 0), axis=1)
+    return StabilityMap(scenarios=scenarios, trim=trim, residual=residual, converged=converged,
+                        jacobian=jacobian, eigenvalues=eigenvalues, damping=damping,
+                        natural_frequency=modulus / (2 * np.pi),
+                        frequency=np.abs(eigenvalues.imag) / (2 * np.pi), stable=stable)
@@ -0,0 +1,94 @@
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+# Отслеживаемые величины: столбцы блока в SteadyStateMonitor.update()
+MONITORED = ('y', 'p', 'gamma')
+
+
+@dataclass
+class SteadyStateCriteria:
+    window: float = 1.0  # длина окна, с
+    y_rate: float = 1e-4  # допустимая средняя скорость изменения в окне, м/с
+    p_rate: float = 0.1  # Па/с
+    gamma_rate: float = 1e-6  # рад/с
+    n_bins: int = 10  # окно делится на корзины min/max; проверка - по завершении каждой корзины
+
+    def __post_init__(self):
+        if self.window <= 0 or self.n_bins < 1:
+            raise ValueError("window must be positive and n_bins >= 1")
+
+    def get_tolerances(self) -> np.ndarray:
+        # Допустимый размах величины в окне
+        return np.array([self.y_rate, self.p_rate, self.gamma_rate]) * self.window
+
+
+@dataclass
+class SteadyState:
+    settling_time: float  # начало окна, в котором система признана установившейся
+    t_stop: float
+    iteration: int  # число выполненных шагов, включая начальную точку
+    y: float
+    p: float
+    gamma: float
+    W: float
+
+
+class SteadyStateMonitor:
+    def __init__(self, criteria: SteadyStateCriteria, eps: float) -> None:
+        # Шаги группируются в корзины по bin_steps; по завершении корзины размах каждой величины
+        # за последние n_bins корзин (окно) сравнивается с допуском
+        self.criteria: SteadyStateCriteria = criteria
+        self.bin_steps: int = max(1, int(round(criteria.window / criteria.n_bins / eps)))
+        self.tolerances: np.ndarray = criteria.get_tolerances()
+
+        self.n_seen: int = 0
+        self.current: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self.bins: deque = deque(maxlen=criteria.n_bins)
+
+    def update(self, values: np.ndarray) -> bool:
+        # values - (n, 3): y, p, γ очередных шагов. True - окно, завершившееся на шаге n_seen,
+        # удовлетворяет допускам; оставшиеся строки блока не учитываются
+        offset = 0
+        while offset < values.shape[0]:
+            count = min(self.bin_steps - self.n_seen % self.bin_steps, values.shape[0] - offset)
+            chunk = values[offset:offset + count]
+            low, high = chunk.min(axis=0), chunk.max(axis=0)
+            if self.current is not None:
+                low, high = np.minimum(low, self.current[0]), np.maximum(high, self.current[1])
+            self.current = (low, high)
+            self.n_seen += count
+            offset += count
+
+            if self.n_seen % self.bin_steps == 0:
+                self.bins.append(self.current)
+                self.current = None
+                if self.is_settled():
+                    return True
+        return False
+
+    def is_settled(self) -> bool:
+        if len(self.bins) < self.criteria.n_bins:
+            return False
+        low = np.min([low for low, _ in self.bins], axis=0)
+        high = np.max([high for _, high in self.bins], axis=0)
+        return bool(np.all(high - low <= self.tolerances))
+
+    def get_state(self) -> np.ndarray:
+        # [n_seen, есть ли текущая корзина, её min, max, число корзин, их min, max]
+        n_values = len(MONITORED)
+        current = np.zeros(2 * n_values) if self.current is None else np.concatenate(self.current)
+        bins = [np.concatenate(bucket) for bucket in self.bins]
+        return np.concatenate(([self.n_seen, self.current is not None], current, [len(bins)], *bins))
+
+    def set_state(self, state: np.ndarray) -> None:
+        n_values = len(MONITORED)
+        self.n_seen = int(state[0])
+        if state[1]:
+            self.current = (state[2:2 + n_values].copy(), state[2 + n_values:2 + 2 * n_values].copy())
+        position = 2 + 2 * n_values
+        self.bins.clear()
+        for bucket in state[position + 1:position + 1 + int(state[position]) * 2 * n_values].reshape(-1, 2 * n_values):
+            self.bins.append((bucket[:n_values].copy(), bucket[n_values:].copy()))
@@ -0,0 +1,417 @@
+import collections
+import dataclasses
+import hashlib
+import json
+import multiprocessing
+import os
+import time
+import traceback
+from dataclasses import dataclass, field
+from multiprocessing.shared_memory import SharedMemory
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from app_utils import Parameters, BallonetParameters, BalloonParameters
+from batch_solver import BatchResult, get_scenarios, STATUS_OK, STATUS_CLAMPED, STATUS_DIVERGED
+from dynamics import P_MIN, P_MAX
+from kernels import warmup
+from progress import Progress, ProgressEvent, PROGRESS_INTERVAL
+from result_cache import ResultCache
+from solve_eq import SystemOfEquations
+from steady_state import SteadyStateCriteria
+
+# STATUS_SETTLED - сценарий остановлен по установлению, строки после остановки держат равновесие
+STATUS_TIMEOUT, STATUS_FAILED, STATUS_SETTLED = 4, 8, 16
+
+# Каналы в общем блоке результатов (N, len(CHANNELS), T)
+CHANNELS = ('y', 'p', 'w', 'gamma')
+
+MANIFEST_NAME, RESULTS_NAME = 'manifest.json', 'results.npy'
+
+# Ход сценариев в общем блоке после траекторий (N, len(OUTCOME_COLUMNS)): время старта (time.time()),
+# затем длительность и состояние. Состояние пишется последним и служит признаком завершения: при перезапуске
+# пула по жёсткому пределу родитель забирает уже завершённые сценарии прерванных кусков
+OUTCOME_COLUMNS = ('started', 'elapsed', 'status')
+OUTCOME_STARTED, OUTCOME_ELAPSED, OUTCOME_STATUS = range(len(OUTCOME_COLUMNS))
+
+POLL_INTERVAL = 0.05
+
+# Состояние процесса пула: общий блок памяти и описание прогона
+_worker: dict = {}
+
+
+@dataclass
+class SweepResult(BatchResult):
+    ballonet_params: list[BallonetParameters] = field(default_factory=list)
+    elapsed: np.ndarray = field(default_factory=lambda: np.empty(0))
+    errors: dict[int, str] = field(default_factory=dict)  # индекс -> трассировка сбоя или причина таймаута
+
+
+def get_sweep_key(params: Sequence[Parameters], ballonet_params: Sequence[BallonetParameters],
+                  t_end: int | float, eps: float, steady_state: Optional[SteadyStateCriteria] = None) -> str:
+    description = {
+        'params': [dataclasses.asdict(p) for p in params],
+        'ballonet': [dataclasses.asdict(b) for b in ballonet_params],
+        't_end': t_end,
+        'eps': eps,
+    }
+    if steady_state is not None:
+        description['steady_state'] = dataclasses.asdict(steady_state)
+    return hashlib.sha256(json.dumps(description, sort_keys=True, default=float).encode()).hexdigest()
+
+
+def get_shared_arrays(buffer, shape: tuple) -> tuple[np.ndarray, np.ndarray]:
+    # Траектории и ход сценариев - виды на один общий блок памяти
+    results = np.ndarray(shape, dtype=np.float64, buffer=buffer)
+    outcomes = np.ndarray((shape[0], len(OUTCOME_COLUMNS)), dtype=np.float64, buffer=buffer, offset=results.nbytes)
+    return results, outcomes
+
+
+def get_shared_size(shape: tuple) -> int:
+    return max(1, (int(np.prod(shape)) + shape[0] * len(OUTCOME_COLUMNS)) * 8)
+
+
+def _init_worker(shm_name: str, shape: tuple, t_end: int | float, eps: float, timeout: Optional[float],
+                 steady_state: Optional[SteadyStateCriteria] = None, result_cache: Optional[ResultCache] = None,
+                 recompute: bool = False) -> None:
+    # Ядра solve_compiled() загружаются из дискового кэша numba до первого сценария: время компиляции
+    # не попадает ни в elapsed, ни в мягкий timeout сценария
+    warmup(('compiled',))
+    shm = SharedMemory(name=shm_name)
+    results, outcomes = get_shared_arrays(shm.buf, shape)
+    _worker.update(shm=shm, results=results, outcomes=outcomes, t_end=t_end, eps=eps, timeout=timeout,
+                   steady_state=steady_state, result_cache=result_cache, recompute=recompute)
+
+
+def _run_scenario(index: int, params: Parameters,
+                  ballonet_params: BallonetParameters) -> tuple[int, int, float, Optional[str]]:
+    # Траектория пишется прямо в строку общего блока: массивы системы подменяются видами на неё
+    rows, outcome = _worker['results'][index], _worker['outcomes'][index]
+    outcome[:] = np.nan
+    outcome[OUTCOME_STARTED] = time.time()
+    start = time.perf_counter()
+    status, n_filled, error = STATUS_OK, rows.shape[1], None
+    try:
+        system = SystemOfEquations(params, ballonet_params, t_end=_worker['t_end'], eps=_worker['eps'],
+                                   buoyancy='analytic', steady_state=_worker['steady_state'],
+                                   result_cache=_worker['result_cache'], recompute=_worker['recompute'])
+        for channel, row in zip(CHANNELS, rows):
+            row[0] = getattr(system, f"{channel}_array")[0]
+            setattr(system, f"{channel}_array", row)
+        system.solve_compiled(timeout=_worker['timeout'])
+        if system.steady_state is not None:
+            rows[:, system.current_iteration:] = rows[:, system.current_iteration - 1:system.current_iteration]
+            status |= STATUS_SETTLED
+    except TimeoutError as timeout:
+        status, n_filled, error = status | STATUS_TIMEOUT, system.current_iteration, str(timeout)
+    except Exception:
+        status, n_filled, error = status | STATUS_FAILED, 0, traceback.format_exc()
+    rows[:, n_filled:] = np.nan
+
+    filled = rows[:, :n_filled]
+    if not np.all(np.isfinite(filled)) or np.any(filled[CHANNELS.index('w')] <= 0):
+        status |= STATUS_DIVERGED
+    if np.any((filled[CHANNELS.index('p')] <= P_MIN) | (filled[CHANNELS.index('p')] >= P_MAX)):
+        status |= STATUS_CLAMPED
+    elapsed = time.perf_counter() - start
+    outcome[OUTCOME_ELAPSED] = elapsed
+    outcome[OUTCOME_STATUS] = status
+    return index, status, elapsed, error
+
+
+def _run_chunk(chunk: list[tuple[int, Parameters, BallonetParameters]]) -> list[tuple[int, int, float, Optional[str]]]:
+    return [_run_scenario(*task) for task in chunk]
+
+
+def _last_index(rows: np.ndarray) -> int:
+    finite = np.flatnonzero(np.all(np.isfinite(rows), axis=0))
+    return int(finite[-1]) if finite.shape[0] else 0
+
+
+class SweepRunner:
+    def __init__(self,
+                 params: Sequence[Parameters],
+                 ballonet_params: BallonetParameters | Sequence[BallonetParameters],
+                 t_end: int | float = 1_000,
+                 eps: float = 0.01,
+                 processes: Optional[int] = None,
+                 chunk_size: Optional[int] = None,
+                 timeout: Optional[float] = None,
+                 hard_timeout_grace: float = 60,
+                 directory: Optional[str] = None,
+                 mp_context: str = 'spawn',
+                 steady_state: Optional[SteadyStateCriteria] = None,
+                 progress: Optional[Callable[[ProgressEvent], None]] = None,
+                 progress_interval: float = PROGRESS_INTERVAL,
+                 result_cache: Optional[ResultCache] = None,
+                 recompute: bool = False) -> None:
+
+        if isinstance(ballonet_params, BallonetParameters):
+            ballonet_params = [ballonet_params] * len(params)
+        if len(ballonet_params) != len(params):
+            raise ValueError(f"Got {len(params)} Parameters and {len(ballonet_params)} BallonetParameters")
+
+        self.params: list[Parameters] = list(params)
+        self.ballonet_params: list[BallonetParameters] = list(ballonet_params)
+        self.t_end: int | float = t_end
+        self.eps: float = eps
+        self.processes: int = processes or os.cpu_count()
+        # Мелкие куски выравнивают нагрузку при разной длительности сценариев, крупные - снижают накладные расходы
+        self.chunk_size: int = chunk_size or max(1, len(self.params) // (self.processes * 8))
+        # timeout - мягкий предел на сценарий (проверяется в solve_compiled между блоками шагов);
+        # зависание внутри ядра или конструктора прерывается по жёсткому пределу из get_hard_timeout()
+        self.timeout: Optional[float] = timeout
+        self.hard_timeout_grace: float = hard_timeout_grace
+        # fork после запуска потоков numba (parallel=True, например solve_batch) может зависнуть
+        self.mp_context: str = mp_context
+        self.directory: Optional[str] = directory
+
+        # steady_state - ранняя остановка сценариев по установлению (STATUS_SETTLED)
+        self.steady_state: Optional[SteadyStateCriteria] = steady_state
+
+        # result_cache - общий для процессов пула кэш результатов сценариев: совпавшие сценарии
+        # копируются в общий блок без решения; recompute - решить все сценарии заново
+        self.result_cache: Optional[ResultCache] = result_cache
+        self.recompute: bool = recompute
+
+        self.key: str = get_sweep_key(self.params, self.ballonet_params, t_end, eps, steady_state)
+        self.t_array = np.arange(0, t_end, eps)
+        self.shape = (len(self.params), len(CHANNELS), self.t_array.shape[0])
+
+        self.status = np.zeros(len(self.params), dtype=np.int64)
+        self.elapsed = np.zeros(len(self.params))
+        self.completed: set[int] = set()
+        # Диагностика сбоев и таймаутов: пишется в манифест и SweepResult.errors; при возобновлении
+        # такие сценарии считаются заново
+        self.errors: dict[int, str] = {}
+
+        # progress - наблюдатель за прогоном: шаги события - завершённые сценарии (включая таймауты и ошибки),
+        # состояние - число сценариев по исходам
+        self.progress: Optional[Progress] = None if progress is None else Progress(progress, progress_interval)
+        self.n_finished: int = 0
+
+    def get_manifest_path(self) -> str:
+        return os.path.join(self.directory, MANIFEST_NAME)
+
+    def get_results_path(self) -> str:
+        return os.path.join(self.directory, RESULTS_NAME)
+
+    def load_stored(self) -> Optional[np.ndarray]:
+        # Файл результатов прошлого запуска; None, если его нет или он другой формы
+        path = self.get_results_path()
+        if not os.path.exists(path):
+            return None
+        stored = np.load(path, mmap_mode='r+')
+        if stored.shape != self.shape or stored.dtype != np.float64:
+            return None
+        return stored
+
+    def load_manifest(self, results: np.ndarray, stored: Optional[np.ndarray]) -> None:
+        # Завершённые сценарии прошлого запуска переносятся в общий блок; таймауты и ошибки считаются заново.
+        # Без файла результатов формы манифеста строки завершённых сценариев потеряны: прогон начинается заново
+        path = self.get_manifest_path()
+        if not os.path.exists(path):
+            return
+        with open(path, 'r') as f:
+            manifest = json.load(f)
+        if manifest['key'] != self.key:
+            raise ValueError(f"Manifest {path} belongs to another sweep")
+        if stored is None or tuple(manifest['shape']) != self.shape:
+            return
+
+        for index, (status, elapsed) in manifest['completed'].items():
+            index = int(index)
+            results[index] = stored[index]
+            self.status[index], self.elapsed[index] = status, elapsed
+            self.completed.add(index)
+
+    def save_progress(self, stored: np.ndarray, results: np.ndarray,
+                      done: list[tuple[int, int, float, Optional[str]]]) -> None:
+        # Сначала данные, затем манифест: при обрыве манифест не ссылается на незаписанные строки
+        for index, _, _, _ in done:
+            stored[index] = results[index]
+        stored.flush()
+
+        manifest = {
+            'key': self.key,
+            'shape': self.shape,
+            'completed': {str(i): [int(self.status[i]), float(self.elapsed[i])] for i in sorted(self.completed)},
+            'errors': {str(i): error for i, error in sorted(self.errors.items())},
+        }
+        path = self.get_manifest_path()
+        with open(f"{path}.tmp", 'w') as f:
+            json.dump(manifest, f)
+        os.replace(f"{path}.tmp", path)
+
+    def get_hard_timeout(self, chunk: list) -> Optional[float]:
+        # Жёсткий предел куска в родительском процессе: мягкий timeout каждого сценария плюс запас
+        # на запуск процесса, компиляцию ядер и последний блок COMPILED_BLOCK
+        if self.timeout is None:
+            return None
+        return len(chunk) * (self.timeout + self.hard_timeout_grace)
+
+    def record(self, done: list[tuple[int, int, float, Optional[str]]], stored: Optional[np.ndarray],
+               results: np.ndarray) -> None:
+        for index, status, elapsed, error in done:
+            self.status[index], self.elapsed[index] = status, elapsed
+            if error is None:
+                self.errors.pop(index, None)
+            else:
+                self.errors[index] = error
+            if not status & (STATUS_TIMEOUT | STATUS_FAILED):
+                self.completed.add(index)
+        if stored is not None:
+            self.save_progress(stored, results, done)
+        self.n_finished += len(done)
+        if self.progress is not None and self.progress.check(self.n_finished):
+            self.progress.emit(self.n_finished, self.get_progress_state())
+
+    def get_progress_state(self) -> dict[str, float]:
+        return {'completed': len(self.completed),
+                'timeout': int(np.count_nonzero(self.status & STATUS_TIMEOUT)),
+                'failed': int(np.count_nonzero(self.status & STATUS_FAILED))}
+
+    def collect(self, chunk: list, results: np.ndarray, outcomes: np.ndarray,
+                hung: bool) -> tuple[list[tuple[int, int, float, Optional[str]]], list]:
+        # Кусок, прерванный перезапуском пула: завершённые в процессе сценарии берутся из хода в общем блоке
+        # (трассировка сбоя при этом теряется), остальные возвращаются в очередь. В зависшем куске первый
+        # незавершённый сценарий - выполнявшийся (или тот, до которого процесс не дошёл) - получает STATUS_TIMEOUT
+        done, remaining = [], []
+        for task in chunk:
+            index = task[0]
+            outcome = outcomes[index]
+            if not np.isnan(outcome[OUTCOME_STATUS]):
+                status, error = int(outcome[OUTCOME_STATUS]), None
+                if status & (STATUS_TIMEOUT | STATUS_FAILED):
+                    error = "Scenario did not complete; its diagnostic was lost when the pool was restarted"
+                done.append((index, status, float(outcome[OUTCOME_ELAPSED]), error))
+            elif hung:
+                hung = False
+                started = outcome[OUTCOME_STARTED]
+                results[index] = np.nan
+                done.append((index, STATUS_TIMEOUT, 0.0 if np.isnan(started) else time.time() - started,
+                             f"Scenario exceeded the hard timeout of {self.get_hard_timeout(chunk)}s of a chunk "
+                             f"of {len(chunk)} scenarios; the pool was restarted"))
+            else:
+                outcome[:] = np.nan
+                remaining.append(task)
+        return done, remaining
+
+    def run_chunks(self, chunks: list[list], shm_name: str, stored: Optional[np.ndarray], results: np.ndarray,
+                   outcomes: np.ndarray) -> None:
+        # В работе не больше processes кусков, чтобы время отсчитывалось от фактического старта куска.
+        # Кусок, превысивший жёсткий предел, считается зависшим: пул завершается, выполнявшийся сценарий
+        # помечается STATUS_TIMEOUT, незавершённые сценарии работавших кусков возвращаются в очередь (collect())
+        context = multiprocessing.get_context(self.mp_context)
+        queue = collections.deque(chunks)
+        pool = None
+        try:
+            while queue:
+                if pool is None:
+                    pool = context.Pool(min(self.processes, len(queue)), initializer=_init_worker,
+                                        initargs=(shm_name, self.shape, self.t_end, self.eps, self.timeout,
+                                                  self.steady_state, self.result_cache, self.recompute))
+                active = []
+                while queue or active:
+                    while queue and len(active) < self.processes:
+                        chunk = queue.popleft()
+                        hard_timeout = self.get_hard_timeout(chunk)
+                        deadline = None if hard_timeout is None else time.perf_counter() + hard_timeout
+                        active.append((chunk, pool.apply_async(_run_chunk, (chunk,)), deadline))
+
+                    active[0][1].wait(POLL_INTERVAL)
+                    still_active, hung = [], []
+                    for chunk, result, deadline in active:
+                        if result.ready():
+                            self.record(result.get(), stored, results)
+                        elif deadline is not None and time.perf_counter() > deadline:
+                            hung.append(chunk)
+                        else:
+                            still_active.append((chunk, result, deadline))
+                    active = still_active
+
+                    if hung:
+                        pool.terminate()
+                        pool = None
+                        interrupted = [(chunk, True) for chunk in hung] + [(chunk, False) for chunk, _, _ in active]
+                        requeued = []
+                        for chunk, is_hung in interrupted:
+                            done, remaining = self.collect(chunk, results, outcomes, is_hung)
+                            if done:
+                                self.record(done, stored, results)
+                            if remaining:
+                                requeued.append(remaining)
+                        queue.extendleft(reversed(requeued))
+                        break
+        finally:
+            if pool is not None:
+                pool.terminate()
+                pool.join()
+
+    def run(self) -> SweepResult:
+        shm = SharedMemory(create=True, size=get_shared_size(self.shape))
+        try:
+            results, outcomes = get_shared_arrays(shm.buf, self.shape)
+            results[:] = np.nan
+            outcomes[:] = np.nan
+
+            stored = None
+            if self.directory is not None:
+                os.makedirs(self.directory, exist_ok=True)
+                stored = self.load_stored()
+                self.load_manifest(results, stored)
+                if stored is None:
+                    stored = np.lib.format.open_memmap(self.get_results_path(), mode='w+', dtype=np.float64,
+                                                       shape=self.shape)
+
+            pending = [(i, self.params[i], self.ballonet_params[i])
+                       for i in range(len(self.params)) if i not in self.completed]
+            chunks = [pending[i:i + self.chunk_size] for i in range(0, len(pending), self.chunk_size)]
+            self.n_finished = len(self.completed)
+            if self.progress is not None:
+                self.progress.start(self.n_finished, len(self.params), 0.0)
+            self.run_chunks(chunks, shm.name, stored, results, outcomes)
+            if self.progress is not None:
+                self.progress.emit(self.n_finished, self.get_progress_state(), done=True)
+
+            return SweepResult(scenarios=get_scenarios(self.params), t=self.t_array,
+                               **{channel: results[:, i].copy() for i, channel in enumerate(CHANNELS)},
+                               status=self.status.copy(),
+                               last_index=np.array([_last_index(rows) for rows in results], dtype=np.int64),
+                               ballonet_params=self.ballonet_params, elapsed=self.elapsed.copy(),
+                               errors=dict(self.errors))
+        finally:
+            # Виды numpy на буфер должны быть освобождены до close()
+            results = outcomes = stored = None
+            shm.close()
+            shm.unlink()
+
+
+def run_sweep(params: Sequence[Parameters],
+              ballonet_params: BallonetParameters | Sequence[BallonetParameters],
+              t_end: int | float = 1_000,
+              eps: float = 0.01,
+              **kwargs) -> SweepResult:
+    return SweepRunner(params, ballonet_params, t_end=t_end, eps=eps, **kwargs).run()
+
+
+if __name__ == '__main__':
+    rng = np.random.default_rng(0)
+    n = 512
+    params = [Parameters(h=1, m=m) for m in rng.uniform(14_000, 17_000, n)]
+    ballonets = [BallonetParameters(**{name: BalloonParameters(phi=segment.phi, r=segment.r * scale, x=segment.x,
+                                                               y=segment.y, _a=segment._a)
+                                       for name, segment in vars(BallonetParameters()).items()})
+                 for scale in rng.uniform(0.95, 1.05, n)]
+
+    # Ускорение относительно одного процесса; время включает запуск пула и компиляцию ядер в каждом процессе
+    timings = {}
+    for processes in sorted({1, os.cpu_count()}):
+        start = time.perf_counter()
+        sweep = run_sweep(params, ballonets, t_end=10, eps=1e-3, processes=processes)
+        timings[processes] = time.perf_counter() - start
+        print(f"{processes} processes: {n} scenarios in {timings[processes]:.2f}s, "
+              f"speed-up={timings[1] / timings[processes]:.2f}, "
+              f"efficiency={timings[1] / timings[processes] / processes:.0%}, "
+              f"statuses={dict(zip(*np.unique(sweep.status, return_counts=True)))}")
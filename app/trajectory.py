@@ -0,0 +1,109 @@
+import os
+import struct
+from typing import Optional
+
+import numpy as np
+
+# Каналы траектории и форма одной строки каждого канала
+TRAJECTORY_CHANNELS = {
+    't': (),
+    'y': (),
+    'p': (),
+    'w': (),
+    'gamma': (),
+    'A_positions': (2,),
+    'B_positions': (2,),
+}
+
+# Заголовок .npy фиксированной длины: форму можно переписать на месте после обрезки файла
+HEADER_SIZE = 128
+OUTPUT_CHUNK_SIZE = 65_536
+
+
+def get_n_steps(t_end: int | float, eps: float) -> int:
+    # Длина np.arange(0, t_end, eps) без выделения массива
+    return max(int(np.ceil(t_end / eps)), 0)
+
+
+def write_npy_header(f, dtype: np.dtype, shape: tuple) -> None:
+    header = repr({'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False, 'shape': shape})
+    header = header.ljust(HEADER_SIZE - 10 - 1) + '\n'
+    f.seek(0)
+    f.write(np.lib.format.magic(1, 0) + struct.pack('<H', len(header)) + header.encode('latin1'))
+
+
+class TrajectoryWriter:
+    def __init__(self, directory: str, n_steps: int, chunk_size: int = OUTPUT_CHUNK_SIZE,
+                 channels: dict[str, tuple] = TRAJECTORY_CHANNELS, start_row: int = 0) -> None:
+        # Строки копятся в буферах по chunk_size и дописываются в .npy-файлы каналов;
+        # память ограничена буферами независимо от длины прогона
+        self.directory: str = directory
+        self.n_steps: int = n_steps
+        self.chunk_size: int = chunk_size
+        self.channels: dict[str, tuple] = channels
+        self.cursor: int = start_row  # число строк, принятых писателем (на диске и в буферах)
+        self.flushed: int = start_row
+
+        os.makedirs(directory, exist_ok=True)
+        self.buffers: dict[str, np.ndarray] = {name: np.empty((chunk_size, *tail))
+                                               for name, tail in channels.items()}
+        # start_row > 0 - продолжение записи (resume): строки после start_row отбрасываются
+        self.files = {}
+        for name, tail in channels.items():
+            f = open(os.path.join(directory, f"{name}.npy"), 'r+b' if start_row else 'w+b')
+            write_npy_header(f, np.dtype(np.float64), (n_steps, *tail))
+            if start_row:
+                f.truncate(HEADER_SIZE + start_row * self.buffers[name][0].nbytes)
+            self.files[name] = f
+
+    def append(self, *row) -> None:
+        # row в порядке channels
+        size = self.cursor - self.flushed
+        for buffer, value in zip(self.buffers.values(), row):
+            buffer[size] = value
+        self.cursor += 1
+        if self.cursor - self.flushed == self.chunk_size:
+            self.flush()
+
+    def extend(self, *columns) -> None:
+        # Блок строк, columns в порядке channels
+        n_rows, offset = columns[0].shape[0], 0
+        while offset < n_rows:
+            size = self.cursor - self.flushed
+            count = min(self.chunk_size - size, n_rows - offset)
+            for buffer, column in zip(self.buffers.values(), columns):
+                buffer[size:size + count] = column[offset:offset + count]
+            self.cursor += count
+            offset += count
+            if self.cursor - self.flushed == self.chunk_size:
+                self.flush()
+
+    def flush(self) -> None:
+        size = self.cursor - self.flushed
+        for name, f in self.files.items():
+            buffer = self.buffers[name]
+            f.seek(HEADER_SIZE + self.flushed * buffer[0].nbytes)
+            f.write(buffer[:size].tobytes())
+            f.flush()
+        self.flushed = self.cursor
+
+    def sync(self) -> None:
+        self.flush()
+        for f in self.files.values():
+            os.fsync(f.fileno())
+
+    def close(self) -> None:
+        # Если записано не n_steps строк (ранняя остановка, прореживание),
+        # файлы обрезаются, а форма в заголовке исправляется
+        self.flush()
+        for name, f in self.files.items():
+            if self.cursor != self.n_steps:
+                write_npy_header(f, np.dtype(np.float64), (self.cursor, *self.channels[name]))
+                f.truncate(HEADER_SIZE + self.cursor * self.buffers[name][0].nbytes)
+            f.close()
+        self.files = {}
+
+
+def load_trajectory(directory: str, mmap_mode: Optional[str] = 'r',
+                    channels: dict[str, tuple] = TRAJECTORY_CHANNELS) -> dict[str, np.ndarray]:
+    return {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode) for name in channels}
@@ -0,0 +1,85 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+SPECTRA = ('jonswap', 'pierson-moskowitz')
+
+G = 9.8
+
+# Строк возвышения, вычисляемых за один раз: (WAVE_CHUNK_SIZE, станции) на каждый пересчёт
+WAVE_CHUNK_SIZE = 4_096
+
+
+@dataclass
+class SeaState:
+    Hs: float = 0.5  # значительная высота волны, м
+    Tp: float = 6.0  # период пика спектра, с
+    spectrum: str = 'jonswap'
+    peak_enhancement: float = 3.3  # γ спектра JONSWAP
+    n_components: int = 128
+    omega_range: tuple[float, float] = (0.3, 4.0)  # полоса частот в долях частоты пика
+    seed: int = 0  # начальные фазы гармоник
+
+    def __post_init__(self):
+        if self.spectrum not in SPECTRA:
+            raise ValueError(f"Unknown spectrum: {self.spectrum}. Use one of {SPECTRA}")
+        if self.Hs < 0 or self.Tp <= 0 or self.n_components < 1:
+            raise ValueError("Hs must be non-negative, Tp and n_components positive")
+
+
+def get_spectrum(omega: np.ndarray, sea: SeaState) -> np.ndarray:
+    # Односторонняя спектральная плотность возвышения S(ω), м²·с (DNV-RP-C205)
+    omega_p = 2 * np.pi / sea.Tp
+    pm = 5 / 16 * sea.Hs ** 2 * omega_p ** 4 * omega ** -5 * np.exp(-5 / 4 * (omega_p / omega) ** 4)
+    if sea.spectrum == 'pierson-moskowitz':
+        return pm
+    sigma = np.where(omega <= omega_p, 0.07, 0.09)
+    peak = sea.peak_enhancement ** np.exp(-0.5 * ((omega - omega_p) / (sigma * omega_p)) ** 2)
+    return (1 - 0.287 * np.log(sea.peak_enhancement)) * pm * peak
+
+
+def get_components(sea: SeaState) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # Гармоники нерегулярного волнения: амплитуды, частоты, волновые числа (глубокая вода) и случайные фазы
+    omega_p = 2 * np.pi / sea.Tp
+    edges = np.linspace(*sea.omega_range, sea.n_components + 1) * omega_p
+    omega = (edges[:-1] + edges[1:]) / 2
+    amplitude = np.sqrt(2 * get_spectrum(omega, sea) * np.diff(edges))
+    phase = np.random.default_rng(sea.seed).uniform(0, 2 * np.pi, sea.n_components)
+    return amplitude, omega, omega ** 2 / G, phase
+
+
+def get_elevation(sea: SeaState, t: np.ndarray, x: np.ndarray) -> np.ndarray:
+    # Возвышение η(t, x) = Σ a cos(ωt - kx + φ) длиннохребтового волнения, форма (len(t), len(x))
+    amplitude, omega, k, phase = get_components(sea)
+    return np.cos(np.asarray(t)[:, None, None] * omega - np.asarray(x)[None, :, None] * k + phase) @ amplitude
+
+
+class WaveField:
+    def __init__(self,
+                 sea: SeaState,
+                 stations: np.ndarray,
+                 eps: float,
+                 chunk_size: int = WAVE_CHUNK_SIZE) -> None:
+        # Возвышение в станциях stations на сетке t = idx * eps считается кусками по chunk_size шагов:
+        # η = Re(exp(iωt) @ a·exp(i(φ - kx))) - одно матричное умножение на кусок, в цикле - только выборка строки
+        self.sea: SeaState = sea
+        self.stations: np.ndarray = np.ascontiguousarray(stations, dtype=np.float64)
+        self.eps: float = eps
+        self.chunk_size: int = chunk_size
+
+        amplitude, self.omega, k, phase = get_components(sea)
+        self.coefficients: np.ndarray = amplitude[:, None] * np.exp(1j * (phase[:, None] - k[:, None] * self.stations))
+
+        self.start: int = 0
+        self.rows: Optional[np.ndarray] = None
+
+    def get_chunk(self, start: int, stop: int) -> np.ndarray:
+        t = np.arange(start, stop) * self.eps
+        return (np.exp(1j * t[:, None] * self.omega) @ self.coefficients).real
+
+    def get_row(self, idx: int) -> np.ndarray:
+        if self.rows is None or not self.start <= idx < self.start + self.rows.shape[0]:
+            self.start = idx
+            self.rows = self.get_chunk(idx, idx + self.chunk_size)
+        return self.rows[idx - self.start]